@@ -0,0 +1,158 @@
+"""
+Memory benchmark: the memory taken by a synthetic listing of activities, held as
+ raw dicts (as returned by `StravaClient.list_activities()`) vs as `ActivitySummary`
+ objects, measured with `tracemalloc`.
+
+The activities are parsed from JSON pages of 200 (like Strava API's responses), so
+ the raw dicts are like the real ones, eg. the keys are shared within a page.
+
+$ python scripts/benchmark_activity_memory.py
+$ python scripts/benchmark_activity_memory.py --n 10000 --fields id,start_date
+"""
+import argparse
+import gc
+import json
+import tracemalloc
+from typing import Callable
+
+from strava_facade_api.clients.strava_client.activity_summary import (
+    DEFAULT_FIELDS,
+    ActivitySummary,
+)
+
+PAGE_SIZE = 200
+
+
+def main():
+    args = _parse_args()
+    pages = list(_make_pages(args.n))
+
+    def as_dicts() -> list:
+        activities = []
+        for page in pages:
+            activities.extend(json.loads(page))
+        return activities
+
+    def as_summaries(do_keep_raw=False) -> list:
+        activities = []
+        for page in pages:
+            for activity in json.loads(page):
+                activities.append(
+                    ActivitySummary.from_dict(activity, args.fields, do_keep_raw)
+                )
+        return activities
+
+    results = [
+        ("dicts", _measure(as_dicts)),
+        (f"summaries ({len(args.fields)} fields)", _measure(as_summaries)),
+        ("summaries + raw JSON", _measure(lambda: as_summaries(do_keep_raw=True))),
+    ]
+    baseline_size = results[0][1]
+    print(f"{args.n} activities:")
+    for name, size in results:
+        print(
+            f"    {name:<26} {size / 2**20:8.1f}MB"
+            f" {size / args.n:8.0f}B/activity"
+            f" {size / baseline_size:6.1%} of dicts"
+        )
+
+
+def _measure(build: Callable[[], list]) -> int:
+    """
+    Return the memory, in bytes, still allocated by the result of `build()`.
+    """
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def _make_pages(n: int):
+    """
+    Yield JSON pages of synthetic activities, like Strava API's responses.
+    """
+    for start in range(0, n, PAGE_SIZE):
+        page = [_make_activity(i) for i in range(start, min(start + PAGE_SIZE, n))]
+        yield json.dumps(page)
+
+
+def _make_activity(i: int) -> dict:
+    activity_id = 10_000_000_000 + i
+    sport_type = ("Run", "Ride", "WeightTraining", "Walk")[i % 4]
+    start_date = f"2024-{1 + i % 12:02d}-{1 + i % 28:02d}T{i % 24:02d}:20:32Z"
+    return {
+        "resource_state": 2,
+        "athlete": {"id": 115890775, "resource_state": 1},
+        "name": f"Activity {i}",
+        "distance": float(i % 20_000),
+        "moving_time": 3000 + i % 600,
+        "elapsed_time": 3100 + i % 600,
+        "total_elevation_gain": i % 300,
+        "type": sport_type,
+        "sport_type": sport_type,
+        "id": activity_id,
+        "start_date": start_date,
+        "start_date_local": start_date,
+        "timezone": "(GMT+01:00) Europe/Rome",
+        "utc_offset": 3600.0,
+        "location_city": None,
+        "location_state": None,
+        "location_country": "Italy",
+        "achievement_count": i % 3,
+        "kudos_count": i % 5,
+        "comment_count": 0,
+        "athlete_count": 1,
+        "photo_count": 0,
+        "map": {
+            "id": f"a{activity_id}",
+            "summary_polyline": "ki{eFvqfiVsBmA`Feh@qg@iX`B}JeCcCqGjIq~@kf@cM{KeHeX"
+            * (i % 3),
+            "resource_state": 2,
+        },
+        "trainer": i % 4 == 2,
+        "commute": False,
+        "manual": False,
+        "private": False,
+        "visibility": "followers_only",
+        "flagged": False,
+        "gear_id": None,
+        "start_latlng": [45.46 + i % 100 / 1000, 9.19],
+        "end_latlng": [45.47, 9.18 + i % 100 / 1000],
+        "average_speed": 2.5 + i % 10 / 10,
+        "max_speed": 5.1,
+        "average_temp": 24,
+        "has_heartrate": True,
+        "average_heartrate": 77.0 + i % 50,
+        "max_heartrate": 148.0,
+        "heartrate_opt_out": False,
+        "display_hide_heartrate_option": True,
+        "elev_high": 120.0,
+        "elev_low": 100.0,
+        "upload_id": 11_000_000_000 + i,
+        "upload_id_str": str(11_000_000_000 + i),
+        "external_id": f"garmin_ping_{319619866387 + i}",
+        "from_accepted_tag": False,
+        "pr_count": 0,
+        "total_photo_count": 0,
+        "has_kudoed": False,
+    }
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--n", type=int, default=50_000)
+    parser.add_argument(
+        "--fields",
+        type=lambda value: tuple(value.split(",")),
+        default=DEFAULT_FIELDS,
+        help="Comma-separated fields projected in the summaries.",
+    )
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main()
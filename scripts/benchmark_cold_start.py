@@ -0,0 +1,124 @@
+"""
+Cold-start benchmark: measure the import cost of each Lambda handler, with
+ `python -X importtime`, and fail if any of them is over its budget.
+
+The import cost of a handler is the sum of the self import times of all the modules
+ imported by the handler's module, excluding those already imported by a bare
+ Python interpreter (eg. `site`, `encodings`). Each handler is imported in a new
+ interpreter `--repeat` times and the median is reported.
+
+$ python scripts/benchmark_cold_start.py
+$ python scripts/benchmark_cold_start.py --repeat 10 --budget-ms create-activity=50 --top 5
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent.parent
+
+HANDLERS = {
+    "authorizer": "strava_facade_api.views.authorizer_view",
+    "introspection": "strava_facade_api.views.introspection_view",
+    "update-activity-description": "strava_facade_api.views.update_activity_description_view",
+    "update-activity-descriptions": "strava_facade_api.views.update_activity_descriptions_view",
+    "create-activity": "strava_facade_api.views.create_activity_view",
+    "create-activities": "strava_facade_api.views.create_activities_view",
+    "list-activities": "strava_facade_api.views.list_activities_view",
+    "router": "strava_facade_api.views.router_view",
+}
+# Milliseconds. Importing eagerly `requests` (~90ms) or `boto3` (~100ms) would
+#  blow them.
+DEFAULT_BUDGETS_MS = {
+    "authorizer": 15,
+    "introspection": 15,
+    "update-activity-description": 60,
+    "update-activity-descriptions": 60,
+    "create-activity": 60,
+    "create-activities": 60,
+    "list-activities": 60,
+    # Just the dispatch: the views are imported on their 1st request.
+    "router": 15,
+}
+
+
+def main():
+    args = _parse_args()
+    budgets_ms = {**DEFAULT_BUDGETS_MS, **args.budget_ms}
+
+    baseline_modules = set(_run_importtime("pass"))
+    is_over_budget = False
+    for name, module in HANDLERS.items():
+        runs = [_run_importtime(f"import {module}") for _ in range(args.repeat)]
+        costs_ms = [
+            sum(t for m, t in run.items() if m not in baseline_modules) / 1000
+            for run in runs
+        ]
+        cost_ms = statistics.median(costs_ms)
+        budget_ms = budgets_ms[name]
+        status = "OK" if cost_ms <= budget_ms else "OVER BUDGET"
+        is_over_budget = is_over_budget or cost_ms > budget_ms
+        print(f"{name}: {cost_ms:.1f}ms (budget: {budget_ms}ms) {status}")
+
+        # The heaviest modules, by self time in the last run.
+        heaviest = sorted(
+            ((t, m) for m, t in runs[-1].items() if m not in baseline_modules),
+            reverse=True,
+        )
+        for t, m in heaviest[: args.top]:
+            print(f"    {t / 1000:6.1f}ms {m}")
+
+    if is_over_budget:
+        sys.exit(1)
+
+
+def _run_importtime(code: str) -> dict[str, int]:
+    """
+    Run the given code in a new interpreter with `-X importtime` and return a dict
+     module -> self import time in microseconds.
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # Lines like: "import time:       434 |      41103 |   strava_facade_api.domain".
+    times = dict()
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, module = line.removeprefix("import time:").split("|")
+        times[module.strip()] = int(self_us)
+    return times
+
+
+def _parse_budget(value: str) -> tuple[str, float]:
+    name, _, budget_ms = value.partition("=")
+    if name not in HANDLERS:
+        raise argparse.ArgumentTypeError(f"Unknown handler: {name}")
+    return name, float(budget_ms)
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--budget-ms",
+        type=_parse_budget,
+        action="append",
+        default=[],
+        help="Override a handler's budget, eg. `create-activity=50`.",
+    )
+    parser.add_argument(
+        "--top", type=int, default=0, help="Show the N heaviest modules."
+    )
+    args = parser.parse_args()
+    args.budget_ms = dict(args.budget_ms)
+    return args
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Micro-benchmark: the cost of the activity lookups by time, with the sorted
+ `TimeIndex` (binary search) vs a linear scan of the activities (what filtering a
+ listing does), at 10k and 100k activities.
+
+The lookups are the ones made by the domain: the latest activity of a type in a
+ 1-day range (update activity description) and the activity of a type nearest to a
+ time (duplicate detection when creating an activity).
+
+$ python scripts/benchmark_time_index.py
+$ python scripts/benchmark_time_index.py --sizes 1000 1000000 --n-lookups 1000
+"""
+import argparse
+import random
+import timeit
+
+from strava_facade_api.clients.strava_client.time_index import TimeIndex
+
+ACTIVITY_TYPES = ("Run", "Ride", "WeightTraining", "Walk", "Swim")
+START_TS = 1_500_000_000
+DAY_SECONDS = 24 * 60 * 60
+
+
+def main():
+    args = _parse_args()
+    random.seed(42)
+    for size in args.sizes:
+        # 3 activities a day on average.
+        end_ts = START_TS + size * DAY_SECONDS // 3
+        activities = sorted(
+            (random.uniform(START_TS, end_ts), i, random.choice(ACTIVITY_TYPES))
+            for i in range(size)
+        )
+        index = TimeIndex()
+        for start_ts, activity_id, activity_type in activities:
+            index.add(activity_id, start_ts, [activity_type])
+        queries = [
+            (random.uniform(START_TS, end_ts), random.choice(ACTIVITY_TYPES))
+            for _ in range(args.n_lookups)
+        ]
+
+        def latest_index():
+            for ts, activity_type in queries:
+                index.find_latest(ts, ts + DAY_SECONDS, activity_type)
+
+        def latest_scan():
+            for ts, activity_type in queries:
+                max(
+                    (
+                        a
+                        for a in activities
+                        if a[2] == activity_type and ts <= a[0] <= ts + DAY_SECONDS
+                    ),
+                    default=None,
+                )
+
+        def nearest_index():
+            for ts, activity_type in queries:
+                index.find_nearest(ts, activity_type, 75 * 60)
+
+        def nearest_scan():
+            for ts, activity_type in queries:
+                min(
+                    (a for a in activities if a[2] == activity_type),
+                    key=lambda a: abs(a[0] - ts),
+                )
+
+        print(f"{size} activities:")
+        for name, fn in (
+            ("latest in 1 day, index", latest_index),
+            ("latest in 1 day, scan", latest_scan),
+            ("nearest, index", nearest_index),
+            ("nearest, scan", nearest_scan),
+        ):
+            seconds = min(timeit.repeat(fn, number=1, repeat=3))
+            print(f"    {name:<24} {seconds / args.n_lookups * 1e6:10.2f}us/lookup")
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--n-lookups", type=int, default=100)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main()
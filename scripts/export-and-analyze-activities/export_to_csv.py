@@ -1,3 +1,4 @@
+from itertools import islice
 from pathlib import Path
 
 import requests
@@ -30,16 +31,18 @@ def main():
     # after_ts = 1707174000
     # before_ts = 1707260399
     # activity_type = "WeightTraining"
-    activities = strava.list_activities(after_ts, n_results_per_page=200)
-    if not activities:
-        raise exceptions.NoActivityFound
-
-    for i, activity in enumerate(activities):
-        if i > 70:
-            # Rate limits: 100 requests every 15 minutes
-            # https://developers.strava.com/docs/rate-limits/
-            break
+    # All pages are fetched lazily, one at a time.
+    # Rate limits: 100 requests every 15 minutes, so stop at 71 activities.
+    # https://developers.strava.com/docs/rate-limits/
+    activities = list(
+        islice(strava.iter_activities(after_ts, n_results_per_page=200), 71)
+    )
+    # The details are fetched concurrently, in the same order as `activities`.
+    activities_details = strava.get_activities_details_many(
+        (activity["id"] for activity in activities)
+    )
 
+    for activity, activity_details_result in zip(activities, activities_details):
         # `activity` is a dict like:
         # {
         #     "resource_state": 2,
@@ -99,7 +102,10 @@ def main():
         #     "total_photo_count": 0,
         #     "has_kudoed": false
         # }
-        activity_details = strava.get_activity_details(activity["id"])
+        if not activity_details_result.is_ok:
+            print(f"Skipping activity id={activity['id']}: failed to get details")
+            continue
+        activity_details = activity_details_result.details
         # `activity_details` is a dict like:
         # {
         #     "resource_state": 3,
@@ -242,6 +248,9 @@ def main():
             ]
         )
 
+    if not data:
+        raise exceptions.NoActivityFound
+
     with open(CURR_DIR / "activities.csv", "a") as fout:
         fout.write(
             "date\t"
@@ -0,0 +1,266 @@
+"""
+A local SQLite mirror of my Strava activities.
+
+It stores the summaries returned by `StravaClient.list_activities()` and the
+ details returned by `StravaClient.get_activity_details()`, so that queries like
+ "the latest activity of type X on day Y" are answered locally, in microseconds,
+ instead of with a remote round-trip.
+
+The mirror is kept up to date by `sync()`, which is incremental:
+ - it fetches only the activities newer than the stored high-water mark (the start
+    of the latest activity stored);
+ - and, every `recheck_interval_seconds`, it re-fetches a recent window (the last
+    `recheck_window_seconds`) to catch edits and deletions of recent activities.
+The first sync fetches the activities of the last `initial_sync_seconds` only:
+ older activities are not in the mirror and queries about them must go remote
+ (see `is_covering()`).
+
+The database is a file, by default in Lambda's /tmp, so it survives across warm
+ invocations (and even when the Python module state is lost).
+
+Config, via env vars:
+ - STRAVA_ACTIVITY_STORE_PATH: the path of the SQLite file. If not set, the domain
+    does not use the activity store at all.
+"""
+
+import json
+import os
+import threading
+from time import time
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    import sqlite3
+
+from ..clients.strava_client.strava_client import StravaClient
+from ..utils import datetime_utils
+
+ACTIVITY_STORE_PATH = os.getenv("STRAVA_ACTIVITY_STORE_PATH")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS activity (
+    id INTEGER PRIMARY KEY,
+    type TEXT,
+    sport_type TEXT,
+    start_ts INTEGER NOT NULL,
+    summary TEXT NOT NULL,
+    details TEXT
+);
+CREATE INDEX IF NOT EXISTS activity_sport_type_start_ts
+    ON activity (sport_type, start_ts);
+CREATE INDEX IF NOT EXISTS activity_type_start_ts ON activity (type, start_ts);
+CREATE INDEX IF NOT EXISTS activity_start_ts ON activity (start_ts);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+"""
+
+
+def is_enabled() -> bool:
+    return bool(ACTIVITY_STORE_PATH)
+
+
+class ActivityStore:
+    def __init__(
+        self,
+        strava: StravaClient,
+        path: str | None = None,
+        initial_sync_seconds: int = 90 * 24 * 60 * 60,
+        recheck_window_seconds: int = 7 * 24 * 60 * 60,
+        recheck_interval_seconds: int = 60 * 60,
+    ) -> None:
+        """
+        Args:
+            strava: the client used to sync.
+            path: the path of the SQLite file, defaults to the env var
+             STRAVA_ACTIVITY_STORE_PATH.
+            initial_sync_seconds: how far back the 1st sync goes.
+            recheck_window_seconds: the recent window re-fetched to catch edits.
+            recheck_interval_seconds: how often the recent window is re-fetched.
+        """
+        self.strava = strava
+        self.path = path or ACTIVITY_STORE_PATH
+        self.initial_sync_seconds = initial_sync_seconds
+        self.recheck_window_seconds = recheck_window_seconds
+        self.recheck_interval_seconds = recheck_interval_seconds
+        self._connection = _get_connection(self.path)
+
+    def sync(self) -> int:
+        """
+        Fetch the activities newer than the high-water mark and, if due, re-fetch
+         the recent window. Return the number of activities fetched.
+        """
+        now = time()
+        high_water_ts = self._get_meta("high_water_ts")
+        if high_water_ts is None:
+            after_ts = now - self.initial_sync_seconds
+            self._set_meta("low_water_ts", after_ts)
+        else:
+            # Strava's `after` filter is exclusive: go back 1 sec to be safe.
+            after_ts = high_water_ts - 1
+
+        activities = list(self.strava.iter_activities(after_ts))
+        self._upsert_summaries(activities)
+        n_fetched = len(activities)
+
+        last_recheck_ts = self._get_meta("last_recheck_ts") or 0
+        if now - last_recheck_ts >= self.recheck_interval_seconds:
+            n_fetched += self._recheck(now - self.recheck_window_seconds, after_ts)
+            self._set_meta("last_recheck_ts", now)
+
+        max_start_ts = self._query_one("SELECT MAX(start_ts) FROM activity")[0]
+        if max_start_ts is not None:
+            self._set_meta("high_water_ts", max_start_ts)
+        return n_fetched
+
+    def is_covering(self, after_ts: int | float) -> bool:
+        """
+        Whether the mirror includes all activities after the given timestamp (as of
+         the last sync).
+        """
+        low_water_ts = self._get_meta("low_water_ts")
+        return low_water_ts is not None and low_water_ts <= after_ts
+
+    def is_synced_until(self, before_ts: int | float) -> bool:
+        """
+        Whether the mirror includes all activities before the given timestamp (as
+         of the last sync): ie. the timestamp is not later than the high-water mark.
+        Activities starting after the high-water mark (eg. just uploaded) are only
+         known after a `sync()`.
+        """
+        high_water_ts = self._get_meta("high_water_ts")
+        return high_water_ts is not None and before_ts <= high_water_ts
+
+    def find_latest_activity(
+        self,
+        after_ts: int | float,
+        before_ts: int | float,
+        activity_type: str | None = None,
+    ) -> Optional[dict]:
+        """
+        The latest activity summary (by start date) in the given time range and,
+         optionally, of the given type. None if not found.
+        """
+        activities = self.list_activities(after_ts, before_ts, activity_type, limit=1)
+        return activities[0] if activities else None
+
+    def list_activities(
+        self,
+        after_ts: int | float,
+        before_ts: int | float,
+        activity_type: str | None = None,
+        limit: int | None = None,
+    ) -> list[dict]:
+        """
+        The activity summaries in the given time range and, optionally, of the
+         given type, latest first.
+        """
+        params = [after_ts, before_ts]
+        sql = "SELECT summary FROM activity WHERE start_ts >= ? AND start_ts <= ?"
+        if activity_type:
+            sql += " AND (sport_type = ? OR type = ?)"
+            params += [activity_type, activity_type]
+        sql += " ORDER BY start_ts DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with _lock:
+            rows = self._connection.execute(sql, params).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def get_activity_details(self, activity_id: int) -> dict:
+        """
+        The activity details from the mirror or, if not there, from Strava.
+        """
+        row = self._query_one("SELECT details FROM activity WHERE id = ?", activity_id)
+        if row and row[0]:
+            return json.loads(row[0])
+        details = self.strava.get_activity_details(activity_id)
+        self.upsert_activity_details(details)
+        return details
+
+    def upsert_activity_details(self, details: dict) -> None:
+        """
+        Store the given details (and the summary they include), eg. as returned
+         by `StravaClient.update_activity()`.
+        """
+        with _lock, self._connection:
+            self._upsert(details, details=details)
+
+    def _recheck(self, after_ts: float, before_ts: float) -> int:
+        """
+        Re-fetch the activities in the given window, to catch edits and deletions.
+        """
+        if before_ts <= after_ts:
+            return 0
+        activities = list(self.strava.iter_activities(after_ts, before_ts))
+        with _lock, self._connection:
+            # Deleted in Strava.
+            self._connection.execute(
+                "DELETE FROM activity WHERE start_ts > ? AND start_ts < ?"
+                f" AND id NOT IN ({','.join('?' * len(activities))})",
+                [after_ts, before_ts] + [a["id"] for a in activities],
+            )
+        self._upsert_summaries(activities)
+        return len(activities)
+
+    def _upsert_summaries(self, activities: list[dict]) -> None:
+        with _lock, self._connection:
+            for activity in activities:
+                self._upsert(activity)
+
+    def _upsert(self, activity: dict, details: dict | None = None) -> None:
+        # Must be called holding the lock, within a transaction.
+        # The details are dropped when the summary changes, as they are stale.
+        summary = json.dumps(activity)
+        self._connection.execute(
+            "INSERT INTO activity (id, type, sport_type, start_ts, summary, details)"
+            " VALUES (?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT (id) DO UPDATE SET type = excluded.type,"
+            " sport_type = excluded.sport_type, start_ts = excluded.start_ts,"
+            " summary = excluded.summary,"
+            " details = CASE WHEN excluded.details IS NOT NULL THEN excluded.details"
+            " WHEN summary = excluded.summary THEN details ELSE NULL END",
+            (
+                activity["id"],
+                activity.get("type"),
+                activity.get("sport_type"),
+                int(datetime_utils.iso_to_timestamp(activity["start_date"])),
+                summary,
+                json.dumps(details) if details else None,
+            ),
+        )
+
+    def _get_meta(self, key: str) -> Optional[float]:
+        row = self._query_one("SELECT value FROM meta WHERE key = ?", key)
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: float) -> None:
+        with _lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value)
+            )
+
+    def _query_one(self, sql: str, *params) -> Optional[tuple]:
+        with _lock:
+            return self._connection.execute(sql, params).fetchone()
+
+
+# Connections are stored at module level, so they are reused across warm
+#  invocations. A single lock serializes the access, as connections are shared by
+#  threads.
+_connections: dict[str, "sqlite3.Connection"] = dict()
+_lock = threading.RLock()
+
+
+def _get_connection(path: str) -> "sqlite3.Connection":
+    with _lock:
+        if path not in _connections:
+            # Imported lazily, to keep the cold start fast when the store is disabled.
+            import sqlite3
+
+            connection = sqlite3.connect(path, check_same_thread=False)
+            connection.executescript(_SCHEMA)
+            _connections[path] = connection
+        return _connections[path]
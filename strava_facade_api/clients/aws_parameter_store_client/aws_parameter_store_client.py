@@ -1,32 +1,278 @@
-import boto3
+import threading
+from time import time
+from typing import TYPE_CHECKING, Iterable
+
+from ...utils import deadline
+
+if TYPE_CHECKING:
+    import botocore.exceptions
+
+# Note: `boto3` and `botocore` are imported lazily, when the SSM client is created,
+#  as they are expensive to import and would slow down the cold start of every Lambda
+#  importing this module, even when the token is found in memory or in /tmp.
+
+# Max number of parameters in a single GetParameters request.
+GET_PARAMETERS_BATCH_SIZE = 10
+# Error codes of a request rejected because of too many requests: SSM's throughput
+#  is limited per account and, for writes, per parameter.
+THROTTLING_ERROR_CODES = ("ThrottlingException", "TooManyUpdates")
+
+# The boto3 client is stored at module level, so it is built once per Lambda's
+#  execution environment and reused across warm invocations.
+_client = None
+_client_lock = threading.Lock()
+
+# Values cached with a TTL: (path, with_decryption) -> (value, expires_at).
+_cache: dict[tuple[str, bool], tuple[str, float]] = dict()
+
+
+def get_client():
+    """
+    Get the shared boto3 SSM client, creating it on first use.
+    boto3 clients are thread-safe.
+    """
+    global _client
+
+    if _client is not None:
+        return _client
+    with _client_lock:
+        if _client is None:
+            import boto3
+            from botocore.config import Config
+
+            # botocore's defaults (60 secs timeouts, retried) exceed the Lambda's
+            #  timeout.
+            _client = boto3.client(
+                "ssm",
+                config=Config(
+                    connect_timeout=deadline.CONNECT_TIMEOUT_SECONDS,
+                    read_timeout=deadline.READ_TIMEOUT_SECONDS,
+                    retries={"mode": "standard", "max_attempts": 2},
+                ),
+            )
+    return _client
+
+
+def reset_client() -> None:
+    """
+    Drop the shared boto3 SSM client and the cached values.
+    """
+    global _client
+
+    with _client_lock:
+        _client = None
+        _cache.clear()
 
 
 class ParameterStoreClient:
     def __init__(self) -> None:
-        self.client = boto3.client("ssm")
-
-    def get_parameter(self, path: str) -> str:
-        parameter = self.client.get_parameter(Name=path)
-        return parameter["Parameter"]["Value"]
-
-    def get_secret(self, path: str) -> str:
-        parameter = self.client.get_parameter(Name=path, WithDecryption=True)
-        return parameter["Parameter"]["Value"]
-
-    def put_parameter(self, path: str, value: str, do_overwrite=False) -> None:
-        self.client.put_parameter(
-            Name=path,
-            Description="string",
-            Value=value,
-            Type="String",
-            Overwrite=do_overwrite,
-        )
-
-    def put_secret(self, path: str, value: str, do_overwrite=False) -> None:
-        self.client.put_parameter(
-            Name=path,
-            Description="string",
-            Value=value,
-            Type="SecureString",
-            Overwrite=do_overwrite,
-        )
+        self.client = get_client()
+
+    def get_parameter(self, path: str, cache_ttl_seconds: float | None = None) -> str:
+        """
+        Args:
+            path: the parameter's path.
+            cache_ttl_seconds: if given, the value is cached in memory for this
+             long. Only for values that rarely change.
+        """
+        return self._get_value(path, False, cache_ttl_seconds)
+
+    def get_secret(self, path: str, cache_ttl_seconds: float | None = None) -> str:
+        """
+        Args:
+            path: the parameter's path.
+            cache_ttl_seconds: if given, the value is cached in memory for this
+             long. Only for values that rarely change.
+        """
+        return self._get_value(path, True, cache_ttl_seconds)
+
+    def get_parameters_many(
+        self,
+        paths: Iterable[str],
+        with_decryption=False,
+        cache_ttl_seconds: float | None = None,
+    ) -> dict[str, str]:
+        """
+        Get many parameters with the least number of requests: values are read
+         from the cache (if `cache_ttl_seconds`) and the others are fetched in
+         batches of 10 (the max supported by SSM's GetParameters).
+
+        Args:
+            paths: the parameters' paths.
+            with_decryption: True to decrypt secrets.
+            cache_ttl_seconds: if given, the values are cached in memory for this
+             long. Only for values that rarely change.
+
+        Returns: a dict path -> value.
+
+        Raises:
+            ParameterNotFound: if any of the parameters does not exist.
+            ParameterStoreError: on any other error.
+        """
+        values = dict()
+        paths_to_fetch = []
+        for path in dict.fromkeys(paths):
+            value = _get_cached(path, with_decryption) if cache_ttl_seconds else None
+            if value is not None:
+                values[path] = value
+            else:
+                paths_to_fetch.append(path)
+
+        for i in range(0, len(paths_to_fetch), GET_PARAMETERS_BATCH_SIZE):
+            batch = paths_to_fetch[i : i + GET_PARAMETERS_BATCH_SIZE]
+            try:
+                response = self.client.get_parameters(
+                    Names=batch, WithDecryption=with_decryption
+                )
+            except _get_client_error_class() as exc:
+                raise _to_exception(exc, batch[0]) from exc
+            if response.get("InvalidParameters"):
+                raise ParameterNotFound(response["InvalidParameters"][0])
+            for parameter in response["Parameters"]:
+                values[parameter["Name"]] = parameter["Value"]
+                if cache_ttl_seconds:
+                    _set_cached(
+                        parameter["Name"],
+                        with_decryption,
+                        parameter["Value"],
+                        cache_ttl_seconds,
+                    )
+        return values
+
+    def get_secret_with_version(self, path: str) -> tuple[str, int]:
+        """
+        Get a secret and its version, which is incremented at every write.
+        """
+        parameter = self._get_parameter(path, with_decryption=True)
+        return parameter["Value"], parameter["Version"]
+
+    def put_parameter(self, path: str, value: str, do_overwrite=False) -> int:
+        """
+        Write a parameter and return its new version.
+
+        Raises:
+            ParameterAlreadyExists: if the parameter exists and not `do_overwrite`.
+            ParameterStoreThrottled: if the request was throttled.
+            ParameterStoreError: on any other error.
+        """
+        return self._put_parameter(path, value, "String", do_overwrite)
+
+    def put_secret(self, path: str, value: str, do_overwrite=False) -> int:
+        """
+        Write a secret and return its new version.
+
+        Raises:
+            ParameterAlreadyExists: if the parameter exists and not `do_overwrite`.
+            ParameterStoreThrottled: if the request was throttled.
+            ParameterStoreError: on any other error.
+        """
+        return self._put_parameter(path, value, "SecureString", do_overwrite)
+
+    def delete_parameter(self, path: str) -> None:
+        _invalidate_cached(path)
+        try:
+            self.client.delete_parameter(Name=path)
+        except _get_client_error_class() as exc:
+            raise _to_exception(exc, path) from exc
+
+    def _get_value(
+        self, path: str, with_decryption: bool, cache_ttl_seconds: float | None
+    ) -> str:
+        if cache_ttl_seconds:
+            value = _get_cached(path, with_decryption)
+            if value is not None:
+                return value
+        value = self._get_parameter(path, with_decryption)["Value"]
+        if cache_ttl_seconds:
+            _set_cached(path, with_decryption, value, cache_ttl_seconds)
+        return value
+
+    def _get_parameter(self, path: str, with_decryption=False) -> dict:
+        try:
+            response = self.client.get_parameter(
+                Name=path, WithDecryption=with_decryption
+            )
+        except _get_client_error_class() as exc:
+            raise _to_exception(exc, path) from exc
+        return response["Parameter"]
+
+    def _put_parameter(
+        self, path: str, value: str, type_: str, do_overwrite: bool
+    ) -> int:
+        try:
+            response = self.client.put_parameter(
+                Name=path,
+                Description="string",
+                Value=value,
+                Type=type_,
+                Overwrite=do_overwrite,
+            )
+        except _get_client_error_class() as exc:
+            raise _to_exception(exc, path) from exc
+        _invalidate_cached(path)
+        return response["Version"]
+
+
+def _get_cached(path: str, with_decryption: bool) -> str | None:
+    value, expires_at = _cache.get((path, with_decryption), (None, 0))
+    return value if expires_at > time() else None
+
+
+def _set_cached(path: str, with_decryption: bool, value: str, ttl: float) -> None:
+    _cache[(path, with_decryption)] = (value, time() + ttl)
+
+
+def _invalidate_cached(path: str) -> None:
+    for with_decryption in (False, True):
+        _cache.pop((path, with_decryption), None)
+
+
+def _get_client_error_class() -> type["botocore.exceptions.ClientError"]:
+    # Already imported, with boto3, when the client was created.
+    import botocore.exceptions
+
+    return botocore.exceptions.ClientError
+
+
+def _get_error_code(exc: "botocore.exceptions.ClientError") -> str | None:
+    return exc.response.get("Error", {}).get("Code")
+
+
+def _to_exception(
+    exc: "botocore.exceptions.ClientError", path: str
+) -> "BaseParameterStoreClientException":
+    code = _get_error_code(exc)
+    if code == "ParameterNotFound":
+        return ParameterNotFound(path)
+    if code == "ParameterAlreadyExists":
+        return ParameterAlreadyExists(path)
+    if code in THROTTLING_ERROR_CODES:
+        return ParameterStoreThrottled(path, code)
+    return ParameterStoreError(path, code)
+
+
+class BaseParameterStoreClientException(Exception):
+    pass
+
+
+class ParameterNotFound(BaseParameterStoreClientException):
+    def __init__(self, path: str):
+        self.path = path
+
+
+class ParameterAlreadyExists(BaseParameterStoreClientException):
+    def __init__(self, path: str):
+        self.path = path
+
+
+class ParameterStoreError(BaseParameterStoreClientException):
+    def __init__(self, path: str, code: str | None):
+        self.path = path
+        self.code = code
+
+    def __str__(self) -> str:
+        return f"Parameter Store error {self.code} for {self.path}"
+
+
+class ParameterStoreThrottled(ParameterStoreError):
+    pass
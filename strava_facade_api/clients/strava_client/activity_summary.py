@@ -0,0 +1,163 @@
+"""
+A compact representation of the activities returned by Strava's List Athlete
+ Activities API.
+
+A raw activity is a dict with 50+ keys, including the nested `athlete` and `map`
+ dicts, which takes several KBs in memory, while most jobs read only a handful of
+ fields. An `ActivitySummary` has `__slots__` (no per-instance dict) and stores only
+ a projection of the fields, chosen by the caller. Derived values, like
+ `start_datetime`, are decoded lazily, on 1st access, and the full raw activity can
+ be kept, as a compact JSON string, and decoded on demand.
+
+See `scripts/benchmark_activity_memory.py` for the memory savings.
+"""
+
+import json
+import sys
+from datetime import datetime
+from typing import Iterable
+
+# The fields that can be projected.
+FIELDS = (
+    "id",
+    "name",
+    "type",
+    "sport_type",
+    "start_date",
+    "start_date_local",
+    "timezone",
+    "utc_offset",
+    "elapsed_time",
+    "moving_time",
+    "distance",
+    "total_elevation_gain",
+    "average_speed",
+    "max_speed",
+    "average_heartrate",
+    "max_heartrate",
+    "trainer",
+    "commute",
+    "manual",
+    "private",
+    "visibility",
+    "gear_id",
+    "external_id",
+    "upload_id",
+)
+DEFAULT_FIELDS = (
+    "id",
+    "name",
+    "type",
+    "sport_type",
+    "start_date",
+    "elapsed_time",
+    "moving_time",
+    "distance",
+)
+# String fields with few distinct values: they are interned so all the summaries
+#  share the same string objects.
+_INTERNED_FIELDS = frozenset(("type", "sport_type", "timezone", "visibility"))
+
+
+class ActivitySummary:
+    __slots__ = FIELDS + ("_fields", "_raw_json", "_start_datetime")
+
+    def __init__(
+        self, fields: tuple[str, ...], values: Iterable, raw_json: str | None = None
+    ) -> None:
+        """
+        Use `from_dict()` instead.
+
+        Args:
+            fields: the projected fields.
+            values: the values of the projected fields, in the same order.
+            raw_json: the full raw activity as a JSON string, if kept.
+        """
+        self._fields = fields
+        for field, value in zip(fields, values):
+            setattr(self, field, value)
+        self._raw_json = raw_json
+        self._start_datetime = None
+
+    @classmethod
+    def from_dict(
+        cls,
+        activity: dict,
+        fields: tuple[str, ...] = DEFAULT_FIELDS,
+        do_keep_raw=False,
+    ) -> "ActivitySummary":
+        """
+        Build a summary from a raw activity, as returned by
+         `StravaClient.list_activities()`.
+        Accessing a field not in the projection raises AttributeError.
+
+        Args:
+            activity: the raw activity.
+            fields: the projected fields, a subset of `FIELDS`.
+            do_keep_raw: True to keep the full raw activity, as a JSON string,
+             available via `raw`.
+
+        Raises:
+            UnknownActivityField: if any of the fields is not in `FIELDS`.
+        """
+        values = []
+        for field in fields:
+            if field not in FIELDS:
+                raise UnknownActivityField(field)
+            value = activity.get(field)
+            if field in _INTERNED_FIELDS and isinstance(value, str):
+                value = sys.intern(value)
+            values.append(value)
+        raw_json = json.dumps(activity, separators=(",", ":")) if do_keep_raw else None
+        return cls(fields, values, raw_json)
+
+    @property
+    def start_datetime(self) -> datetime:
+        """
+        `start_date` as a timezone-aware datetime, decoded on 1st access.
+        """
+        if self._start_datetime is None:
+            self._start_datetime = datetime.fromisoformat(self.start_date)
+        return self._start_datetime
+
+    @property
+    def raw(self) -> dict:
+        """
+        The full raw activity, decoded at every access (so it is not kept in
+         memory).
+
+        Raises:
+            RawActivityNotKept: if the summary was built without `do_keep_raw`.
+        """
+        if self._raw_json is None:
+            raise RawActivityNotKept(getattr(self, "id", None))
+        return json.loads(self._raw_json)
+
+    def to_dict(self) -> dict:
+        """
+        The projected fields as a dict.
+        """
+        return {field: getattr(self, field) for field in self._fields}
+
+    def __repr__(self) -> str:
+        values = ", ".join(f"{k}={v!r}" for k, v in self.to_dict().items())
+        return f"{self.__class__.__name__}({values})"
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, ActivitySummary):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+
+class BaseActivitySummaryException(Exception):
+    pass
+
+
+class UnknownActivityField(BaseActivitySummaryException):
+    def __init__(self, field: str):
+        self.field = field
+
+
+class RawActivityNotKept(BaseActivitySummaryException):
+    def __init__(self, activity_id: int | None):
+        self.activity_id = activity_id
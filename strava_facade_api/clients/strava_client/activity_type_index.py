@@ -0,0 +1,334 @@
+"""
+A secondary index of my activities: id -> (start timestamp, end timestamp, type,
+ sport type).
+
+Strava API can not filter the activities by type, so a type-filtered listing has to
+ download all the activities in the time range and discard the others. The index is
+ fed with every activity seen in the listings (and created or updated) and it tracks
+ which time ranges have been fully listed recently (the coverage). Within a covered
+ range, the activities of each type and their start times are known, so a
+ type-filtered listing fetches only the sub-windows with activities of that type,
+ or nothing at all when there are none.
+
+Coverage expires after a TTL, as activities can be created, edited and deleted
+ elsewhere (eg. uploaded by the Garmin watch).
+
+Config, via env vars:
+ - STRAVA_ACTIVITY_INDEX_TTL_SECONDS: the coverage TTL, default 15 mins.
+"""
+
+import os
+import threading
+from time import time
+from typing import Callable, Iterable, Optional
+
+from ...utils import datetime_utils
+from .time_index import TimeIndex
+
+COVERAGE_TTL_SECONDS = float(os.getenv("STRAVA_ACTIVITY_INDEX_TTL_SECONDS", 15 * 60))
+
+
+class CoverageTracker:
+    """
+    The time ranges known to be fully listed, each of them expiring `ttl_seconds`
+     after it was listed.
+    Not thread-safe, the owner must serialize the access.
+    """
+
+    def __init__(self, ttl_seconds: float, clock: Callable[[], float] = time) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.clock = clock
+        # Sorted, not overlapping: (after_ts, before_ts, listed_at).
+        self._ranges: list[tuple[float, float, float]] = []
+
+    def add(
+        self, after_ts: float, before_ts: float, listed_at: float | None = None
+    ) -> None:
+        """
+        Mark the given range as fully listed at `listed_at` (default now).
+        """
+        if before_ts <= after_ts:
+            return
+        listed_at = self.clock() if listed_at is None else listed_at
+        expired_at = self.clock() - self.ttl_seconds
+        ranges = [(after_ts, before_ts, listed_at)]
+        for a, b, t in self._ranges:
+            if t < expired_at:
+                continue
+            if b <= after_ts or a >= before_ts:
+                ranges.append((a, b, t))
+                continue
+            # Overlapping: keep only the parts outside the new range.
+            if a < after_ts:
+                ranges.append((a, after_ts, t))
+            if b > before_ts:
+                ranges.append((before_ts, b, t))
+        self._ranges = sorted(ranges)
+
+    def get_covered(
+        self, after_ts: float, before_ts: float
+    ) -> list[tuple[float, float]]:
+        """
+        The parts of the given range that are covered (not expired), merged,
+         sorted.
+        """
+        expired_at = self.clock() - self.ttl_seconds
+        covered = []
+        for a, b, t in self._ranges:
+            a, b = max(a, after_ts), min(b, before_ts)
+            if t < expired_at or b <= a:
+                continue
+            if covered and covered[-1][1] >= a:
+                covered[-1] = (covered[-1][0], max(covered[-1][1], b))
+            else:
+                covered.append((a, b))
+        return covered
+
+    def get_uncovered(
+        self, after_ts: float, before_ts: float
+    ) -> list[tuple[float, float]]:
+        """
+        The parts of the given range that are not covered, sorted.
+        """
+        return _get_gaps(self.get_covered(after_ts, before_ts), after_ts, before_ts)
+
+    def is_covering(self, after_ts: float, before_ts: float) -> bool:
+        return not self.get_uncovered(after_ts, before_ts)
+
+    def clear(self) -> None:
+        self._ranges.clear()
+
+
+def _get_gaps(
+    ranges: list[tuple[float, float]], after_ts: float, before_ts: float
+) -> list[tuple[float, float]]:
+    """
+    The parts of the given range not in `ranges` (sorted, not overlapping, within
+     the given range), sorted.
+    """
+    gaps = []
+    cursor = after_ts
+    for a, b in ranges:
+        if a > cursor:
+            gaps.append((cursor, a))
+        cursor = b
+    if cursor < before_ts:
+        gaps.append((cursor, before_ts))
+    return gaps
+
+
+class ActivityTypeIndex:
+    def __init__(
+        self,
+        coverage_ttl_seconds: float = COVERAGE_TTL_SECONDS,
+        clock: Callable[[], float] = time,
+    ) -> None:
+        """
+        Args:
+            coverage_ttl_seconds: how long a listed time range is trusted.
+            clock: the time function, replaceable in tests.
+        """
+        self.clock = clock
+        self.coverage = CoverageTracker(coverage_ttl_seconds, clock)
+        # Activity id -> (start_ts, end_ts, type, sport_type).
+        self._entries: dict[int, tuple[float, float, str | None, str | None]] = dict()
+        # The same activities, sorted by start_ts, for time range queries.
+        self._time_index = TimeIndex()
+        self._lock = threading.Lock()
+
+    def add(self, activity: dict) -> None:
+        """
+        Index an activity (summary or details), or update it if already indexed.
+        """
+        activity_id = activity["id"]
+        start_ts = datetime_utils.iso_to_timestamp(activity["start_date"])
+        entry = (
+            start_ts,
+            start_ts + (activity.get("elapsed_time") or 0),
+            activity.get("type"),
+            activity.get("sport_type"),
+        )
+        with self._lock:
+            old_entry = self._entries.get(activity_id)
+            if old_entry == entry:
+                return
+            if old_entry:
+                self._time_index.remove(activity_id, old_entry[0], old_entry[2:])
+            self._entries[activity_id] = entry
+            self._time_index.add(activity_id, entry[0], entry[2:], end_ts=entry[1])
+
+    def remove(self, activity_id: int) -> None:
+        with self._lock:
+            entry = self._entries.pop(activity_id, None)
+            if entry:
+                self._time_index.remove(activity_id, entry[0], entry[2:])
+
+    def record_listing(
+        self,
+        after_ts: float,
+        before_ts: float,
+        activity_ids: Iterable[int],
+        listed_at: float,
+    ) -> None:
+        """
+        Record that the given time range has been fully listed: it is now covered,
+         and the indexed activities in it that were not listed have been deleted.
+        The activities themselves must have been added already.
+
+        Args:
+            after_ts: the start of the listed range.
+            before_ts: the end of the listed range.
+            activity_ids: the ids of all the activities listed.
+            listed_at: when the listing started.
+        """
+        activity_ids = set(activity_ids)
+        with self._lock:
+            for start_ts, activity_id in self._time_index.find_range(
+                after_ts, before_ts
+            ):
+                # Strictly inside the range, as Strava's filters might be exclusive.
+                if after_ts < start_ts < before_ts and activity_id not in activity_ids:
+                    entry = self._entries.pop(activity_id)
+                    self._time_index.remove(activity_id, start_ts, entry[2:])
+            self.coverage.add(after_ts, before_ts, listed_at)
+
+    def plan_windows(
+        self,
+        after_ts: float,
+        before_ts: float,
+        activity_type: str,
+        n_results_per_page: int,
+    ) -> list[tuple[float, float]]:
+        """
+        The sub-windows of the given time range to fetch to get all the activities
+         of the given type: the parts not covered entirely and, within the covered
+         parts, only the runs of consecutive activities of that type (unless that
+         takes more requests than fetching the covered part entirely).
+        The windows overlap their neighbour activities by 1 sec, so the results
+         must be filtered by type and might include duplicates.
+        """
+        # The covered and uncovered parts from the same snapshot: a range recorded
+        #  or expired in between would be in neither.
+        with self._lock:
+            covered = self.coverage.get_covered(after_ts, before_ts)
+            windows = _get_gaps(covered, after_ts, before_ts)
+            for a, b in covered:
+                windows += self._plan_covered_windows(
+                    a, b, activity_type, n_results_per_page
+                )
+        return sorted(windows)
+
+    def is_covering(self, after_ts: float, before_ts: float) -> bool:
+        """
+        Whether the given time range has been fully listed recently, so the
+         queries below are authoritative for it.
+        Activities can not start in the future, so the range is considered up
+         to now.
+        """
+        with self._lock:
+            return self.coverage.is_covering(after_ts, min(before_ts, self.clock()))
+
+    def get_covered_until(self, after_ts: float, before_ts: float) -> Optional[float]:
+        """
+        The end of the covered part of the given time range starting at `after_ts`
+         (`before_ts` at most), None if `after_ts` is not covered.
+        A range is covered only up to when it was listed, so the activities
+         uploaded since, if any, start after it: the queries below are
+         authoritative only up to there.
+        """
+        with self._lock:
+            covered = self.coverage.get_covered(after_ts, before_ts)
+        if not covered or covered[0][0] > after_ts:
+            return None
+        return covered[0][1]
+
+    def find_latest(
+        self, after_ts: float, before_ts: float, activity_type: str
+    ) -> Optional[int]:
+        """
+        The id of the latest activity of the given type in the given time range,
+         None if not found.
+        Call `is_covering()` first, as the index might be missing activities.
+        """
+        with self._lock:
+            found = self._time_index.find_latest(after_ts, before_ts, activity_type)
+        return found[1] if found else None
+
+    def find_nearest(
+        self, ts: float, activity_type: str, max_distance_seconds: float
+    ) -> Optional[int]:
+        """
+        The id of the activity of the given type starting nearest to the given
+         timestamp, within `max_distance_seconds`, None if not found.
+        Call `is_covering()` first, as the index might be missing activities.
+        """
+        with self._lock:
+            found = self._time_index.find_nearest(
+                ts, activity_type, max_distance_seconds
+            )
+        return found[1] if found else None
+
+    def find_overlapping(
+        self, start_ts: float, end_ts: float, activity_type: str
+    ) -> Optional[int]:
+        """
+        The id of an activity of the given type whose time interval (from its start
+         to its start + elapsed time) overlaps the given one, None if not found.
+        Call `is_covering()` first, as the index might be missing activities.
+        """
+        with self._lock:
+            found = self._time_index.find_overlapping(start_ts, end_ts, activity_type)
+        return found[0][1] if found else None
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "covered_ranges": self.coverage.get_covered(0, self.clock()),
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._time_index.clear()
+            self.coverage.clear()
+
+    def _plan_covered_windows(
+        self,
+        after_ts: float,
+        before_ts: float,
+        activity_type: str,
+        n_results_per_page: int,
+    ) -> list[tuple[float, float]]:
+        # Must be called holding the lock.
+        entries = self._time_index.find_range(after_ts, before_ts)
+
+        # Runs of consecutive activities of the type, as (start index, end index).
+        runs = []
+        for k, (_, activity_id) in enumerate(entries):
+            _, _, type_, sport_type = self._entries[activity_id]
+            if activity_type not in (type_, sport_type):
+                continue
+            if runs and runs[-1][1] == k:
+                runs[-1] = (runs[-1][0], k + 1)
+            else:
+                runs.append((k, k + 1))
+
+        # A listing takes 1 request per page, plus 1 to get the last short page.
+        #  A run's window also includes its 2 neighbour activities (see below).
+        n_requests_entire = len(entries) // n_results_per_page + 1
+        n_requests_runs = sum(
+            (end - start + (start > 0) + (end < len(entries))) // n_results_per_page + 1
+            for start, end in runs
+        )
+        if n_requests_runs >= n_requests_entire:
+            return [(after_ts, before_ts)]
+
+        # Each run's window spans from the previous activity to the next one (of
+        #  other types), so it includes the whole run.
+        windows = []
+        for start, end in runs:
+            window_after_ts = entries[start - 1][0] - 1 if start > 0 else after_ts
+            window_before_ts = entries[end][0] + 1 if end < len(entries) else before_ts
+            windows.append((window_after_ts, window_before_ts))
+        return windows
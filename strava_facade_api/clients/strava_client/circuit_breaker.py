@@ -0,0 +1,201 @@
+"""
+A circuit breaker around the calls to Strava API, to fail fast during an outage.
+
+When Strava is degraded, every call waits for a slow or failing response, burning
+ Lambda time and concurrency for nothing. The breaker tracks the outcome and the
+ latency of the calls over a rolling time window and:
+ - closed (the normal state): calls are made. When, in the window, there are
+    enough calls and too many of them failed (a connection error, a timeout or a
+    5xx response) or were slow, the breaker opens;
+ - open: calls are rejected immediately with `CircuitOpen`, for a while;
+ - half-open: then a few probe calls are let through, one at a time. If they all
+    succeed, the breaker closes; if one fails, it opens again.
+
+A 4xx response is a success: Strava is up, the request was wrong.
+
+The breaker is stored at module level, so it is shared by all threads and its
+ state survives across warm Lambda invocations. It is also visible through the
+ introspection endpoint GET /circuit-breaker, deployed only when all the routes
+ share the same Lambda (see `router_view.py` and `serverless-router.yml`).
+
+This module does not import `requests`, so it is cheap to import.
+
+Config, via env vars:
+ - STRAVA_CIRCUIT_WINDOW_SECONDS: the rolling window. Default: 60.
+ - STRAVA_CIRCUIT_MIN_CALLS: min number of calls in the window to open. Default: 5.
+ - STRAVA_CIRCUIT_FAILURE_RATE: failure rate (failed or slow calls) that opens.
+    Default: 0.5.
+ - STRAVA_CIRCUIT_SLOW_CALL_SECONDS: a call slower than this counts as failed.
+    Default: 5.
+ - STRAVA_CIRCUIT_OPEN_SECONDS: how long it stays open. Default: 30.
+ - STRAVA_CIRCUIT_HALF_OPEN_PROBES: number of successful probes to close.
+    Default: 2.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable
+
+DEFAULT_WINDOW_SECONDS = float(os.getenv("STRAVA_CIRCUIT_WINDOW_SECONDS", 60))
+DEFAULT_MIN_CALLS = int(os.getenv("STRAVA_CIRCUIT_MIN_CALLS", 5))
+DEFAULT_FAILURE_RATE = float(os.getenv("STRAVA_CIRCUIT_FAILURE_RATE", 0.5))
+DEFAULT_SLOW_CALL_SECONDS = float(os.getenv("STRAVA_CIRCUIT_SLOW_CALL_SECONDS", 5))
+DEFAULT_OPEN_SECONDS = float(os.getenv("STRAVA_CIRCUIT_OPEN_SECONDS", 30))
+DEFAULT_HALF_OPEN_PROBES = int(os.getenv("STRAVA_CIRCUIT_HALF_OPEN_PROBES", 2))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        window_seconds: float = DEFAULT_WINDOW_SECONDS,
+        min_calls: int = DEFAULT_MIN_CALLS,
+        failure_rate: float = DEFAULT_FAILURE_RATE,
+        slow_call_seconds: float = DEFAULT_SLOW_CALL_SECONDS,
+        open_seconds: float = DEFAULT_OPEN_SECONDS,
+        half_open_probes: int = DEFAULT_HALF_OPEN_PROBES,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """
+        Args:
+            window_seconds: the rolling window.
+            min_calls: min number of calls in the window to open.
+            failure_rate: failure rate (failed or slow calls) that opens.
+            slow_call_seconds: a call slower than this counts as failed.
+            open_seconds: how long it stays open before half-opening.
+            half_open_probes: number of successful probes to close.
+            clock: the time function, replaceable in tests.
+        """
+        self.window_seconds = window_seconds
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.state = CLOSED
+        # The calls in the window: (ts, is_failure).
+        self._calls: deque[tuple[float, bool]] = deque()
+        self._opened_at: float | None = None
+        self._is_probe_in_flight = False
+        self._n_probe_successes = 0
+        self.n_rejected = 0
+        self.n_opened = 0
+
+    def before_call(self) -> None:
+        """
+        Call before each call to Strava: it reserves a probe when half-open.
+
+        Raises:
+            CircuitOpen: if the call must not be made.
+        """
+        with self._lock:
+            now = self._clock()
+            if self.state == OPEN:
+                retry_after_seconds = self._opened_at + self.open_seconds - now
+                if retry_after_seconds > 0:
+                    self.n_rejected += 1
+                    raise CircuitOpen(retry_after_seconds)
+                print("Circuit breaker: half-open")
+                self.state = HALF_OPEN
+                self._n_probe_successes = 0
+                self._is_probe_in_flight = False
+            if self.state == HALF_OPEN:
+                # 1 probe at a time.
+                if self._is_probe_in_flight:
+                    self.n_rejected += 1
+                    raise CircuitOpen(0)
+                self._is_probe_in_flight = True
+
+    def record(self, is_success: bool, duration_seconds: float) -> None:
+        """
+        Call after each call to Strava, with its outcome.
+        """
+        is_failure = not is_success or duration_seconds > self.slow_call_seconds
+        with self._lock:
+            now = self._clock()
+            if self.state == HALF_OPEN:
+                self._is_probe_in_flight = False
+                if is_failure:
+                    self._open(now)
+                    return
+                self._n_probe_successes += 1
+                if self._n_probe_successes >= self.half_open_probes:
+                    print("Circuit breaker: closed")
+                    self.state = CLOSED
+                    self._calls.clear()
+                return
+            if self.state == OPEN:
+                # A call started before opening.
+                return
+
+            self._calls.append((now, is_failure))
+            self._prune(now)
+            n_failures = sum(1 for _, is_failure in self._calls if is_failure)
+            if (
+                len(self._calls) >= self.min_calls
+                and n_failures / len(self._calls) >= self.failure_rate
+            ):
+                self._open(now)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            now = self._clock()
+            self._prune(now)
+            n_failures = sum(1 for _, is_failure in self._calls if is_failure)
+            stats = {
+                "state": self.state,
+                "n_calls": len(self._calls),
+                "n_failures": n_failures,
+                "n_rejected": self.n_rejected,
+                "n_opened": self.n_opened,
+            }
+            if self.state == OPEN:
+                stats["retry_after_seconds"] = round(
+                    max(self._opened_at + self.open_seconds - now, 0), 1
+                )
+            return stats
+
+    def reset(self) -> None:
+        with self._lock:
+            self.state = CLOSED
+            self._calls.clear()
+            self._opened_at = None
+            self._is_probe_in_flight = False
+            self._n_probe_successes = 0
+            self.n_rejected = 0
+            self.n_opened = 0
+
+    def _open(self, now: float) -> None:
+        # Must be called holding the lock.
+        print(f"Circuit breaker: open for {self.open_seconds}s")
+        self.state = OPEN
+        self._opened_at = now
+        self._calls.clear()
+        self.n_opened += 1
+
+    def _prune(self, now: float) -> None:
+        # Must be called holding the lock.
+        while self._calls and self._calls[0][0] < now - self.window_seconds:
+            self._calls.popleft()
+
+
+_circuit_breaker = CircuitBreaker()
+
+
+def get_circuit_breaker() -> CircuitBreaker:
+    return _circuit_breaker
+
+
+class CircuitOpen(Exception):
+    def __init__(self, retry_after_seconds: float):
+        self.retry_after_seconds = retry_after_seconds
+
+    def __str__(self) -> str:
+        return f"Strava API unavailable, retry after {self.retry_after_seconds:.0f}s"
@@ -0,0 +1,92 @@
+"""
+Detect whether a new activity would duplicate an existing one: an activity of the
+ same type whose time interval (from its start to its start + elapsed time)
+ overlaps the new one's.
+
+The check is answered locally, by the activity type index (an interval index), when
+ the time range was listed recently. Otherwise, when the index is cold, the time
+ range is listed once (which also warms the index for the next checks), so in
+ steady state, eg. when creating many activities, most checks make no request.
+"""
+
+import threading
+from typing import Callable, Iterable, Optional
+
+from .activity_type_index import ActivityTypeIndex
+
+# How far back, from the new activity's start, an existing activity might start
+#  and still overlap it: the longest plausible activity.
+LOOKBACK_SECONDS = 24 * 60 * 60
+
+
+class DuplicateDetector:
+    def __init__(
+        self, index: ActivityTypeIndex, lookback_seconds: float = LOOKBACK_SECONDS
+    ) -> None:
+        """
+        Args:
+            index: the activity type index, warmed by the listings.
+            lookback_seconds: see `LOOKBACK_SECONDS`.
+        """
+        self.index = index
+        self.lookback_seconds = lookback_seconds
+        self._lock = threading.Lock()
+        self.n_local_checks = 0
+        self.n_remote_checks = 0
+
+    def find_duplicate(
+        self,
+        activity_type: str,
+        start_ts: float,
+        duration_seconds: float,
+        list_activities: Callable[[float, float], Iterable[dict]],
+    ) -> Optional[int]:
+        """
+        The id of an existing activity of the given type overlapping the given time
+         interval, None if not found.
+
+        Args:
+            activity_type: eg. "WeightTraining".
+            start_ts: the new activity's start timestamp.
+            duration_seconds: the new activity's duration.
+            list_activities: a function listing all the activities in a time range,
+             and recording them in the index, eg. `StravaClient.iter_activities()`.
+        """
+        # At least 1 sec, so a duration of 0 still overlaps an activity starting
+        #  at the same time.
+        end_ts = start_ts + max(duration_seconds, 1)
+        self.warm(start_ts, end_ts, list_activities)
+        return self.index.find_overlapping(start_ts, end_ts, activity_type)
+
+    def warm(
+        self,
+        start_ts: float,
+        end_ts: float,
+        list_activities: Callable[[float, float], Iterable[dict]],
+    ) -> None:
+        """
+        Make sure the index covers all the activities that might overlap the given
+         time interval, listing them if not. A single call, with the union of many
+         intervals, warms the index for all of them.
+        """
+        after_ts = start_ts - self.lookback_seconds
+        if self.index.is_covering(after_ts, end_ts):
+            with self._lock:
+                self.n_local_checks += 1
+            return
+        with self._lock:
+            self.n_remote_checks += 1
+        # For a recent activity (the common case), list up to now: it costs little
+        #  more and the next checks, for later activities, are answered locally.
+        now = self.index.clock()
+        before_ts = now if end_ts < now < end_ts + self.lookback_seconds else end_ts
+        for _ in list_activities(after_ts, before_ts):
+            pass
+
+    def get_stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"local": self.n_local_checks, "remote": self.n_remote_checks}
+
+    def clear_stats(self) -> None:
+        with self._lock:
+            self.n_local_checks = self.n_remote_checks = 0
@@ -0,0 +1,186 @@
+"""
+A connection-pooled HTTP session shared by all Strava API calls.
+
+The session is created lazily and stored at module level, so it lives in the
+ Lambda's *execution environment* and it is reused across warm invocations: the
+ DNS lookup, TCP connect and TLS handshake to www.strava.com are paid only once,
+ for the first call, and then the connection is kept alive in the pool.
+
+A `requests.Session` with an `HTTPAdapter` is safe to be shared between threads
+ as long as its configuration (headers, adapters, ...) is not changed after its
+ creation: every thread gets its own connection from the urllib3 pool. So do not
+ mutate the shared session, but pass per-request headers instead.
+
+Config, via env vars:
+ - STRAVA_HTTP_POOL_MAXSIZE: max number of connections kept in the pool per host,
+    it should be >= the number of threads making concurrent calls. Default: 10.
+ - STRAVA_HTTP_KEEP_ALIVE: "false" to disable keep-alive and close the
+    connection after each request. Default: true.
+ - STRAVA_HTTP_KEEP_ALIVE_IDLE_SECONDS: TCP keep-alive idle time, so the kernel
+    probes idle pooled connections and NATs do not silently drop them. Default: 60.
+"""
+
+import os
+import socket
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+DEFAULT_POOL_MAXSIZE = int(os.getenv("STRAVA_HTTP_POOL_MAXSIZE", 10))
+DEFAULT_DO_KEEP_ALIVE = os.getenv("STRAVA_HTTP_KEEP_ALIVE", "true").lower() not in (
+    "false",
+    "f",
+    "no",
+    "n",
+    "0",
+)
+DEFAULT_KEEP_ALIVE_IDLE_SECONDS = int(
+    os.getenv("STRAVA_HTTP_KEEP_ALIVE_IDLE_SECONDS", 60)
+)
+
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+
+
+def get_session(
+    pool_maxsize: int = DEFAULT_POOL_MAXSIZE,
+    do_keep_alive: bool = DEFAULT_DO_KEEP_ALIVE,
+    keep_alive_idle_seconds: int = DEFAULT_KEEP_ALIVE_IDLE_SECONDS,
+) -> requests.Session:
+    """
+    Get the shared session, creating it on first use.
+    The args are only used when the session is created, so the first caller
+     configures it for the whole execution environment.
+
+    Args:
+        pool_maxsize: max number of connections kept in the pool per host.
+        do_keep_alive: if False, connections are closed after each request.
+        keep_alive_idle_seconds: TCP keep-alive idle time for pooled connections.
+    """
+    global _session
+
+    if _session is not None:
+        return _session
+    with _session_lock:
+        # Double-checked locking, so concurrent first calls create 1 session only.
+        if _session is None:
+            _session = _build_session(
+                pool_maxsize, do_keep_alive, keep_alive_idle_seconds
+            )
+    return _session
+
+
+def reset_session() -> None:
+    """
+    Close the shared session and all its pooled connections.
+    The next `get_session()` creates a new one.
+    """
+    global _session
+
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+        _session = None
+
+
+def is_connection_reused(response: requests.Response) -> bool | None:
+    """
+    Whether the given response was served over a connection reused from the pool
+     (True) or over a new connection that paid the TCP and TLS handshakes (False).
+    None when unknown, eg. a response not sent by the shared session.
+    """
+    return getattr(response, "is_connection_reused", None)
+
+
+def _build_session(
+    pool_maxsize: int, do_keep_alive: bool, keep_alive_idle_seconds: int
+) -> requests.Session:
+    session = requests.Session()
+    adapter = _ReuseTrackingHTTPAdapter(
+        keep_alive_idle_seconds=keep_alive_idle_seconds,
+        # Strava is the only host, so 1 pool per scheme is enough.
+        pool_connections=2,
+        pool_maxsize=pool_maxsize,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if not do_keep_alive:
+        session.headers["Connection"] = "close"
+    return session
+
+
+class _ReuseTrackingConnectionMixin:
+    """
+    A connection that knows whether the request being sent is the first one since
+     the socket was opened.
+    """
+
+    is_reused = False
+    _is_fresh = False
+
+    def connect(self):
+        super().connect()
+        self._is_fresh = True
+
+    def request(self, *args, **kwargs):
+        # For HTTPS urllib3 connects before `request()` (so `_is_fresh` is set),
+        #  for HTTP it connects lazily within it (so `sock` is None).
+        self.is_reused = not self._is_fresh and self.sock is not None
+        try:
+            return super().request(*args, **kwargs)
+        finally:
+            self._is_fresh = False
+
+
+class _ReuseTrackingHTTPSConnection(_ReuseTrackingConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _ReuseTrackingHTTPConnection(_ReuseTrackingConnectionMixin, HTTPConnection):
+    pass
+
+
+class _ReuseTrackingHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _ReuseTrackingHTTPSConnection
+
+
+class _ReuseTrackingHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _ReuseTrackingHTTPConnection
+
+
+class _ReuseTrackingHTTPAdapter(HTTPAdapter):
+    """
+    An HTTP adapter that:
+     - enables TCP keep-alive probes on pooled sockets;
+     - sets `response.is_connection_reused` on every response.
+    """
+
+    def __init__(self, keep_alive_idle_seconds: int, **kwargs) -> None:
+        self.keep_alive_idle_seconds = keep_alive_idle_seconds
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        pool_kwargs["socket_options"] = HTTPConnection.default_socket_options + [
+            (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        ]
+        # TCP_KEEPIDLE is Linux-only (so available in AWS Lambda).
+        if hasattr(socket, "TCP_KEEPIDLE"):
+            pool_kwargs["socket_options"].append(
+                (socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, self.keep_alive_idle_seconds)
+            )
+        super().init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _ReuseTrackingHTTPConnectionPool,
+            "https": _ReuseTrackingHTTPSConnectionPool,
+        }
+
+    def send(self, request, *args, **kwargs):
+        response = super().send(request, *args, **kwargs)
+        # The urllib3 connection is still attached to the raw response as requests
+        #  does not preload the content.
+        connection = getattr(response.raw, "_connection", None)
+        response.is_connection_reused = getattr(connection, "is_reused", None)
+        return response
@@ -0,0 +1,206 @@
+"""
+A request scheduler that keeps the calls to Strava API within its rate limits.
+
+Strava enforces 2 limits per application: a 15-minute one (which resets at 0, 15,
+ 30 and 45 minutes after the hour) and a daily one (which resets at midnight UTC).
+ Every response reports the limits and the current usage in the headers:
+    X-RateLimit-Limit: 200,2000
+    X-RateLimit-Usage: 31,870
+Docs: https://developers.strava.com/docs/rate-limits/
+
+The rate limiter tracks both windows from these headers. While much of the
+ 15-minute budget is left (more than a reserve, a fraction of the limit), calls
+ are not paced at all: eg. a batch of 50 items, ~100 calls, completes within the
+ Lambda's timeout. Below the reserve, it paces the outgoing calls with a token
+ bucket whose refill rate is the remaining 15-minute budget spread over the time
+ left in the 15-minute window. So concurrent bulk jobs spend the whole budget at
+ the highest throughput Strava allows without running into 429s. The daily window is not used for pacing (it
+ would spread the daily budget over the rest of the day, making every call wait
+ for tens of seconds): calls wait only when a window is exhausted (or a 429 is
+ received), until the window resets.
+
+The rate limiter is stored at module level, so it is shared by all threads and
+ it survives across warm Lambda invocations.
+
+Config, via env vars:
+ - STRAVA_RATE_LIMIT_RESERVE_FRACTION: the fraction of the 15-minute limit below
+    which calls are paced. Default: 0.25.
+ - STRAVA_RATE_LIMIT_BURST: max number of calls that can be made at once, without
+    pacing, below the reserve. Default: 10.
+ - STRAVA_RATE_LIMIT_MAX_WAIT_SECONDS: max time a call can wait for its turn,
+    after which it fails with `RateLimitExceeded`. Default: 900 (15 mins).
+"""
+
+import math
+import os
+import threading
+import time
+from typing import Callable, Mapping
+
+SHORT_WINDOW_SECONDS = 15 * 60
+LONG_WINDOW_SECONDS = 24 * 60 * 60
+# Strava defaults, used until the first response reports the actual limits.
+DEFAULT_SHORT_LIMIT = 200
+DEFAULT_LONG_LIMIT = 2000
+DEFAULT_RESERVE_FRACTION = float(os.getenv("STRAVA_RATE_LIMIT_RESERVE_FRACTION", 0.25))
+DEFAULT_BURST = int(os.getenv("STRAVA_RATE_LIMIT_BURST", 10))
+DEFAULT_MAX_WAIT_SECONDS = float(os.getenv("STRAVA_RATE_LIMIT_MAX_WAIT_SECONDS", 900))
+
+
+class RateLimiter:
+    WINDOW_SECONDS = (SHORT_WINDOW_SECONDS, LONG_WINDOW_SECONDS)
+
+    def __init__(
+        self,
+        short_limit: int = DEFAULT_SHORT_LIMIT,
+        long_limit: int = DEFAULT_LONG_LIMIT,
+        reserve_fraction: float = DEFAULT_RESERVE_FRACTION,
+        burst: int = DEFAULT_BURST,
+        max_wait_seconds: float = DEFAULT_MAX_WAIT_SECONDS,
+        clock: Callable[[], float] = time.time,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        """
+        Args:
+            short_limit: initial 15-minute limit, updated from the headers.
+            long_limit: initial daily limit, updated from the headers.
+            reserve_fraction: the fraction of the 15-minute limit below which
+             calls are paced.
+            burst: the token bucket's capacity.
+            max_wait_seconds: max time `acquire()` can wait.
+            clock: function returning the current time in seconds since the epoch.
+            sleep: function used to wait.
+        """
+        self.limits = [short_limit, long_limit]
+        self.usages = [0, 0]
+        self.reserve_fraction = reserve_fraction
+        self.burst = burst
+        self.max_wait_seconds = max_wait_seconds
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        now = self._clock()
+        self._window_starts = [self._get_window_start(i, now) for i in range(2)]
+        self._tokens = float(burst)
+        self._last_refill_ts = now
+
+    def acquire(self, max_wait_seconds: float | None = None) -> None:
+        """
+        Wait until a call can be made, then reserve it.
+
+        Args:
+            max_wait_seconds: shorter max wait for this call, eg. the time left
+             before the invocation's deadline.
+
+        Raises:
+            RateLimitExceeded: if the wait would exceed `max_wait_seconds`.
+        """
+        if max_wait_seconds is None or max_wait_seconds > self.max_wait_seconds:
+            max_wait_seconds = self.max_wait_seconds
+        while True:
+            with self._lock:
+                wait_seconds = self._reserve(self._clock())
+            if not wait_seconds:
+                return
+            if wait_seconds > max_wait_seconds:
+                raise RateLimitExceeded(wait_seconds)
+            print(f"Rate limit: waiting {wait_seconds:.1f}s...")
+            self._sleep(wait_seconds)
+
+    def update_from_headers(self, headers: Mapping[str, str]) -> None:
+        """
+        Update limits and usages with those reported in a Strava API response.
+        """
+        limits = _parse_header(headers.get("X-RateLimit-Limit"))
+        usages = _parse_header(headers.get("X-RateLimit-Usage"))
+        with self._lock:
+            self._roll_windows(self._clock())
+            if limits:
+                self.limits = limits
+            if usages:
+                # The local usage can be higher, as it includes the calls in flight.
+                self.usages = [max(u, r) for u, r in zip(self.usages, usages)]
+
+    def on_too_many_requests(self, headers: Mapping[str, str]) -> None:
+        """
+        Mark as exhausted the window that caused a 429 response, so the next calls
+         wait until it resets.
+        """
+        self.update_from_headers(headers)
+        with self._lock:
+            exhausted = [i for i in range(2) if self.usages[i] >= self.limits[i]]
+            # If the headers do not tell, assume it is the 15-minute window.
+            for i in exhausted or [0]:
+                self.usages[i] = self.limits[i]
+        print(f"Rate limit: got 429 Too Many Requests, usages={self.usages}")
+
+    def _reserve(self, now: float) -> float:
+        """
+        Reserve a call and return 0, or return the seconds to wait before retrying.
+        """
+        self._roll_windows(now)
+
+        seconds_to_reset = [
+            self._window_starts[i] + self.WINDOW_SECONDS[i] - now for i in range(2)
+        ]
+        remainings = [self.limits[i] - self.usages[i] for i in range(2)]
+        for i in range(2):
+            if remainings[i] <= 0:
+                return max(seconds_to_reset[i], 0.001)
+
+        # Much budget left: no pacing.
+        if remainings[0] > self.limits[0] * self.reserve_fraction:
+            self.usages = [u + 1 for u in self.usages]
+            return 0
+
+        # Token bucket: the refill rate spreads the remaining 15-minute budget over
+        #  the time left in the 15-minute window.
+        rate = remainings[0] / max(seconds_to_reset[0], 1)
+        self._tokens = min(
+            self.burst, self._tokens + (now - self._last_refill_ts) * rate
+        )
+        self._last_refill_ts = now
+        if self._tokens < 1:
+            return (1 - self._tokens) / rate
+
+        self._tokens -= 1
+        self.usages = [u + 1 for u in self.usages]
+        return 0
+
+    def _roll_windows(self, now: float) -> None:
+        for i in range(2):
+            window_start = self._get_window_start(i, now)
+            if window_start != self._window_starts[i]:
+                self._window_starts[i] = window_start
+                self.usages[i] = 0
+
+    def _get_window_start(self, window_index: int, now: float) -> float:
+        window_seconds = self.WINDOW_SECONDS[window_index]
+        return math.floor(now / window_seconds) * window_seconds
+
+
+def _parse_header(value: str | None) -> list[int] | None:
+    # Eg. "200,2000".
+    try:
+        values = [int(v) for v in value.split(",")]
+    except (AttributeError, ValueError):
+        return None
+    return values[:2] if len(values) >= 2 else None
+
+
+_rate_limiter = RateLimiter()
+
+
+def get_rate_limiter() -> RateLimiter:
+    return _rate_limiter
+
+
+class RateLimitExceeded(Exception):
+    def __init__(self, retry_after_seconds: float):
+        self.retry_after_seconds = retry_after_seconds
+
+    def __str__(self) -> str:
+        return (
+            "Strava API rate limit exceeded, retry after"
+            f" {self.retry_after_seconds:.0f}s"
+        )
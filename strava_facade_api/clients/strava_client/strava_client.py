@@ -1,25 +1,196 @@
-from datetime import datetime, timedelta
-from typing import Optional
+import os
+from collections import deque
+from datetime import datetime
+from time import monotonic
+from typing import TYPE_CHECKING, Iterable, Iterator, Optional
 
-import requests
+from ...utils import datetime_utils, deadline, json_utils
+from ...utils.cache_utils import LruTtlCache
+from . import rate_limiter
+from .activity_summary import DEFAULT_FIELDS, ActivitySummary
+from .activity_type_index import ActivityTypeIndex
+from .duplicate_detector import DuplicateDetector
+from .time_index import TimeIndex
 
-from ...utils import datetime_utils
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+    import requests
+
+# Note: `requests` (and `http_session` which imports it) are imported lazily, on
+#  the 1st request, as they are expensive to import and would slow down the
+#  cold start of every Lambda importing this module. Same for `concurrent.futures`
+#  (which imports `logging`), used only by the bulk methods.
+
+BASE_URL = "https://www.strava.com/api/v3"
+# Max number of times a request is retried after a 429 Too Many Requests.
+MAX_RATE_LIMIT_RETRIES = 2
+# Bytes read at a time from the streamed responses.
+STREAM_CHUNK_SIZE = 64 * 1024
+# Strava API max page size.
+MAX_RESULTS_PER_PAGE = 200
+# A paginated listing (see `list_activity_summaries_page()`) stops scanning after
+#  this many activities, or when less than this many seconds are left before the
+#  invocation's deadline, and returns a shorter page: filtering by type a long
+#  history could take many requests.
+MAX_SCANNED_ACTIVITIES = int(os.getenv("STRAVA_MAX_SCANNED_ACTIVITIES", 1000))
+SCAN_MIN_REMAINING_SECONDS = 5
+
+# Activity details cached by activity id. It is stored at module level, so it is
+#  shared by all clients and survives across warm Lambda invocations.
+_details_cache = LruTtlCache(
+    maxsize=int(os.getenv("STRAVA_DETAILS_CACHE_MAXSIZE", 256)),
+    ttl_seconds=float(os.getenv("STRAVA_DETAILS_CACHE_TTL_SECONDS", 5 * 60)),
+)
+# HTTP validators: url -> (ETag, parsed body), used to make conditional requests
+#  (If-None-Match) so Strava answers 304 Not Modified, with no body, when the
+#  resource has not changed. No TTL, as entries are validated at every request.
+_etag_cache = LruTtlCache(maxsize=int(os.getenv("STRAVA_ETAG_CACHE_MAXSIZE", 512)))
+# The types and start times of the activities seen, to narrow the type-filtered
+#  listings. It is stored at module level, like the caches above.
+_activity_type_index = ActivityTypeIndex()
+_duplicate_detector = DuplicateDetector(_activity_type_index)
 
 
 class StravaClient:
     def __init__(self, access_token: str) -> None:
         self.access_token = access_token
 
+    @staticmethod
+    def get_details_cache_stats() -> dict[str, int]:
+        """
+        Size, hits, misses and evictions of the activity details cache.
+        """
+        return _details_cache.get_stats()
+
+    @staticmethod
+    def clear_details_cache() -> None:
+        _details_cache.clear()
+
+    @staticmethod
+    def get_etag_cache_stats() -> dict[str, int]:
+        """
+        Size, hits, misses and evictions of the ETag cache. A hit is a request
+         sent with If-None-Match, not necessarily a 304.
+        """
+        return _etag_cache.get_stats()
+
+    @staticmethod
+    def clear_etag_cache() -> None:
+        _etag_cache.clear()
+
+    @staticmethod
+    def get_activity_type_index_stats() -> dict:
+        """
+        Size and covered time ranges of the activity type index.
+        """
+        return _activity_type_index.get_stats()
+
+    @staticmethod
+    def clear_activity_type_index() -> None:
+        _activity_type_index.clear()
+        _duplicate_detector.clear_stats()
+
+    @staticmethod
+    def get_duplicate_detector_stats() -> dict[str, int]:
+        """
+        Number of duplicate checks answered locally (by the index) and remotely.
+        """
+        return _duplicate_detector.get_stats()
+
+    def _request(self, method: str, url: str, **kwargs) -> "requests.Response":
+        """
+        Make an HTTP request to Strava API using the shared connection-pooled
+         session, so warm invocations skip the DNS lookup and TCP/TLS handshakes.
+        Calls are paced by the shared rate limiter and, on a 429, retried after
+         the rate limit window resets.
+        Calls have connect and read timeouts ending before the invocation's
+         deadline (see `deadline`).
+
+        Calls are rejected while the circuit breaker is open, during Strava
+         outages.
+
+        Raises:
+            rate_limiter.RateLimitExceeded: if the rate limit window does not
+             reset within the rate limiter's max wait (or before the deadline).
+            circuit_breaker.CircuitOpen: if the circuit breaker is open.
+            deadline.DeadlineExceeded: if there is not enough time left for the
+             call.
+            requests.Timeout: if the call times out.
+        """
+        from . import circuit_breaker, http_session
+
+        headers = {
+            "Authorization": f"Bearer {self.access_token}",
+            **kwargs.pop("headers", dict()),
+        }
+        limiter = rate_limiter.get_rate_limiter()
+        breaker = circuit_breaker.get_circuit_breaker()
+        for _ in range(MAX_RATE_LIMIT_RETRIES + 1):
+            limiter.acquire(max_wait_seconds=deadline.get_remaining_seconds())
+            timeout = deadline.get_timeout(step=f"{method} {url}")
+            breaker.before_call()
+            t0 = monotonic()
+            try:
+                response = http_session.get_session().request(
+                    method, url, headers=headers, timeout=timeout, **kwargs
+                )
+            except Exception:
+                breaker.record(False, monotonic() - t0)
+                raise
+            # A 4xx means that Strava is up.
+            breaker.record(response.status_code < 500, monotonic() - t0)
+            print(
+                f"{method} {response.url} -> {response.status_code}"
+                f" in {response.elapsed.total_seconds() * 1000:.0f}ms"
+                f" (connection reused: {http_session.is_connection_reused(response)})"
+            )
+            if response.status_code != 429:
+                limiter.update_from_headers(response.headers)
+                break
+            limiter.on_too_many_requests(response.headers)
+        return response
+
+    def _get_json(self, url: str) -> dict | list:
+        """
+        GET the given url and return the parsed JSON body, using a conditional
+         request when the resource was fetched before: if Strava answers 304 Not
+         Modified, the body parsed last time is returned, saving the download and
+         the JSON decoding.
+        Note: do not mutate the returned object, as it is shared by the cache.
+
+        Raises:
+            requests.HTTPError: on a 4xx or 5xx response.
+        """
+        cached = _etag_cache.get(url)
+        kwargs = dict()
+        if cached is not None:
+            kwargs["headers"] = {"If-None-Match": cached[0]}
+        response = self._request("GET", url, **kwargs)
+        if response.status_code == 304 and cached is not None:
+            return cached[1]
+        response.raise_for_status()
+        data = response.json()
+        etag = response.headers.get("ETag")
+        if etag:
+            _etag_cache.set(url, (etag, data))
+        else:
+            _etag_cache.delete(url)
+        return data
+
     def list_activities(
         self,
         after_ts: int | float | None = None,
         before_ts: int | float | None = None,
         activity_type: str | None = None,
         n_results_per_page: int | None = None,
+        page: int | None = None,
     ) -> list[Optional[dict]]:
         """
         List all my activities and filter by date, as supported by Strava API.
         Also, filter by activity_type, but this is just a Python filtering (NOT supported by Strava API).
+        Note: this is a single page of results (the 1st one, unless `page` is
+         given), use `iter_activities()` to get all of them.
 
         Docs:
             - Authentication: https://developers.strava.com/docs/authentication/
@@ -91,28 +262,15 @@ class StravaClient:
             ]
 
         """
-        print(f"Listing my activities...")
-        url = "https://www.strava.com/api/v3/athlete/activities"
-        headers = {"Authorization": f"Bearer {self.access_token}"}
-        payload = {}
-        if before_ts:
-            payload["before"] = int(before_ts)
-        if after_ts:
-            payload["after"] = int(after_ts)
-        if n_results_per_page:
-            payload["per_page"] = n_results_per_page
-        response = requests.get(url, headers=headers, params=payload)
-        response.raise_for_status()
-
-        data = response.json()
-        if activity_type:
-            data = []
-            for activity in response.json():
-                if (
-                    activity.get("type") == activity_type
-                    or activity.get("sport_type") == activity_type
-                ):
-                    data.append(activity)
+        # The filter is applied while the page is decoded, so the activities of
+        #  other types are never all in memory.
+        data = [
+            activity
+            for activity in self._iter_activities_page(
+                after_ts, before_ts, n_results_per_page, page
+            )
+            if not activity_type or _is_activity_type(activity, activity_type)
+        ]
         # A single `activity` is a dict like:
         # {
         #     "resource_state": 2,
@@ -174,20 +332,353 @@ class StravaClient:
         # }
         return data
 
-    def get_activity_details(self, activity_id: int) -> dict:
+    def iter_activities(
+        self,
+        after_ts: int | float | None = None,
+        before_ts: int | float | None = None,
+        activity_type: str | None = None,
+        n_results_per_page: int = 200,
+    ) -> Iterator[dict]:
+        """
+        Iterate over all my activities, walking all the pages of Strava API lazily.
+        A page is requested only when the previous one has been consumed, and it
+         is decoded incrementally, so memory stays flat (about 1 activity at a
+         time) and no more requests are made when the caller stops iterating.
+        Same filters as `list_activities()`. With `activity_type` (and `after_ts`),
+         the time ranges listed recently are narrowed, with the activity type
+         index, to the sub-windows with activities of that type.
+
+        Args:
+            after_ts: timestamp used to filter activities (eg. 1691704800).
+            before_ts: timestamp used to filter activities (eg. 1691791199).
+            activity_type: eg. "WeightTraining", just a Python filtering.
+            n_results_per_page: page size, Strava API max is 200.
+        """
+        # Strava's results are sorted by start date (oldest first) only if
+        #  `after_ts` is given, so only then the listing can be split in windows.
+        if not activity_type or after_ts is None:
+            yield from self._iter_window(
+                after_ts, before_ts, activity_type, n_results_per_page
+            )
+            return
+
+        if before_ts is None:
+            before_ts = datetime_utils.now_utc().timestamp()
+        windows = _activity_type_index.plan_windows(
+            after_ts, before_ts, activity_type, n_results_per_page
+        )
+        # The windows might overlap.
+        yielded_ids = set()
+        for window_after_ts, window_before_ts in windows:
+            for activity in self._iter_window(
+                window_after_ts, window_before_ts, activity_type, n_results_per_page
+            ):
+                if activity["id"] not in yielded_ids:
+                    yielded_ids.add(activity["id"])
+                    yield activity
+
+    def _iter_window(
+        self,
+        after_ts: int | float | None,
+        before_ts: int | float | None,
+        activity_type: str | None,
+        n_results_per_page: int,
+    ) -> Iterator[dict]:
+        """
+        Iterate over all my activities in the given time range, walking all the
+         pages, and record the listing in the activity type index.
+        """
+        listed_at = datetime_utils.now_utc().timestamp()
+        activity_ids = []
+        page = 1
+        while True:
+            n_activities = 0
+            # Activities are yielded as they are decoded, so not even a full page
+            #  is kept in memory.
+            for activity in self._iter_activities_page(
+                after_ts, before_ts, n_results_per_page, page
+            ):
+                n_activities += 1
+                activity_ids.append(activity["id"])
+                if not activity_type or _is_activity_type(activity, activity_type):
+                    yield activity
+            # A short page is the last one.
+            if n_activities < n_results_per_page:
+                break
+            page += 1
+        # Activities starting after the listing (eg. uploaded right after it) were
+        #  not listed: the range is covered only up to when it was listed.
+        _activity_type_index.record_listing(
+            after_ts or 0,
+            min(before_ts, listed_at) if before_ts is not None else listed_at,
+            activity_ids,
+            listed_at,
+        )
+
+    def _iter_activities_page(
+        self,
+        after_ts: int | float | None,
+        before_ts: int | float | None,
+        n_results_per_page: int | None,
+        page: int | None,
+    ) -> Iterator[dict]:
+        """
+        Iterate over a page of my activities, decoding the response incrementally
+         as its bytes arrive, instead of buffering it and decoding it at once with
+         `response.json()`: a page of 200 activities, with their polylines, can be
+         several MBs.
+        """
+        print(f"Listing my activities...")
+        url = f"{BASE_URL}/athlete/activities"
+        payload = {}
+        if before_ts is not None:
+            payload["before"] = int(before_ts)
+        # Even if 0: only with `after` Strava sorts the results oldest first.
+        if after_ts is not None:
+            payload["after"] = int(after_ts)
+        if n_results_per_page:
+            payload["per_page"] = n_results_per_page
+        if page:
+            payload["page"] = page
+        response = self._request("GET", url, params=payload, stream=True)
+        try:
+            response.raise_for_status()
+            for activity in json_utils.iter_json_array(
+                response.iter_content(chunk_size=STREAM_CHUNK_SIZE)
+            ):
+                _activity_type_index.add(activity)
+                yield activity
+        finally:
+            # Release the connection to the pool, even if the caller stops early.
+            response.close()
+
+    def iter_activity_summaries(
+        self,
+        after_ts: int | float | None = None,
+        before_ts: int | float | None = None,
+        activity_type: str | None = None,
+        fields: tuple[str, ...] = DEFAULT_FIELDS,
+        do_keep_raw=False,
+    ) -> Iterator[ActivitySummary]:
+        """
+        Like `iter_activities()`, but yield compact `ActivitySummary` objects with
+         only the given fields, so that many activities can be held in memory.
+
+        Args:
+            after_ts: timestamp used to filter activities (eg. 1691704800).
+            before_ts: timestamp used to filter activities (eg. 1691791199).
+            activity_type: eg. "WeightTraining", just a Python filtering.
+            fields: the projected fields, see `activity_summary.FIELDS`.
+            do_keep_raw: True to keep the full raw activities, as JSON strings.
+        """
+        for activity in self.iter_activities(after_ts, before_ts, activity_type):
+            yield ActivitySummary.from_dict(activity, fields, do_keep_raw)
+
+    def list_activity_summaries_page(
+        self,
+        after_ts: int | float = 0,
+        before_ts: int | float | None = None,
+        activity_type: str | None = None,
+        limit: int = 30,
+        after_id: int | None = None,
+        fields: tuple[str, ...] = DEFAULT_FIELDS,
+        max_scanned: int = MAX_SCANNED_ACTIVITIES,
+    ) -> tuple[list[ActivitySummary], Optional[tuple[float, int]]]:
+        """
+        A page of at most `limit` activity summaries, oldest first, for a
+         paginated listing: the page starts after the given position and it
+         returns the position to continue from.
+        The time spent on a page is bounded: it stops scanning activities (which,
+         with `activity_type`, might be many more than the ones returned) after
+         `max_scanned` of them or close to the invocation's deadline, and then it
+         returns a shorter page (even empty) and the position reached.
+
+        Args:
+            after_ts: timestamp used to filter activities (eg. 1691704800).
+            before_ts: timestamp used to filter activities (eg. 1691791199).
+            activity_type: eg. "WeightTraining", just a Python filtering.
+            limit: max number of activities in the page.
+            after_id: with `after_ts`, the position of the last activity returned
+             by the previous page: (start timestamp, id).
+            fields: the projected fields, see `activity_summary.FIELDS`.
+            max_scanned: max number of activities scanned.
+
+        Returns:
+            the summaries and the position, (start timestamp, id) of the last
+             activity scanned, to continue from, None if there are no more.
+        """
+        # With a position, list also the activities starting at the same time, as
+        #  Strava's `after` is exclusive, and skip those already returned.
+        list_after_ts = after_ts - 1 if after_id is not None else after_ts
+        n_results_per_page = (
+            MAX_RESULTS_PER_PAGE
+            if activity_type
+            else min(limit + 1, MAX_RESULTS_PER_PAGE)
+        )
+        summaries = []
+        position = None
+        n_scanned = 0
+        page = 1
+        while True:
+            n_activities = 0
+            for activity in self._iter_activities_page(
+                list_after_ts, before_ts, n_results_per_page, page
+            ):
+                n_activities += 1
+                start_ts = datetime_utils.iso_to_timestamp(activity["start_date"])
+                if after_id is not None and (start_ts, activity["id"]) <= (
+                    after_ts,
+                    after_id,
+                ):
+                    continue
+                # There is at least 1 more activity.
+                if len(summaries) == limit or n_scanned == max_scanned:
+                    return summaries, position
+                n_scanned += 1
+                position = (start_ts, activity["id"])
+                if not activity_type or _is_activity_type(activity, activity_type):
+                    summaries.append(ActivitySummary.from_dict(activity, fields))
+            # A short page is the last one.
+            if n_activities < n_results_per_page:
+                return summaries, None
+            remaining_seconds = deadline.get_remaining_seconds()
+            if (
+                remaining_seconds is not None
+                and remaining_seconds < SCAN_MIN_REMAINING_SECONDS
+            ):
+                print(f"Stopped scanning with {remaining_seconds:.1f}s left")
+                return summaries, position
+            page += 1
+
+    def list_activities_parallel(
+        self,
+        after_ts: int | float,
+        before_ts: int | float | None = None,
+        activity_type: str | None = None,
+        n_windows: int = 8,
+        max_workers: int = 4,
+    ) -> list[dict]:
+        """
+        List all my activities in the given time range, fetching them in parallel.
+        The range is split in `n_windows` sub-windows, all of them are fetched (with
+         all their pages) concurrently on a bounded thread pool and finally the
+         results are merged, without duplicates, ordered by start date (oldest
+         first).
+        It is much faster than `iter_activities()` for long ranges (eg. a
+         full-history sync) as the pages are not fetched sequentially.
+
+        Args:
+            after_ts: timestamp used to filter activities (eg. 1691704800).
+            before_ts: timestamp used to filter activities (eg. 1691791199),
+             defaults to now.
+            activity_type: eg. "WeightTraining", just a Python filtering.
+            n_windows: number of sub-windows the time range is split into.
+            max_workers: max number of concurrent requests.
+        """
+        if before_ts is None:
+            before_ts = datetime_utils.now_utc().timestamp()
+        after_ts, before_ts = int(after_ts), int(before_ts)
+        n_windows = max(1, min(n_windows, before_ts - after_ts))
+
+        # The windows' inner edges overlap by 1 sec so no activity starting exactly
+        #  at an edge is missed, whether Strava's filters are inclusive or not.
+        step = (before_ts - after_ts) / n_windows
+        edges = [after_ts + round(step * i) for i in range(n_windows)] + [before_ts]
+        windows = [
+            (
+                edges[i] - 1 if i > 0 else edges[i],
+                edges[i + 1] + 1 if i < n_windows - 1 else edges[i + 1],
+            )
+            for i in range(n_windows)
+        ]
+
+        def list_window(window: tuple[int, int]) -> list[dict]:
+            return list(self.iter_activities(window[0], window[1], activity_type))
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = executor.map(list_window, windows)
+
+            activities_by_id = dict()
+            for window_activities in results:
+                for activity in window_activities:
+                    activities_by_id[activity["id"]] = activity
+        return sorted(activities_by_id.values(), key=lambda a: a["start_date"])
+
+    def find_latest_activity(
+        self,
+        after_ts: int | float,
+        before_ts: int | float,
+        activity_type: str,
+    ) -> Optional[dict]:
+        """
+        Find the latest activity (by start date) of the given type in the given
+         time range. None if not found.
+        If the time range was listed recently, the activity is found in the
+         activity type index, with a binary search, and only its details are
+         fetched (likely from the cache); only the rest of the range, after it was
+         listed, is listed again. Otherwise, or if not found in the index (eg.
+         uploaded after the listing), it is found with a listing.
+
+        Returns: the activity details, if found in the index, or its summary.
+        """
+        covered_until = _activity_type_index.get_covered_until(after_ts, before_ts)
+        if covered_until is not None:
+            # The activities uploaded since the range was listed are not in the
+            #  index, and they are the latest ones.
+            if covered_until < before_ts:
+                activities = [
+                    activity
+                    for activity in self.iter_activities(covered_until - 1, before_ts)
+                    if _is_activity_type(activity, activity_type)
+                ]
+                if activities:
+                    return max(activities, key=lambda a: a["start_date"])
+            activity_id = _activity_type_index.find_latest(
+                after_ts, covered_until, activity_type
+            )
+            if activity_id:
+                print(f"Found latest activity in index: {activity_id}")
+                return self.get_activity_details(activity_id)
+
+        # Not narrowed by type with the index (see `iter_activities()`), as the
+        #  index might be missing it.
+        activities = [
+            activity
+            for activity in self.iter_activities(after_ts, before_ts)
+            if _is_activity_type(activity, activity_type)
+        ]
+        if not activities:
+            return None
+        return max(activities, key=lambda a: a["start_date"])
+
+    def get_activity_details(self, activity_id: int, do_use_cache=True) -> dict:
         """
         Get details for the given activity id.
+        The details are cached in memory (LRU with TTL), and the cache is updated
+         with the details returned by `update_activity()` and `create_activity()`.
+        Note: do not mutate the returned dict, as it might be shared by the cache.
 
         Docs:
             - Authentication: https://developers.strava.com/docs/authentication/
             - Get Activity API: https://developers.strava.com/docs/reference/#api-Activities-getActivityById
+
+        Args:
+            activity_id: the activity id.
+            do_use_cache: if False, the details are always fetched from Strava
+             (and the cache updated).
         """
+        if do_use_cache:
+            details = _details_cache.get(activity_id)
+            if details is not None:
+                print(f"Got activity details for id={activity_id} from cache")
+                return details
+
         print(f"Getting activity details for id={activity_id}...")
-        url = f"https://www.strava.com/api/v3/activities/{activity_id}"
-        headers = {"Authorization": f"Bearer {self.access_token}"}
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()
-        details = response.json()
+        url = f"{BASE_URL}/activities/{activity_id}"
+        details = self._get_json(url)
+        _details_cache.set(activity_id, details)
         # `details` is a dict like:
         # {
         #     "resource_state": 3,
@@ -317,7 +808,78 @@ class StravaClient:
         # }
         return details
 
-    def update_activity(self, activity_id: int, data: dict) -> int:
+    def get_activities_details_many(
+        self,
+        activity_ids: Iterable[int],
+        max_workers: int = 4,
+        do_yield_as_completed=False,
+        do_use_cache=True,
+    ) -> Iterator["ActivityDetailsResult"]:
+        """
+        Get details for many activities, fetching them concurrently.
+        At most `max_workers` requests are in flight at any time and the ids are
+         consumed lazily, so `activity_ids` can be a generator.
+        A failure for an id does not stop the batch: it is recorded in the
+         result for that id.
+
+        Args:
+            activity_ids: the ids of the activities.
+            max_workers: max number of concurrent requests.
+            do_yield_as_completed: if True, results are yielded as soon as they
+             are ready, otherwise in the same order as `activity_ids`.
+            do_use_cache: if False, the details are always fetched from Strava
+             (see `get_activity_details()`).
+        """
+
+        from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+        import requests
+
+        from . import circuit_breaker
+
+        def get_details(activity_id: int) -> ActivityDetailsResult:
+            try:
+                details = self.get_activity_details(
+                    activity_id, do_use_cache=do_use_cache
+                )
+            except (
+                requests.RequestException,
+                deadline.DeadlineExceeded,
+                circuit_breaker.CircuitOpen,
+                rate_limiter.RateLimitExceeded,
+            ) as exc:
+                print(f"Failed getting activity details for id={activity_id}: {exc}")
+                return ActivityDetailsResult(activity_id, exception=exc)
+            return ActivityDetailsResult(activity_id, details=details)
+
+        activity_ids = iter(activity_ids)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+
+            def submit_next() -> Optional["Future"]:
+                for activity_id in activity_ids:
+                    return executor.submit(get_details, activity_id)
+                return None
+
+            if do_yield_as_completed:
+                pending = set()
+                while True:
+                    while len(pending) < max_workers and (future := submit_next()):
+                        pending.add(future)
+                    if not pending:
+                        return
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield future.result()
+            else:
+                pending = deque()
+                while True:
+                    while len(pending) < max_workers and (future := submit_next()):
+                        pending.append(future)
+                    if not pending:
+                        return
+                    yield pending.popleft().result()
+
+    def update_activity(self, activity_id: int, data: dict) -> dict:
         """
         Update an activity by its id.
 
@@ -326,11 +888,17 @@ class StravaClient:
             - Update Activity API: https://developers.strava.com/docs/reference/#api-Activities-updateActivityById
         """
         print(f"Updating activity id={activity_id}...")
-        url = f"https://www.strava.com/api/v3/activities/{activity_id}"
-        headers = {"Authorization": f"Bearer {self.access_token}"}
-        response = requests.put(url, headers=headers, data=data)
+        deadline.check(deadline.MIN_WRITE_SECONDS, step="update activity")
+        url = f"{BASE_URL}/activities/{activity_id}"
+        response = self._request("PUT", url, data=data)
         response.raise_for_status()
-        return response.json()
+        details = response.json()
+        # Write-through: the response includes the updated details.
+        _details_cache.set(activity_id, details)
+        _activity_type_index.add(details)
+        # The ETag of the previous version is stale.
+        _etag_cache.delete(url)
+        return details
 
     def create_activity(
         self,
@@ -351,32 +919,23 @@ class StravaClient:
         """
         print(f"Creating new activity...")
 
-        # Parse start_date.
-        if isinstance(start_date, str):
-            try:
-                start_date = datetime.fromisoformat(start_date)
-            except ValueError as exc:
-                raise InvalidDatetime(start_date) from exc
-
-        if isinstance(start_date, datetime):
-            if datetime_utils.is_naive(start_date):
-                raise NaiveDatetime(start_date)
-        else:
-            raise InvalidDatetime(start_date)
+        start_date = _parse_start_date(start_date)
         start_date_local = start_date.isoformat()
 
         # Try to detect if there is already a duplicate, so an existing activity
-        #  of the same type within 1 hour and 15 mins.
+        #  of the same type overlapping in time.
         if do_detect_duplicates:
-            after_ts = (start_date - timedelta(hours=1, minutes=15)).timestamp()
-            before_ts = (start_date + timedelta(hours=1, minutes=15)).timestamp()
-            activities = self.list_activities(after_ts, before_ts, sport_type)
-            if activities:
-                print(f"Found possible duplicate: {activities[0]['id']}")
-                raise PossibleDuplicatedActivity(activities[0]["id"])
-
-        url = f"https://www.strava.com/api/v3/activities"
-        headers = {"Authorization": f"Bearer {self.access_token}"}
+            duplicate_id = _duplicate_detector.find_duplicate(
+                sport_type,
+                start_date.timestamp(),
+                duration_seconds,
+                self.iter_activities,
+            )
+            if duplicate_id:
+                print(f"Found possible duplicate: {duplicate_id}")
+                raise PossibleDuplicatedActivity(duplicate_id)
+
+        url = f"{BASE_URL}/activities"
         data = dict(
             name=name,
             sport_type=sport_type,
@@ -385,7 +944,10 @@ class StravaClient:
         )
         if description:
             data["description"] = description
-        response = requests.post(url, headers=headers, data=data)
+        deadline.check(deadline.MIN_WRITE_SECONDS, step="create activity")
+        response = self._request("POST", url, data=data)
+
+        import requests
 
         try:
             response.raise_for_status()
@@ -398,6 +960,8 @@ class StravaClient:
             raise
 
         details = response.json()
+        _details_cache.set(details["id"], details)
+        _activity_type_index.add(details)
         # `details` is a dict like:
         # {
         #     "resource_state": 3,
@@ -467,6 +1031,327 @@ class StravaClient:
         # }
         return details
 
+    def create_activities(
+        self,
+        activities: list[dict],
+        max_workers: int = 4,
+        do_detect_duplicates=False,
+    ) -> list["BatchItemResult"]:
+        """
+        Create many new activities, concurrently.
+        A failure for an activity does not stop the batch: it is recorded in the
+         result for that activity. Results are in the same order as `activities`.
+
+        The duplicate detection is shared by the whole batch: a single listing of
+         the batch's time span warms the activity type index, then each activity
+         is checked against it (so against Strava) and against the previous
+         activities in the batch (by start date).
+
+        Args:
+            activities: dicts with the args of `create_activity()`: name,
+             sport_type, start_date, duration_seconds, description.
+            max_workers: max number of concurrent requests.
+            do_detect_duplicates: True to skip the activities overlapping an
+             existing activity, or another one in the batch, of the same type.
+        """
+        results: list[Optional["BatchItemResult"]] = [None] * len(activities)
+        start_dates = dict()
+        for i, activity in enumerate(activities):
+            try:
+                start_dates[i] = _parse_start_date(activity["start_date"])
+            except (InvalidDatetime, NaiveDatetime) as exc:
+                results[i] = BatchItemResult(i, exception=exc)
+
+        if do_detect_duplicates and start_dates:
+            self._detect_batch_duplicates(activities, start_dates, results)
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        import requests
+
+        from . import circuit_breaker
+
+        def create(i: int) -> "BatchItemResult":
+            activity = activities[i]
+            try:
+                details = self.create_activity(
+                    activity["name"],
+                    activity["sport_type"],
+                    start_dates[i],
+                    activity["duration_seconds"],
+                    activity.get("description"),
+                )
+            except (
+                # Eg. `PossibleDuplicatedActivity` on Strava's 409.
+                BaseStravaClientException,
+                requests.RequestException,
+                deadline.DeadlineExceeded,
+                circuit_breaker.CircuitOpen,
+                rate_limiter.RateLimitExceeded,
+            ) as exc:
+                print(f"Failed creating activity {i}: {exc!r}")
+                return BatchItemResult(i, exception=exc)
+            return BatchItemResult(i, details=details)
+
+        to_create = [i for i in start_dates if results[i] is None]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for result in executor.map(create, to_create):
+                results[result.index] = result
+        return results
+
+    def update_activity_descriptions(
+        self,
+        items: list[dict],
+        max_workers: int = 4,
+    ) -> list["BatchItemResult"]:
+        """
+        Update the description (and optionally the name) of many existing
+         activities, each found as the latest activity of a type in a time range,
+         like `domain.update_activity_description()` does for one.
+        A failure for an item does not stop the batch: it is recorded in the result
+         for that item. Results are in the same order as `items`.
+
+        Instead of a listing, a details fetch and an update per item, serially:
+         - the activities are found with a single listing covering all the items'
+          time ranges (or only the rest of them, after they were listed, if the
+          activity type index covers them already);
+         - the details, to check the existing descriptions, are fetched
+          concurrently;
+         - the updates are made concurrently.
+
+        Args:
+            items: dicts with keys: after_ts, before_ts, activity_type, description,
+             name (optional), do_stop_if_description_not_null (optional, default
+             True).
+            max_workers: max number of concurrent requests.
+        """
+        results: list[Optional["BatchItemResult"]] = [None] * len(items)
+        if not items:
+            return []
+
+        # A single listing for all the items: it warms the activity type index.
+        after_ts = min(item["after_ts"] for item in items)
+        before_ts = max(item["before_ts"] for item in items)
+        covered_until = _activity_type_index.get_covered_until(after_ts, before_ts)
+        # Where the listing starts, None if not listed.
+        listed_after_ts = None
+        if covered_until is None:
+            listed_after_ts = after_ts
+        elif covered_until < before_ts:
+            # Only the rest of the range, after it was listed: the activities
+            #  uploaded since are not in the index.
+            listed_after_ts = covered_until - 1
+        if listed_after_ts is not None:
+            for _ in self.iter_activities(listed_after_ts, before_ts):
+                pass
+
+        # Find the activity for each item, in the index.
+        found_ids = {
+            i: _activity_type_index.find_latest(
+                item["after_ts"], item["before_ts"], item["activity_type"]
+            )
+            for i, item in enumerate(items)
+        }
+        # Not found in the index fed by a previous listing: maybe uploaded after
+        #  it. So list again (once for all those items) and look them up again.
+        missed = [
+            i
+            for i, activity_id in found_ids.items()
+            if not activity_id
+            and (listed_after_ts is None or items[i]["after_ts"] < listed_after_ts)
+        ]
+        if missed:
+            for _ in self.iter_activities(
+                min(items[i]["after_ts"] for i in missed),
+                max(items[i]["before_ts"] for i in missed),
+            ):
+                pass
+            for i in missed:
+                item = items[i]
+                found_ids[i] = _activity_type_index.find_latest(
+                    item["after_ts"], item["before_ts"], item["activity_type"]
+                )
+
+        activity_ids: dict[int, int] = dict()  # Item index -> activity id.
+        item_by_activity_id: dict[int, int] = dict()
+        for i, activity_id in found_ids.items():
+            if not activity_id:
+                results[i] = BatchItemResult(i, exception=ActivityNotFound())
+            elif activity_id in item_by_activity_id:
+                # 2 items for the same activity: the 1st one wins.
+                results[i] = BatchItemResult(
+                    i, exception=DuplicatedBatchItem(item_by_activity_id[activity_id])
+                )
+            else:
+                activity_ids[i] = activity_id
+                item_by_activity_id[activity_id] = i
+
+        # Ensure the activities have no description, when required.
+        to_check = [
+            activity_ids[i]
+            for i in activity_ids
+            if items[i].get("do_stop_if_description_not_null", True)
+        ]
+        # Not from the cache: the description might have been edited on Strava
+        #  since. A conditional request, so cheap when it was not.
+        for result in self.get_activities_details_many(
+            to_check, max_workers, do_use_cache=False
+        ):
+            i = item_by_activity_id[result.activity_id]
+            if not result.is_ok:
+                results[i] = BatchItemResult(i, exception=result.exception)
+            elif result.details["description"]:
+                results[i] = BatchItemResult(
+                    i,
+                    exception=ActivityHasDescription(
+                        result.activity_id, result.details["description"]
+                    ),
+                )
+
+        from concurrent.futures import ThreadPoolExecutor
+
+        import requests
+
+        from . import circuit_breaker
+
+        def update(i: int) -> "BatchItemResult":
+            data = {"description": items[i]["description"]}
+            if items[i].get("name"):
+                data["name"] = items[i]["name"]
+            try:
+                details = self.update_activity(activity_ids[i], data)
+            except (
+                requests.RequestException,
+                deadline.DeadlineExceeded,
+                circuit_breaker.CircuitOpen,
+                rate_limiter.RateLimitExceeded,
+            ) as exc:
+                print(f"Failed updating activity id={activity_ids[i]}: {exc!r}")
+                return BatchItemResult(i, exception=exc)
+            return BatchItemResult(i, details=details)
+
+        to_update = [i for i in activity_ids if results[i] is None]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for result in executor.map(update, to_update):
+                results[result.index] = result
+        return results
+
+    def _detect_batch_duplicates(
+        self,
+        activities: list[dict],
+        start_dates: dict[int, datetime],
+        results: list[Optional["BatchItemResult"]],
+    ) -> None:
+        """
+        Set the results of the activities that are duplicates, in Strava or in the
+         batch.
+        """
+        intervals = {
+            i: (
+                start_dates[i].timestamp(),
+                activities[i]["duration_seconds"],
+            )
+            for i in start_dates
+        }
+        # A single listing for the whole batch.
+        _duplicate_detector.warm(
+            min(start_ts for start_ts, _ in intervals.values()),
+            max(start_ts + duration for start_ts, duration in intervals.values()),
+            self.iter_activities,
+        )
+
+        # The activities in the batch not duplicated so far.
+        batch_index = TimeIndex()
+        for i in sorted(intervals, key=lambda i: intervals[i][0]):
+            start_ts, duration = intervals[i]
+            sport_type = activities[i]["sport_type"]
+            end_ts = start_ts + max(duration, 1)
+            found = batch_index.find_overlapping(start_ts, end_ts, sport_type)
+            if found:
+                results[i] = BatchItemResult(
+                    i, exception=DuplicatedBatchItem(found[0][1])
+                )
+                continue
+            duplicate_id = _duplicate_detector.find_duplicate(
+                sport_type, start_ts, duration, self.iter_activities
+            )
+            if duplicate_id:
+                print(f"Found possible duplicate for activity {i}: {duplicate_id}")
+                results[i] = BatchItemResult(
+                    i, exception=PossibleDuplicatedActivity(duplicate_id)
+                )
+                continue
+            batch_index.add(i, start_ts, [sport_type], end_ts=end_ts)
+
+
+def _parse_start_date(start_date: datetime | str) -> datetime:
+    """
+    Raises:
+        InvalidDatetime: if not a datetime or an ISO 8601 string.
+        NaiveDatetime: if the datetime has no timezone.
+    """
+    if isinstance(start_date, str):
+        try:
+            start_date = datetime.fromisoformat(start_date)
+        except ValueError as exc:
+            raise InvalidDatetime(start_date) from exc
+
+    if isinstance(start_date, datetime):
+        if datetime_utils.is_naive(start_date):
+            raise NaiveDatetime(start_date)
+    else:
+        raise InvalidDatetime(start_date)
+    return start_date
+
+
+class BatchItemResult:
+    """
+    The outcome of a single item in a bulk request (eg. creating or updating an
+     activity): either `details` or `exception` is set.
+    """
+
+    def __init__(
+        self,
+        index: int,
+        details: dict | None = None,
+        exception: Exception | None = None,
+    ) -> None:
+        self.index = index
+        self.details = details
+        self.exception = exception
+
+    @property
+    def is_ok(self) -> bool:
+        return self.exception is None
+
+
+class ActivityDetailsResult:
+    """
+    The outcome of getting the details of a single activity in a bulk request:
+     either `details` or `exception` is set.
+    """
+
+    def __init__(
+        self,
+        activity_id: int,
+        details: dict | None = None,
+        exception: Exception | None = None,
+    ) -> None:
+        self.activity_id = activity_id
+        self.details = details
+        self.exception = exception
+
+    @property
+    def is_ok(self) -> bool:
+        return self.exception is None
+
+
+def _is_activity_type(activity: dict, activity_type: str) -> bool:
+    return (
+        activity.get("type") == activity_type
+        or activity.get("sport_type") == activity_type
+    )
+
 
 class BaseStravaClientException(Exception):
     pass
@@ -485,3 +1370,18 @@ class NaiveDatetime(BaseStravaClientException):
 class PossibleDuplicatedActivity(BaseStravaClientException):
     def __init__(self, activity_id: str | None = None):
         self.activity_id = activity_id
+
+
+class DuplicatedBatchItem(BaseStravaClientException):
+    def __init__(self, index: int):
+        self.index = index
+
+
+class ActivityNotFound(BaseStravaClientException):
+    pass
+
+
+class ActivityHasDescription(BaseStravaClientException):
+    def __init__(self, activity_id: int, description: str):
+        self.activity_id = activity_id
+        self.description = description
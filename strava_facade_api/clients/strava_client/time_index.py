@@ -0,0 +1,167 @@
+"""
+An in-memory index of activities by start time, partitioned by activity type, that
+ answers time range and "nearest activity to time T" queries in O(log n), with a
+ binary search (`bisect`) on sorted arrays.
+It is also an interval index: it answers "activities overlapping a time interval"
+ queries, in O(log n + k), as the activities overlapping an interval all start
+ within the longest activity duration before it.
+
+Each partition is made of parallel lists, the start timestamps (sorted), the
+ activity ids and the end timestamps: bisecting a list of floats is faster, and
+ takes less memory, than bisecting a list of tuples.
+There is a partition per activity type (both `type` and `sport_type`, eg. "Ride"
+ and "MountainBikeRide") and one with all the activities.
+
+See `scripts/benchmark_time_index.py` for the lookup cost.
+"""
+
+from bisect import bisect_left, bisect_right
+from typing import Iterable, Optional
+
+# The key of the partition with all the activities.
+ALL_TYPES = None
+
+
+class TimeIndex:
+    """
+    Not thread-safe, the owner must serialize the access.
+    """
+
+    def __init__(self) -> None:
+        # Activity type -> (sorted start timestamps, activity ids, end timestamps).
+        self._partitions: dict[
+            str | None, tuple[list[float], list[int], list[float]]
+        ] = dict()
+        # Activity type -> the longest duration ever added (never decreased, on
+        #  removals, so always an upper bound).
+        self._max_durations: dict[str | None, float] = dict()
+
+    def add(
+        self,
+        activity_id: int,
+        start_ts: float,
+        activity_types: Iterable[str | None],
+        end_ts: float | None = None,
+    ) -> None:
+        """
+        Args:
+            activity_id: the activity id.
+            start_ts: the activity start timestamp.
+            activity_types: the activity `type` and `sport_type`.
+            end_ts: the activity end timestamp, defaults to `start_ts`.
+        """
+        end_ts = start_ts if end_ts is None else end_ts
+        for key in self._get_keys(activity_types):
+            starts, ids, ends = self._partitions.setdefault(key, ([], [], []))
+            i = bisect_right(starts, start_ts)
+            starts.insert(i, start_ts)
+            ids.insert(i, activity_id)
+            ends.insert(i, end_ts)
+            self._max_durations[key] = max(
+                self._max_durations.get(key, 0), end_ts - start_ts
+            )
+
+    def remove(
+        self, activity_id: int, start_ts: float, activity_types: Iterable[str | None]
+    ) -> None:
+        """
+        Remove an activity, given the same args it was added with.
+        """
+        for key in self._get_keys(activity_types):
+            if key not in self._partitions:
+                continue
+            starts, ids, ends = self._partitions[key]
+            i = bisect_left(starts, start_ts)
+            while i < len(starts) and starts[i] == start_ts:
+                if ids[i] == activity_id:
+                    del starts[i], ids[i], ends[i]
+                    break
+                i += 1
+
+    def find_range(
+        self,
+        after_ts: float,
+        before_ts: float,
+        activity_type: str | None = ALL_TYPES,
+    ) -> list[tuple[float, int]]:
+        """
+        The activities in the given time range (inclusive), as (start timestamp,
+         activity id), sorted by start timestamp.
+        """
+        starts, ids, _ = self._partitions.get(activity_type, ([], [], []))
+        i = bisect_left(starts, after_ts)
+        j = bisect_right(starts, before_ts)
+        return list(zip(starts[i:j], ids[i:j]))
+
+    def find_latest(
+        self,
+        after_ts: float,
+        before_ts: float,
+        activity_type: str | None = ALL_TYPES,
+    ) -> Optional[tuple[float, int]]:
+        """
+        The latest activity in the given time range (inclusive), as (start
+         timestamp, activity id), None if not found.
+        """
+        starts, ids, _ = self._partitions.get(activity_type, ([], [], []))
+        j = bisect_right(starts, before_ts)
+        if j == 0 or starts[j - 1] < after_ts:
+            return None
+        return starts[j - 1], ids[j - 1]
+
+    def find_nearest(
+        self,
+        ts: float,
+        activity_type: str | None = ALL_TYPES,
+        max_distance_seconds: float | None = None,
+    ) -> Optional[tuple[float, int]]:
+        """
+        The activity starting nearest to the given timestamp, as (start timestamp,
+         activity id), None if not found (within `max_distance_seconds`, if given).
+        """
+        starts, ids, _ = self._partitions.get(activity_type, ([], [], []))
+        i = bisect_left(starts, ts)
+        # The nearest is either the 1st one starting at or after `ts`, or the
+        #  previous one.
+        candidates = [k for k in (i - 1, i) if 0 <= k < len(starts)]
+        if not candidates:
+            return None
+        k = min(candidates, key=lambda k: abs(starts[k] - ts))
+        if max_distance_seconds is not None and abs(starts[k] - ts) > (
+            max_distance_seconds
+        ):
+            return None
+        return starts[k], ids[k]
+
+    def find_overlapping(
+        self,
+        after_ts: float,
+        before_ts: float,
+        activity_type: str | None = ALL_TYPES,
+    ) -> list[tuple[float, int]]:
+        """
+        The activities whose time interval overlaps the given one (touching is not
+         overlapping, but starting at the same time is), as (start timestamp,
+         activity id), sorted by start timestamp.
+        """
+        starts, ids, ends = self._partitions.get(activity_type, ([], [], []))
+        # Only the activities starting within the longest duration before the
+        #  interval can overlap it.
+        i = bisect_left(starts, after_ts - self._max_durations.get(activity_type, 0))
+        j = bisect_left(starts, before_ts)
+        return [
+            (starts[k], ids[k])
+            for k in range(i, j)
+            if starts[k] >= after_ts or ends[k] > after_ts
+        ]
+
+    def clear(self) -> None:
+        self._partitions.clear()
+        self._max_durations.clear()
+
+    def __len__(self) -> int:
+        return len(self._partitions.get(ALL_TYPES, ([], [], []))[0])
+
+    @staticmethod
+    def _get_keys(activity_types: Iterable[str | None]) -> set[str | None]:
+        return {ALL_TYPES} | {t for t in activity_types if t}
@@ -1,51 +1,273 @@
+import fcntl
 import json
-from time import time
+import os
+import random
+import tempfile
+import threading
+from collections import Counter
+from time import sleep, time
 from typing import Optional
 
-import requests
+from ...utils import deadline
+from ..aws_parameter_store_client.aws_parameter_store_client import (
+    BaseParameterStoreClientException,
+    ParameterAlreadyExists,
+    ParameterNotFound,
+    ParameterStoreClient,
+    ParameterStoreThrottled,
+)
 
-from ..aws_parameter_store_client.aws_parameter_store_client import ParameterStoreClient
-
-TOKEN_JSON_PARAMETER_STORE_KEY_PATH = "/strava-facade-api/production/strava-api-token-json"
-CLIENT_ID_PARAMETER_STORE_KEY_PATH = "/strava-facade-api/production/strava-api-client-id"
-CLIENT_SECRET_PARAMETER_STORE_KEY_PATH = "/strava-facade-api/production/strava-api-client-secret"
+TOKEN_JSON_PARAMETER_STORE_KEY_PATH = (
+    "/strava-facade-api/production/strava-api-token-json"
+)
+CLIENT_ID_PARAMETER_STORE_KEY_PATH = (
+    "/strava-facade-api/production/strava-api-client-id"
+)
+CLIENT_SECRET_PARAMETER_STORE_KEY_PATH = (
+    "/strava-facade-api/production/strava-api-client-secret"
+)
+# A lock held by the Lambda instance refreshing the token, so concurrent instances do
+#  not all refresh it (and overwrite each other's refresh token).
+REFRESH_LOCK_PARAMETER_STORE_KEY_PATH = (
+    "/strava-facade-api/production/strava-api-token-refresh-lock"
+)
 
 
 class TokenManager:
-    SECRET_FILE = "secret"
+    # The token is stored in 3 tiers, each one checked (and, if valid, promoted to
+    #  the tiers above) before the next one:
+    #  - memory: lost when the Lambda's execution environment is recycled;
+    #  - a file in /tmp: survives as long as the execution environment's disk, so
+    #     also when the Python module state is lost (eg. after an error);
+    #  - AWS Parameter Store: the source of truth, shared by all instances.
+    TIERS = ("memory", "file", "parameter_store")
+    SECRET_FILE = os.getenv(
+        "STRAVA_TOKEN_FILE",
+        os.path.join(tempfile.gettempdir(), "strava-facade-api-token.json"),
+    )
+    # A token is considered expired this many seconds before its `expires_at`, so
+    #  it does not expire in the middle of a request.
+    EXPIRY_SKEW_SECONDS = int(os.getenv("STRAVA_TOKEN_EXPIRY_SKEW_SECONDS", 300))
+
+    # The token is kept in memory, at class level, so it is part of the Lambda's
+    #  execution environment and reused across warm invocations.
+    _cached_token: dict | None = None
+    # Only 1 thread at a time reads (and, if expired, refreshes) the token.
+    _refresh_lock = threading.Lock()
+    # Hits and misses per tier, eg. `{("memory", "hit"): 3}`.
+    _tier_stats = Counter()
+    _tier_stats_lock = threading.Lock()
+
+    # A refresh lock older than this was left by a crashed instance. Longer than the
+    #  longest Lambda timeout (29 secs, see `serverless.yml`), and so than a refresh
+    #  (its request alone can take up to the connect + read timeouts): the lock of a
+    #  live instance is never broken, so the token is never refreshed twice (which
+    #  would invalidate the 1st refresh token).
+    REFRESH_LOCK_TTL_SECONDS = 30
+    # How long and how often to wait for the refresh by another instance: the
+    #  polling interval starts at REFRESH_POLL_SECONDS and doubles at every poll, up
+    #  to REFRESH_MAX_POLL_SECONDS, with jitter, so that many waiting instances do
+    #  not poll Parameter Store in lockstep (and get throttled).
+    REFRESH_WAIT_SECONDS = 15
+    REFRESH_POLL_SECONDS = 0.2
+    REFRESH_MAX_POLL_SECONDS = 2
+    # The client id and secret are cached in memory for this long.
+    CLIENT_CREDENTIALS_CACHE_TTL_SECONDS = 24 * 60 * 60
 
     def __init__(self) -> None:
         self.token = None
+        # The version of the token parameter in AWS Parameter Store.
+        self.token_version = None
 
     @staticmethod
     def get_access_token() -> str:
         """
-        Get a valid access token as stored in AWS Parameter Store.
+        Get a valid access token from memory or, if not there or expiring, from
+         the file in /tmp or, if not there, as stored in AWS Parameter Store.
         Or, if expired, refresh it and store it in AWS Parameter Store.
         It required the client id and secret to be stored in AWS Parameter Store.
 
+        Raises:
+            TokenManagerException: if the token can not be read or refreshed,
+             including on AWS Parameter Store errors.
+
         Docs:
             - Authentication: https://developers.strava.com/docs/authentication/
         """
         token_manager = TokenManager()
-        token_manager._read_token_from_aws_parameter_store()
+        token_manager.token = TokenManager._cached_token
+        if token_manager.token and not token_manager._is_expired():
+            TokenManager._count_tier_stat("memory", "hit")
+            return token_manager.token["access_token"]
 
-        if token_manager.token and token_manager._is_expired():
-            print("Access token expired, refreshing...")
-            token_manager._refresh_from_strava()
-            token_manager._write_token_to_aws_parameter_store()
-        elif not token_manager.token:
-            raise TokenManagerException("Token not found in Parameter Store")
+        # Single-flight within this process: concurrent threads wait for the 1st
+        #  one and then reuse its token.
+        with TokenManager._refresh_lock:
+            token_manager.token = TokenManager._cached_token
+            if token_manager.token and not token_manager._is_expired():
+                TokenManager._count_tier_stat("memory", "hit")
+                return token_manager.token["access_token"]
+            TokenManager._count_tier_stat("memory", "miss")
+
+            if token_manager._read_valid_token_from_file():
+                TokenManager._count_tier_stat("file", "hit")
+            else:
+                TokenManager._count_tier_stat("file", "miss")
+                try:
+                    token_manager._read_or_refresh_token()
+                except BaseParameterStoreClientException as exc:
+                    raise TokenManagerException(str(exc)) from exc
+                token_manager._write_token_to_file()
+            TokenManager._cached_token = token_manager.token
 
         return token_manager.token["access_token"]
 
+    @staticmethod
+    def clear_cache() -> None:
+        """
+        Clear the memory tier (not the file tier) and the stats.
+        """
+        TokenManager._cached_token = None
+        with TokenManager._tier_stats_lock:
+            TokenManager._tier_stats.clear()
+
+    @staticmethod
+    def get_tier_stats() -> dict[str, dict[str, int]]:
+        """
+        Hits and misses per tier, eg.:
+            {"memory": {"hits": 3, "misses": 1}, "file": {"hits": 1, "misses": 0}, ...}
+        """
+        with TokenManager._tier_stats_lock:
+            return {
+                tier: {
+                    "hits": TokenManager._tier_stats[(tier, "hit")],
+                    "misses": TokenManager._tier_stats[(tier, "miss")],
+                }
+                for tier in TokenManager.TIERS
+            }
+
+    @staticmethod
+    def _count_tier_stat(tier: str, outcome: str) -> None:
+        with TokenManager._tier_stats_lock:
+            TokenManager._tier_stats[(tier, outcome)] += 1
+
+    def _read_or_refresh_token(self) -> dict:
+        """
+        Read the token from AWS Parameter Store and, if expired, refresh it.
+        The refresh is coordinated across concurrent Lambda instances:
+         - only the instance holding the refresh lock (a parameter in AWS Parameter
+            Store, created only if it does not exist) refreshes the token;
+         - the others wait and then reuse the token it wrote;
+         - the token parameter's version is compared to the one read at the
+            beginning, to detect a refresh done by another instance (eg. between
+            the 1st read and the lock acquisition), and then reuse its token.
+        Note: this is not a compare-and-set, as AWS Parameter Store can not write
+         a parameter only if it has a given version: the refresh lock is what
+         prevents concurrent writes.
+        """
+        self._read_token_from_aws_parameter_store()
+        if not self.token:
+            self._count_tier_stat("parameter_store", "miss")
+            raise TokenManagerException("Token not found in Parameter Store")
+        if not self._is_expired():
+            self._count_tier_stat("parameter_store", "hit")
+            return self.token
+
+        self._count_tier_stat("parameter_store", "miss")
+        print("Access token expired, refreshing...")
+        read_version = self.token_version
+        wait_seconds = self.REFRESH_WAIT_SECONDS
+        # Do not wait for another instance beyond the invocation's deadline.
+        remaining_seconds = deadline.get_remaining_seconds()
+        if remaining_seconds is not None:
+            wait_seconds = min(wait_seconds, remaining_seconds)
+        wait_until = time() + wait_seconds
+        poll_seconds = self.REFRESH_POLL_SECONDS
+        while True:
+            if self._acquire_refresh_lock():
+                try:
+                    # The token might have been refreshed by another instance
+                    #  after it was read and before the lock was acquired.
+                    self._read_token_from_aws_parameter_store()
+                    if self.token_version != read_version and not self._is_expired():
+                        print("Access token refreshed by another instance")
+                        return self.token
+                    self._refresh_from_strava()
+                    self._write_token_to_aws_parameter_store()
+                    return self.token
+                finally:
+                    self._release_refresh_lock()
+
+            # Another instance is refreshing: wait for it and then reuse its token.
+            remaining_wait_seconds = wait_until - time()
+            if remaining_wait_seconds <= 0:
+                raise TokenManagerException(
+                    "Timed out waiting for the token refresh by another instance"
+                )
+            # Exponential backoff with jitter.
+            poll_wait_seconds = random.uniform(poll_seconds / 2, poll_seconds)
+            sleep(min(poll_wait_seconds, remaining_wait_seconds))
+            poll_seconds = min(poll_seconds * 2, self.REFRESH_MAX_POLL_SECONDS)
+            try:
+                self._read_token_from_aws_parameter_store()
+            except ParameterStoreThrottled:
+                continue
+            if self.token_version != read_version and not self._is_expired():
+                print("Access token refreshed by another instance")
+                return self.token
+
+    def _acquire_refresh_lock(self) -> bool:
+        ssm_client = ParameterStoreClient()
+        try:
+            ssm_client.put_parameter(
+                REFRESH_LOCK_PARAMETER_STORE_KEY_PATH,
+                str(time() + self.REFRESH_LOCK_TTL_SECONDS),
+            )
+            return True
+        except ParameterAlreadyExists:
+            pass
+        except ParameterStoreThrottled:
+            # Most likely many instances are trying to acquire it: not acquired.
+            return False
+
+        # Break a lock left by a crashed instance (its value is its expiry time).
+        try:
+            lock_expires_at = float(
+                ssm_client.get_parameter(REFRESH_LOCK_PARAMETER_STORE_KEY_PATH)
+            )
+        except (ParameterNotFound, ParameterStoreThrottled):
+            # Just released, or to be checked at the next poll.
+            return False
+        except ValueError:
+            lock_expires_at = 0
+        if lock_expires_at < time():
+            print("Breaking an expired token refresh lock")
+            self._release_refresh_lock()
+        return False
+
+    def _release_refresh_lock(self) -> None:
+        try:
+            ParameterStoreClient().delete_parameter(
+                REFRESH_LOCK_PARAMETER_STORE_KEY_PATH
+            )
+        except ParameterNotFound:
+            pass
+        except ParameterStoreThrottled:
+            # It expires anyway, after REFRESH_LOCK_TTL_SECONDS.
+            print("Failed releasing the token refresh lock: throttled")
+
     def _refresh_from_strava(self) -> dict:
-        client_id = ParameterStoreClient().get_parameter(
-            CLIENT_ID_PARAMETER_STORE_KEY_PATH
-        )
-        client_secret = ParameterStoreClient().get_secret(
-            CLIENT_SECRET_PARAMETER_STORE_KEY_PATH
+        # Both in a single request, and cached as they rarely change.
+        credentials = ParameterStoreClient().get_parameters_many(
+            [
+                CLIENT_ID_PARAMETER_STORE_KEY_PATH,
+                CLIENT_SECRET_PARAMETER_STORE_KEY_PATH,
+            ],
+            with_decryption=True,
+            cache_ttl_seconds=self.CLIENT_CREDENTIALS_CACHE_TTL_SECONDS,
         )
+        client_id = credentials[CLIENT_ID_PARAMETER_STORE_KEY_PATH]
+        client_secret = credentials[CLIENT_SECRET_PARAMETER_STORE_KEY_PATH]
 
         url = "https://www.strava.com/oauth/token"
         payload = {
@@ -54,7 +276,12 @@ class TokenManager:
             "refresh_token": self.token["refresh_token"],
             "grant_type": "refresh_token",
         }
-        response = requests.post(url, data=payload)
+        # Imported lazily as it imports `requests`, expensive to import.
+        from . import http_session
+
+        response = http_session.get_session().post(
+            url, data=payload, timeout=deadline.get_timeout(step="token refresh")
+        )
         response.raise_for_status()
         self.token = response.json()
         if not self.token.get("access_token"):
@@ -71,7 +298,7 @@ class TokenManager:
         # `expires_at` is in seconds since the epoch.
         # Eg. 1691977531 for Monday, August 14, 2023 1:45:31 AM at GMT timezone.
         expires_at = self.token.get("expires_at")
-        return expires_at <= time()
+        return expires_at - self.EXPIRY_SKEW_SECONDS <= time()
 
     def _read_token_from_file(self) -> Optional[dict]:
         try:
@@ -96,12 +323,51 @@ class TokenManager:
             )
         return self.token
 
+    def _read_valid_token_from_file(self) -> Optional[dict]:
+        """
+        Read the token from the file, if it is there, valid and not expired.
+        """
+        self.token = None
+        try:
+            self._read_token_from_file()
+        except TokenManagerException as exc:
+            print(f"Ignoring invalid token file: {exc}")
+            self.token = None
+        if self.token and self._is_expired():
+            self.token = None
+        return self.token
+
     def _write_token_to_file(self) -> None:
-        with open(self.SECRET_FILE, "w") as fout:
-            fout.write(json.dumps(self.token, indent=4))
+        """
+        Write the token to the file atomically: it is written to a temp file which
+         then replaces the actual file, so readers never see a partial file.
+        Concurrent writers (eg. processes sharing /tmp) are serialized by a lock.
+        """
+        directory = os.path.dirname(os.path.abspath(self.SECRET_FILE))
+        try:
+            with open(f"{self.SECRET_FILE}.lock", "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                fd, tmp_path = tempfile.mkstemp(dir=directory)
+                try:
+                    # `mkstemp` creates the file readable by the owner only.
+                    with os.fdopen(fd, "w") as fout:
+                        fout.write(json.dumps(self.token, indent=4))
+                    os.replace(tmp_path, self.SECRET_FILE)
+                except BaseException:
+                    os.unlink(tmp_path)
+                    raise
+        except OSError as exc:
+            # The file is just a cache.
+            print(f"Failed writing the token file: {exc}")
 
     def _read_token_from_aws_parameter_store(self) -> Optional[dict]:
-        token = ParameterStoreClient().get_secret(TOKEN_JSON_PARAMETER_STORE_KEY_PATH)
+        try:
+            token, self.token_version = ParameterStoreClient().get_secret_with_version(
+                TOKEN_JSON_PARAMETER_STORE_KEY_PATH
+            )
+        except ParameterNotFound:
+            self.token = self.token_version = None
+            return None
         self.token = json.loads(token)
 
         if not self.token.get("access_token"):
@@ -117,11 +383,19 @@ class TokenManager:
         return self.token
 
     def _write_token_to_aws_parameter_store(self) -> None:
-        ParameterStoreClient().put_secret(
+        version = ParameterStoreClient().put_secret(
             TOKEN_JSON_PARAMETER_STORE_KEY_PATH,
             json.dumps(self.token, indent=4),
             do_overwrite=True,
         )
+        if self.token_version and version != self.token_version + 1:
+            # It should never happen while holding the refresh lock: the write is
+            #  not conditional, so it can only be reported.
+            print(
+                f"Token written concurrently by another instance: version={version}"
+                f" expected={self.token_version + 1}"
+            )
+        self.token_version = version
 
 
 class TokenManagerException(Exception):
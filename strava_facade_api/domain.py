@@ -1,18 +1,59 @@
+import functools
 from datetime import datetime
-from typing import Optional, Union
-
-import requests
+from typing import Callable, Optional, TypeVar, Union
 
 from . import domain_exceptions as exceptions
+from .activity_store import activity_store
+from .clients.strava_client.activity_summary import DEFAULT_FIELDS, FIELDS
+from .clients.strava_client.rate_limiter import RateLimitExceeded
 from .clients.strava_client.strava_client import (
+    ActivityHasDescription,
+    ActivityNotFound,
+    DuplicatedBatchItem,
     InvalidDatetime,
     NaiveDatetime,
     PossibleDuplicatedActivity,
     StravaClient,
 )
 from .clients.strava_client.token_manager import TokenManager, TokenManagerException
+from .utils import deadline
+
+T = TypeVar("T")
+
+
+def _fail_fast(fn: Callable[..., T]) -> Callable[..., T]:
+    """
+    Map the errors of the calls to Strava that fail fast to domain exceptions, so
+     the views can respond with a clean error:
+     - `DeadlineExceededError` when there is not enough time left, before the
+        invocation's deadline, for the next step or when a call times out (see
+        `utils.deadline`);
+     - `StravaUnavailableError` when the circuit breaker is open, during a Strava
+        outage (see `circuit_breaker`);
+     - `StravaRateLimitedError` when a Strava rate limit window is exhausted and
+        does not reset in time (see `rate_limiter`).
+    """
 
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs) -> T:
+        # Imported lazily, as they are expensive to import (see `StravaClient`).
+        import requests
 
+        from .clients.strava_client.circuit_breaker import CircuitOpen
+
+        try:
+            return fn(*args, **kwargs)
+        except (deadline.DeadlineExceeded, requests.Timeout) as exc:
+            raise exceptions.DeadlineExceededError(str(exc)) from exc
+        except CircuitOpen as exc:
+            raise exceptions.StravaUnavailableError(exc.retry_after_seconds) from exc
+        except RateLimitExceeded as exc:
+            raise exceptions.StravaRateLimitedError(exc.retry_after_seconds) from exc
+
+    return wrapper
+
+
+@_fail_fast
 def update_activity_description(
     after_ts: Union[int, float],
     before_ts: Union[int, float],
@@ -40,20 +81,31 @@ def update_activity_description(
         access_token = TokenManager.get_access_token()
     except TokenManagerException as exc:
         raise exceptions.StravaAuthenticationError(str(exc)) from exc
+    # Imported lazily, as it is expensive to import (see `StravaClient`).
+    import requests
+
     try:
         strava = StravaClient(access_token)
     except requests.HTTPError as exc:
         raise exceptions.StravaApiError(str(exc)) from exc
 
-    # Get all activities of the given type for the given day.
-    activities = strava.list_activities(after_ts, before_ts, activity_type)
-    if not activities:
+    # Get the latest activity of the given type for the given day.
+    store = None
+    if activity_store.is_enabled():
+        store = activity_store.ActivityStore(strava)
+    latest_activity = _find_latest_activity(
+        strava, store, after_ts, before_ts, activity_type
+    )
+    if not latest_activity:
         raise exceptions.NoActivityFound
 
-    # Get the latest of these activities and ensure it has no description.
-    latest_activity = activities[0]
+    # Ensure it has no description.
     if do_stop_if_description_not_null:
-        latest_activity_details = strava.get_activity_details(latest_activity["id"])
+        # Not from the cache: the description might have been edited on Strava
+        #  since. A conditional request, so cheap when it was not.
+        latest_activity_details = strava.get_activity_details(
+            latest_activity["id"], do_use_cache=False
+        )
         if latest_activity_details["description"]:
             raise exceptions.ActivityAlreadyHasDescription(
                 activity_id=latest_activity["id"],
@@ -66,9 +118,132 @@ def update_activity_description(
     if name:
         data["name"] = name
     updated_activity = strava.update_activity(latest_activity["id"], data)
+    if store:
+        store.upsert_activity_details(updated_activity)
     return updated_activity
 
 
+@_fail_fast
+def update_activity_descriptions(
+    items: list[dict],
+) -> list[dict | exceptions.BaseDomainException]:
+    """
+    Update the description of many existing Strava activities, eg. a backfill of a
+     month of workouts, with a single listing to find them all and concurrent
+     requests to check and update them.
+
+    Args:
+        items: dicts with the args of `update_activity_description()`: after_ts,
+         before_ts, activity_type, description, name (optional),
+         do_stop_if_description_not_null (optional, default True).
+
+    Returns:
+        for each item, in the same order: the updated activity or the domain
+         exception for its failure.
+    """
+    # Get an access token.
+    try:
+        access_token = TokenManager.get_access_token()
+    except TokenManagerException as exc:
+        raise exceptions.StravaAuthenticationError(str(exc)) from exc
+    # Imported lazily, as it is expensive to import (see `StravaClient`).
+    import requests
+
+    try:
+        strava = StravaClient(access_token)
+    except requests.HTTPError as exc:
+        raise exceptions.StravaApiError(str(exc)) from exc
+
+    results = strava.update_activity_descriptions(items)
+
+    if activity_store.is_enabled():
+        store = activity_store.ActivityStore(strava)
+        for result in results:
+            if result.is_ok:
+                store.upsert_activity_details(result.details)
+    return [
+        result.details if result.is_ok else _to_domain_exception(result.exception)
+        for result in results
+    ]
+
+
+def _find_latest_activity(
+    strava: StravaClient,
+    store: activity_store.ActivityStore | None,
+    after_ts: Union[int, float],
+    before_ts: Union[int, float],
+    activity_type: str,
+) -> Optional[dict]:
+    """
+    Find the latest activity of the given type in the given time range.
+    If the activity store is enabled, it is found locally, after an incremental sync
+     if the time range ends after the store's high-water mark: a later activity of
+     the same type might have just been uploaded (eg. by the Garmin watch). If the
+     store does not cover the time range, it is found by the client (in its
+     in-memory index, or remotely).
+    """
+    if store:
+        if not store.is_synced_until(before_ts):
+            store.sync()
+        activity = store.find_latest_activity(after_ts, before_ts, activity_type)
+        if activity or store.is_covering(after_ts):
+            return activity
+
+    return strava.find_latest_activity(after_ts, before_ts, activity_type)
+
+
+@_fail_fast
+def list_activities(
+    after_ts: Union[int, float] = 0,
+    before_ts: Union[int, float, None] = None,
+    activity_type: str | None = None,
+    limit: int = 30,
+    after_id: int | None = None,
+    fields: tuple[str, ...] = DEFAULT_FIELDS,
+) -> tuple[list[dict], Optional[tuple[float, int]]]:
+    """
+    A page of my activities, oldest first, as compact summaries with only the given
+     fields, for a paginated listing.
+    See `StravaClient.list_activity_summaries_page()`.
+
+    Args:
+        after_ts: timestamp used to filter activities (eg. 1691704800).
+        before_ts: timestamp used to filter activities (eg. 1691791199).
+        activity_type: eg. "WeightTraining".
+        limit: max number of activities in the page.
+        after_id: with `after_ts`, the position returned by the previous page.
+        fields: the projected fields.
+
+    Returns:
+        the activities and the position to continue from, None if no more.
+    """
+    for field in fields:
+        if field not in FIELDS:
+            raise exceptions.UnknownActivityFieldInput(field)
+
+    # Get an access token.
+    try:
+        access_token = TokenManager.get_access_token()
+    except TokenManagerException as exc:
+        raise exceptions.StravaAuthenticationError(str(exc)) from exc
+    # Imported lazily, as it is expensive to import (see `StravaClient`).
+    import requests
+
+    try:
+        strava = StravaClient(access_token)
+    except requests.HTTPError as exc:
+        raise exceptions.StravaApiError(str(exc)) from exc
+
+    try:
+        summaries, position = strava.list_activity_summaries_page(
+            after_ts, before_ts, activity_type, limit, after_id, fields
+        )
+    except requests.HTTPError as exc:
+        raise exceptions.StravaApiError(str(exc)) from exc
+    return [summary.to_dict() for summary in summaries], position
+
+
+@_fail_fast
 def create_activity(
     name: str,
     activity_type: str,
@@ -92,6 +267,9 @@ def create_activity(
         access_token = TokenManager.get_access_token()
     except TokenManagerException as exc:
         raise exceptions.StravaAuthenticationError(str(exc)) from exc
+    # Imported lazily, as it is expensive to import (see `StravaClient`).
+    import requests
+
     try:
         strava = StravaClient(access_token)
     except requests.HTTPError as exc:
@@ -114,3 +292,78 @@ def create_activity(
         raise exceptions.PossibleDuplicatedActivityFound(exc.activity_id) from exc
 
     return activity
+
+
+@_fail_fast
+def create_activities(
+    activities: list[dict],
+) -> list[dict | exceptions.BaseDomainException]:
+    """
+    Create many new activities, with a single duplicate check for the whole batch
+     (against the existing activities and within the batch).
+    A failure for an activity does not stop the batch.
+
+    Args:
+        activities: dicts with the args of `create_activity()`: name,
+         activity_type, start_date, duration_seconds, description.
+
+    Returns:
+        for each activity, in the same order: the created activity or the domain
+         exception for its failure.
+    """
+    # Get an access token.
+    try:
+        access_token = TokenManager.get_access_token()
+    except TokenManagerException as exc:
+        raise exceptions.StravaAuthenticationError(str(exc)) from exc
+    # Imported lazily, as it is expensive to import (see `StravaClient`).
+    import requests
+
+    try:
+        strava = StravaClient(access_token)
+    except requests.HTTPError as exc:
+        raise exceptions.StravaApiError(str(exc)) from exc
+
+    results = strava.create_activities(
+        [
+            dict(
+                name=activity["name"],
+                sport_type=activity["activity_type"],
+                start_date=activity["start_date"],
+                duration_seconds=activity["duration_seconds"],
+                description=activity.get("description"),
+            )
+            for activity in activities
+        ],
+        do_detect_duplicates=True,
+    )
+    return [
+        result.details if result.is_ok else _to_domain_exception(result.exception)
+        for result in results
+    ]
+
+
+def _to_domain_exception(exc: Exception) -> exceptions.BaseDomainException:
+    from .clients.strava_client.circuit_breaker import CircuitOpen
+
+    if isinstance(exc, InvalidDatetime):
+        return exceptions.InvalidDatetimeInput(exc.value)
+    if isinstance(exc, NaiveDatetime):
+        return exceptions.NaiveDatetimeInput(exc.value)
+    if isinstance(exc, PossibleDuplicatedActivity):
+        return exceptions.PossibleDuplicatedActivityFound(exc.activity_id)
+    if isinstance(exc, DuplicatedBatchItem):
+        return exceptions.DuplicatedBatchItemFound(exc.index)
+    if isinstance(exc, ActivityNotFound):
+        return exceptions.NoActivityFound()
+    if isinstance(exc, deadline.DeadlineExceeded):
+        return exceptions.DeadlineExceededError(str(exc))
+    if isinstance(exc, CircuitOpen):
+        return exceptions.StravaUnavailableError(exc.retry_after_seconds)
+    if isinstance(exc, RateLimitExceeded):
+        return exceptions.StravaRateLimitedError(exc.retry_after_seconds)
+    if isinstance(exc, ActivityHasDescription):
+        return exceptions.ActivityAlreadyHasDescription(
+            activity_id=exc.activity_id, description=exc.description
+        )
+    return exceptions.StravaApiError(str(exc))
@@ -33,3 +33,33 @@ class NaiveDatetimeInput(BaseDomainException):
 class PossibleDuplicatedActivityFound(BaseDomainException):
     def __init__(self, activity_id: str | None = None):
         self.activity_id = activity_id
+
+
+class DuplicatedBatchItemFound(BaseDomainException):
+    def __init__(self, index: int):
+        self.index = index
+
+
+class DeadlineExceededError(BaseDomainException):
+    pass
+
+
+class StravaUnavailableError(BaseDomainException):
+    def __init__(self, retry_after_seconds: float):
+        self.retry_after_seconds = retry_after_seconds
+
+
+class StravaRateLimitedError(BaseDomainException):
+    def __init__(self, retry_after_seconds: float):
+        self.retry_after_seconds = retry_after_seconds
+
+    def __str__(self) -> str:
+        return (
+            "Strava API rate limit exceeded, retry after"
+            f" {self.retry_after_seconds:.0f}s"
+        )
+
+
+class UnknownActivityFieldInput(BaseDomainException):
+    def __init__(self, field: str):
+        self.field = field
@@ -0,0 +1,76 @@
+import threading
+from collections import OrderedDict
+from time import monotonic
+from typing import Any, Hashable
+
+
+class LruTtlCache:
+    """
+    A thread-safe in-memory cache bounded in size, with Least Recently Used
+     eviction, and whose entries expire after a TTL.
+    It keeps hit, miss and eviction statistics.
+    """
+
+    def __init__(self, maxsize: int, ttl_seconds: float | None = None) -> None:
+        """
+        Args:
+            maxsize: max number of entries.
+            ttl_seconds: entries expire this many seconds after they are set,
+             None for no expiry.
+        """
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._data: OrderedDict[Hashable, tuple[Any, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.n_hits = 0
+        self.n_misses = 0
+        self.n_evictions = 0
+        self.n_expirations = 0
+
+    def get(self, key: Hashable, default=None) -> Any:
+        with self._lock:
+            try:
+                value, expires_at = self._data[key]
+            except KeyError:
+                self.n_misses += 1
+                return default
+            if expires_at < monotonic():
+                del self._data[key]
+                self.n_expirations += 1
+                self.n_misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.n_hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any) -> None:
+        expires_at = monotonic() + self.ttl_seconds if self.ttl_seconds else 1e100
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.n_evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.n_hits = self.n_misses = self.n_evictions = self.n_expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get_stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.n_hits,
+                "misses": self.n_misses,
+                "evictions": self.n_evictions,
+                "expirations": self.n_expirations,
+            }
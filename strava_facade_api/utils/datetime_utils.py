@@ -20,3 +20,11 @@ def is_naive(d: datetime | time):
     if d.tzinfo is None or d.tzinfo.utcoffset(None) is None:
         return True
     return False
+
+
+def iso_to_timestamp(value: str) -> float:
+    """
+    Convert an ISO 8601 string, like Strava's "2024-02-06T17:20:32Z", to a
+     timestamp.
+    """
+    return datetime.fromisoformat(value).timestamp()
@@ -0,0 +1,118 @@
+"""
+A per-invocation deadline, derived from the Lambda's remaining time, that bounds
+ every outgoing call.
+
+Without timeouts, a slow Strava response keeps the Lambda running (and billing)
+ until API Gateway gives up, after 29 secs, and the caller gets an opaque 504.
+ Instead, each handler starts the deadline with its context, and every call gets
+ connect and read timeouts that end before the deadline: a call that can not
+ complete in time fails fast, leaving the time to respond with a clean error.
+
+The deadline is stored at module level, not per thread, so it applies also to the
+ calls made by worker threads. A Lambda's execution environment handles 1
+ invocation at a time, and each invocation starts its own deadline.
+
+Config, via env vars:
+ - DEADLINE_SAFETY_MARGIN_MS: the time reserved to respond, subtracted from the
+    Lambda's remaining time. Default: 1000.
+ - HTTP_CONNECT_TIMEOUT_SECONDS: default connect timeout. Default: 3.05.
+ - HTTP_READ_TIMEOUT_SECONDS: default read timeout. Default: 10.
+"""
+
+import os
+from time import monotonic
+
+SAFETY_MARGIN_MS = int(os.getenv("DEADLINE_SAFETY_MARGIN_MS", 1000))
+# Slightly larger than a multiple of 3, TCP's default packet retransmission window.
+CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", 3.05))
+READ_TIMEOUT_SECONDS = float(os.getenv("HTTP_READ_TIMEOUT_SECONDS", 10))
+# A step is not started with less than this time left: it would most likely time
+#  out anyway.
+MIN_STEP_SECONDS = 0.5
+# A write is not started with less than this time left: if it timed out, it could
+#  have been applied or not.
+MIN_WRITE_SECONDS = 2
+
+# The deadline, as a `time.monotonic()` value, None when not set.
+_deadline: float | None = None
+
+
+def start(context, safety_margin_ms: int = SAFETY_MARGIN_MS) -> None:
+    """
+    Start the deadline of the current invocation.
+    No deadline when the context does not tell the remaining time (eg. in tests
+     or when running locally): the calls get the default timeouts.
+
+    Args:
+        context: the context passed to the Lambda.
+        safety_margin_ms: the time reserved to respond.
+    """
+    global _deadline
+
+    get_remaining_time_in_millis = getattr(
+        context, "get_remaining_time_in_millis", None
+    )
+    if get_remaining_time_in_millis is None:
+        _deadline = None
+        return
+    remaining_ms = get_remaining_time_in_millis() - safety_margin_ms
+    _deadline = monotonic() + remaining_ms / 1000
+
+
+def clear() -> None:
+    global _deadline
+
+    _deadline = None
+
+
+def get_remaining_seconds() -> float | None:
+    """
+    The time left before the deadline, None if no deadline.
+    """
+    if _deadline is None:
+        return None
+    return max(_deadline - monotonic(), 0)
+
+
+def check(min_seconds: float = MIN_STEP_SECONDS, step: str | None = None) -> None:
+    """
+    Fail fast if there is not enough time left for the next step.
+
+    Raises:
+        DeadlineExceeded: if less than `min_seconds` are left.
+    """
+    remaining_seconds = get_remaining_seconds()
+    if remaining_seconds is not None and remaining_seconds < min_seconds:
+        raise DeadlineExceeded(remaining_seconds, step)
+
+
+def get_timeout(
+    connect_timeout_seconds: float = CONNECT_TIMEOUT_SECONDS,
+    read_timeout_seconds: float = READ_TIMEOUT_SECONDS,
+    step: str | None = None,
+) -> tuple[float, float]:
+    """
+    The (connect, read) timeouts for the next call, as accepted by `requests`:
+     the defaults, shortened to end before the deadline.
+
+    Raises:
+        DeadlineExceeded: if there is not enough time left for a call.
+    """
+    check(step=step)
+    remaining_seconds = get_remaining_seconds()
+    if remaining_seconds is None:
+        return connect_timeout_seconds, read_timeout_seconds
+    return (
+        min(connect_timeout_seconds, remaining_seconds),
+        min(read_timeout_seconds, remaining_seconds),
+    )
+
+
+class DeadlineExceeded(Exception):
+    def __init__(self, remaining_seconds: float, step: str | None = None):
+        self.remaining_seconds = remaining_seconds
+        self.step = step
+
+    def __str__(self) -> str:
+        step = f" for {self.step}" if self.step else ""
+        return f"Not enough time left{step}: {self.remaining_seconds:.2f}s"
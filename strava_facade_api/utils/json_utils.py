@@ -0,0 +1,86 @@
+import codecs
+import json
+from typing import Any, Iterable, Iterator
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator[Any]:
+    """
+    Decode a JSON array incrementally, as its bytes arrive, and yield its elements
+     one by one. Unlike `json.loads()`, the whole document is never buffered: only
+     the element being decoded is, so the memory used is bounded by the size of
+     the largest element (plus a chunk), not by the size of the array.
+    Typically used with `requests.Response.iter_content()` for large responses.
+
+    Args:
+        chunks: the UTF-8 encoded JSON document, in chunks of any size.
+
+    Raises:
+        json.JSONDecodeError: if the document is not a valid JSON array.
+    """
+    utf8_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    pos = 0
+    is_started = False
+    is_done = False
+    chunks = iter(chunks)
+
+    while True:
+        try:
+            chunk = next(chunks)
+            is_last = False
+        except StopIteration:
+            chunk = b""
+            is_last = True
+        # Drop what has been decoded already, so the buffer does not grow.
+        buffer = buffer[pos:] + utf8_decoder.decode(chunk, final=is_last)
+        pos = 0
+
+        while True:
+            pos = _skip_whitespace(buffer, pos)
+            if pos == len(buffer):
+                break
+            if is_done:
+                raise json.JSONDecodeError("Extra data", buffer, pos)
+            if not is_started:
+                if buffer[pos] != "[":
+                    raise json.JSONDecodeError("Expecting '['", buffer, pos)
+                is_started = True
+                pos += 1
+                continue
+            if buffer[pos] == "]":
+                is_done = True
+                pos += 1
+                continue
+            if buffer[pos] == ",":
+                pos += 1
+                continue
+            try:
+                element, end = _decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if is_last:
+                    raise
+                # Incomplete element: wait for more bytes.
+                break
+            # An element might be a truncated scalar (eg. `12` of `123`, or `1` of
+            #  `1.5`): it is complete only if followed by `,` or `]`.
+            next_pos = _skip_whitespace(buffer, end)
+            if next_pos == len(buffer) or buffer[next_pos] not in ",]":
+                if is_last:
+                    raise json.JSONDecodeError("Expecting ',' delimiter", buffer, end)
+                break
+            pos = end
+            yield element
+
+        if is_last:
+            if not is_done:
+                raise json.JSONDecodeError("Unterminated array", buffer, pos)
+            return
+
+
+def _skip_whitespace(s: str, pos: int) -> int:
+    while pos < len(s) and s[pos] in _WHITESPACE:
+        pos += 1
+    return pos
@@ -2,6 +2,7 @@ import os
 from typing import Any, Dict
 
 from ..utils import datetime_utils
+from . import warmup
 
 # Objects declared outside of the Lambda's handler method are part of Lambda's
 # *execution environment*. This execution environment is sometimes reused for subsequent
@@ -85,6 +86,8 @@ def lambda_handler(event: Dict[str, Any], context) -> dict:
         }
     More info here: https://docs.aws.amazon.com/lambda/latest/dg/python-context.html
     """
+    if warmup.is_warmup_event(event):
+        return warmup.lambda_handler(event, context, do_prime_strava=False)
     print("AUTHORIZER: START")
 
     is_authorized = event["headers"].get("authorization") == os.getenv(
@@ -0,0 +1,188 @@
+import base64
+import binascii
+import json
+import os
+from typing import Any, Optional
+
+from .. import domain, domain_exceptions
+from ..utils import deadline
+from . import warmup
+from .http_response import BadRequest400Response, Ok200Response, to_error_response
+
+# Objects declared outside of the Lambda's handler method are part of Lambda's
+# *execution environment*. This execution environment is sometimes reused for subsequent
+# function invocations. See: create_activity_view.py.
+
+# The Lambda is configured with 0 retries. So do raise exceptions in the view.
+
+# The max number of activities in a single request: they are created with a few
+#  concurrent requests, and all within the Lambda timeout.
+MAX_BATCH_SIZE = int(os.getenv("CREATE_ACTIVITIES_MAX_BATCH_SIZE", 50))
+
+# Posted key -> domain key. All required but the description.
+ACTIVITY_KEYS = {
+    "name": "name",
+    "activityType": "activity_type",
+    "startDate": "start_date",
+    "durationSeconds": "duration_seconds",
+    "description": "description",
+}
+OPTIONAL_ACTIVITY_KEYS = ("description",)
+
+
+print("CREATE ACTIVITIES: LOAD")
+
+
+def lambda_handler(event: dict[str, Any], context) -> dict:
+    """
+    Create many new Strava activities, eg. a backfill of workouts.
+    It also tries to make sure that the new activities are not duplicates, of
+     existing activities or of each other, with a single scan of the batch's time
+     span.
+    A failure for an activity does not fail the request: the response has a result
+     for each activity, in the same order, with a status in "created", "duplicate"
+     and "error". An invalid activity (eg. a missing key) is an "error" with
+     "statusCode" 400.
+
+    Args:
+        event: an AWS event, eg. SNS Message.
+        context: the context passed to the Lambda.
+
+    Example:
+        $ curl -X POST https://q0adsu470c.execute-api.eu-south-1.amazonaws.com/create-activities \
+         -H 'Authorization: XXX' \
+         -d '{"activities": [{"name": "test1", "activityType": "WeightTraining", "startDate": "2024-07-25T18:17:33.983+02:00", "durationSeconds": 3960, "description": "My new descr"}, {"name": "test2", "activityType": "WeightTraining", "startDate": "2024-07-25T18:30:00+02:00", "durationSeconds": 600, "description": "My new descr"}]}'
+
+        {
+          "results": [
+            {
+              "index": 0,
+              "status": "created",
+              "activity": {"id": 11978303355, "name": "test1", ...}
+            },
+            {
+              "index": 1,
+              "status": "duplicate",
+              "duplicateItemIndex": 0
+            }
+          ]
+        }
+    """
+    if warmup.is_warmup_event(event):
+        return warmup.lambda_handler(event, context)
+    print("CREATE ACTIVITIES: START")
+    deadline.start(context)
+
+    body = event.get("body", "")
+    if event.get("isBase64Encoded"):
+        try:
+            body = base64.b64decode(body).decode()
+        except (UnicodeDecodeError, binascii.Error) as exc:
+            print(f"Posted invalid body: {exc}")
+            return BadRequest400Response("Invalid body").to_dict()
+    body = json.loads(body)
+
+    if not isinstance(body, dict):
+        return BadRequest400Response("Posted body must be a JSON object").to_dict()
+
+    items = body.get("activities")
+    if not items or not isinstance(items, list):
+        return BadRequest400Response(
+            "Posted body must include the key 'activities', a non-empty list"
+        ).to_dict()
+    if len(items) > MAX_BATCH_SIZE:
+        return BadRequest400Response(
+            f"Posted body can include at most {MAX_BATCH_SIZE} activities"
+        ).to_dict()
+
+    results: list[Optional[dict]] = [None] * len(items)
+    activities = []
+    # The index of the item of each activity.
+    item_indexes = []
+    for i, item in enumerate(items):
+        try:
+            activities.append(_to_activity(item))
+        except ValueError as exc:
+            results[i] = {
+                "index": i,
+                "status": "error",
+                "statusCode": 400,
+                "error": str(exc),
+            }
+        else:
+            item_indexes.append(i)
+
+    if activities:
+        try:
+            domain_results = domain.create_activities(activities)
+        except domain_exceptions.BaseDomainException as exc:
+            return to_error_response(exc).to_dict()
+        for index, result in zip(item_indexes, domain_results):
+            results[index] = _to_result(index, result, item_indexes)
+
+    return Ok200Response({"results": results}).to_dict()
+
+
+def _to_activity(item: Any) -> dict:
+    """
+    The args of `domain.create_activities()` for a posted activity.
+
+    Raises:
+        ValueError: if the posted activity is invalid.
+    """
+    if not isinstance(item, dict):
+        raise ValueError("Activity must be a JSON object")
+    for key in ACTIVITY_KEYS:
+        if key in OPTIONAL_ACTIVITY_KEYS and item.get(key) is None:
+            continue
+        if not item.get(key):
+            raise ValueError(f"Activity must include the key '{key}'")
+        if key != "durationSeconds" and not isinstance(item[key], str):
+            raise ValueError(f"Activity key '{key}' must be a string")
+    try:
+        duration_seconds = int(item["durationSeconds"])
+    except (ValueError, TypeError):
+        duration_seconds = 0
+    if isinstance(item["durationSeconds"], bool) or duration_seconds < 1:
+        raise ValueError("Activity key 'durationSeconds' must be a positive integer")
+    return {
+        **{domain_key: item.get(key) for key, domain_key in ACTIVITY_KEYS.items()},
+        "duration_seconds": duration_seconds,
+    }
+
+
+def _to_result(index: int, result: dict | Exception, item_indexes: list[int]) -> dict:
+    """
+    Args:
+        index: the index of the item.
+        result: the result of `domain.create_activities()` for the item.
+        item_indexes: the index of the item of each activity passed to
+         `domain.create_activities()`.
+    """
+    if isinstance(result, domain_exceptions.PossibleDuplicatedActivityFound):
+        return {
+            "index": index,
+            "status": "duplicate",
+            "duplicateActivityId": result.activity_id,
+        }
+    if isinstance(result, domain_exceptions.DuplicatedBatchItemFound):
+        return {
+            "index": index,
+            "status": "duplicate",
+            "duplicateItemIndex": item_indexes[result.index],
+        }
+    if isinstance(result, domain_exceptions.InvalidDatetimeInput):
+        return {
+            "index": index,
+            "status": "error",
+            "error": f"Invalid startDate: {result.value}",
+        }
+    if isinstance(result, domain_exceptions.NaiveDatetimeInput):
+        return {
+            "index": index,
+            "status": "error",
+            "error": f"Naive startDate: {result.value}",
+        }
+    if isinstance(result, Exception):
+        return {"index": index, "status": "error", "error": str(result)}
+    return {"index": index, "status": "created", "activity": result}
@@ -4,7 +4,14 @@ import json
 from typing import Any
 
 from .. import domain, domain_exceptions
-from .http_response import BadRequest400Response, NotFound404Response, Ok200Response
+from ..utils import deadline
+from . import warmup
+from .http_response import (
+    BadRequest400Response,
+    NotFound404Response,
+    Ok200Response,
+    to_error_response,
+)
 
 # Objects declared outside of the Lambda's handler method are part of Lambda's
 # *execution environment*. This execution environment is sometimes reused for subsequent
@@ -124,7 +131,10 @@ def lambda_handler(event: dict[str, Any], context) -> dict:
           "available_zones": []
         }
     """
+    if warmup.is_warmup_event(event):
+        return warmup.lambda_handler(event, context)
     print("CREATE ACTIVITY: START")
+    deadline.start(context)
 
     body = event.get("body", "")
     if event.get("isBase64Encoded"):
@@ -184,9 +194,7 @@ def lambda_handler(event: dict[str, Any], context) -> dict:
         return BadRequest400Response(
             f"Found a possible duplicate activity: {exc.activity_id}"
         ).to_dict()
-    except domain_exceptions.StravaAuthenticationError as exc:
-        return BadRequest400Response(str(exc)).to_dict()
-    except domain_exceptions.StravaApiError as exc:
-        return BadRequest400Response(str(exc)).to_dict()
+    except domain_exceptions.BaseDomainException as exc:
+        return to_error_response(exc).to_dict()
 
     return Ok200Response(new_activity).to_dict()
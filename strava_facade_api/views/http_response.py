@@ -1,7 +1,10 @@
 import json
+import math
 from abc import ABC
 from typing import Optional, Union
 
+from .. import domain_exceptions
+
 
 class BaseJsonResponse(ABC):
     STATUS_CODE = 200
@@ -11,15 +14,19 @@ class BaseJsonResponse(ABC):
         body: Optional[Union[str, dict, list, int]] = None,
         do_convert_to_json=True,
         status_code: Optional[int] = None,
+        headers: Optional[dict[str, str]] = None,
     ):
         self.body = body
         self.do_convert_to_json = do_convert_to_json
         self.status_code = status_code
+        self.headers = headers
 
     def to_dict(self) -> dict:
         status_code = self.status_code or self.STATUS_CODE
         response = dict()
         response["statusCode"] = status_code
+        if self.headers:
+            response["headers"] = self.headers
         if self.body is not None:
             response["Content-Type"] = "application/json"
             response["body"] = (
@@ -55,13 +62,51 @@ class NotFound404Response(BaseJsonResponse):
     STATUS_CODE = 404
 
 
+class TooManyRequests429Response(BaseJsonResponse):
+    STATUS_CODE = 429
+
+
 class InternalServerError500Response(BaseJsonResponse):
     STATUS_CODE = 500
 
 
+class ServiceUnavailable503Response(BaseJsonResponse):
+    STATUS_CODE = 503
+
+
+class GatewayTimeout504Response(BaseJsonResponse):
+    STATUS_CODE = 504
+
+
 class Ok200Response(BaseJsonResponse):
     STATUS_CODE = 200
 
 
 class Created201Response(BaseJsonResponse):
     STATUS_CODE = 201
+
+
+def to_error_response(exc: domain_exceptions.BaseDomainException) -> BaseJsonResponse:
+    """
+    The response for the domain exceptions raised by any call to Strava: to be
+     used by the views after handling their own domain exceptions.
+
+    Raises:
+        the given exception, if it is not one of those.
+    """
+    if isinstance(
+        exc,
+        (domain_exceptions.StravaAuthenticationError, domain_exceptions.StravaApiError),
+    ):
+        return BadRequest400Response(str(exc))
+    if isinstance(exc, domain_exceptions.DeadlineExceededError):
+        return GatewayTimeout504Response(str(exc))
+    if isinstance(exc, domain_exceptions.StravaUnavailableError):
+        return ServiceUnavailable503Response(
+            f"Strava API unavailable, retry after {exc.retry_after_seconds:.0f}s"
+        )
+    if isinstance(exc, domain_exceptions.StravaRateLimitedError):
+        return TooManyRequests429Response(
+            str(exc), headers={"Retry-After": str(math.ceil(exc.retry_after_seconds))}
+        )
+    raise exc
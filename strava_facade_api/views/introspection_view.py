@@ -2,6 +2,7 @@ from datetime import datetime
 from typing import Any
 
 from ..__version__ import __version__
+from . import warmup
 from .http_response import NotFound404Response, Ok200Response
 
 # Objects declared outside of the Lambda's handler method are part of Lambda's
@@ -21,6 +22,8 @@ print("INTROSPECTION: LOADING")
 
 
 def lambda_handler(event: dict[str, Any], context) -> dict:
+    if warmup.is_warmup_event(event):
+        return warmup.lambda_handler(event, context, do_prime_strava=False)
     print("INTROSPECTION: START")
 
     if event["requestContext"]["http"]["method"].upper() != "GET":
@@ -34,6 +37,17 @@ def lambda_handler(event: dict[str, Any], context) -> dict:
         print("Health")
         return Ok200Response(now).to_dict()
 
+    if event["rawPath"].endswith("/circuit-breaker"):
+        # The state of the circuit breaker around Strava API in this execution
+        #  environment: so routed here only by the router, which shares it with
+        #  all the routes calling Strava (see `serverless-router.yml`).
+        # Imported lazily, not to slow down the cold start of the other paths.
+        from ..clients.strava_client import circuit_breaker
+
+        return Ok200Response(
+            circuit_breaker.get_circuit_breaker().get_stats()
+        ).to_dict()
+
     if event["rawPath"].endswith("/unhealth"):
         now = datetime.now().astimezone().isoformat()
         print("Unhealth")
@@ -0,0 +1,157 @@
+import base64
+import binascii
+import json
+import os
+from typing import Any
+
+from .. import domain, domain_exceptions
+from ..utils import datetime_utils, deadline
+from . import warmup
+from .http_response import BadRequest400Response, Ok200Response, to_error_response
+
+# Objects declared outside of the Lambda's handler method are part of Lambda's
+# *execution environment*. This execution environment is sometimes reused for subsequent
+# function invocations. See: create_activity_view.py.
+
+# The Lambda is configured with 0 retries. So do raise exceptions in the view.
+
+DEFAULT_LIMIT = 30
+MAX_LIMIT = int(os.getenv("LIST_ACTIVITIES_MAX_LIMIT", 100))
+# Cache-Control max-age of a page: pages of a time range entirely in the past
+#  rarely change (only if activities are edited), while the last pages do as soon
+#  as a new activity is uploaded.
+PAST_PAGE_MAX_AGE_SECONDS = 60 * 60
+RECENT_PAGE_MAX_AGE_SECONDS = 60
+
+
+print("LIST ACTIVITIES: LOAD")
+
+
+def lambda_handler(event: dict[str, Any], context) -> dict:
+    """
+    List my activities, oldest first, as compact summaries, one page at a time.
+    Query params, all optional:
+     - after, before: timestamps used to filter the activities;
+     - type: eg. "WeightTraining";
+     - limit: max number of activities in a page, default 30, max 100;
+     - fields: comma separated, the fields of the summaries;
+     - cursor: the `cursor` returned by the previous page, to get the next one.
+        It includes all the other params, so they are ignored.
+    The response's `cursor` is null on the last page. A page can be shorter than
+     `limit`, even empty, when the time spent on it is up (eg. with a `type`
+     filter on a long history): continue with its `cursor`.
+
+    Args:
+        event: an AWS event, eg. SNS Message.
+        context: the context passed to the Lambda.
+
+    Example:
+        $ curl "https://q0adsu470c.execute-api.eu-south-1.amazonaws.com/activities?after=1704067200&type=WeightTraining&limit=2" \
+         -H 'Authorization: XXX'
+
+        {
+          "activities": [
+            {
+              "id": 10513338484,
+              "name": "Gym",
+              "type": "WeightTraining",
+              "sport_type": "WeightTraining",
+              "start_date": "2024-01-08T17:24:05Z",
+              "elapsed_time": 5402,
+              "moving_time": 5402,
+              "distance": 0.0
+            },
+            {...}
+          ],
+          "cursor": "eyJhIjogMTcwNDczNTg0NS4wLCAiaSI6IDEwNTEzMzM4NDg0LCAuLi59"
+        }
+    """
+    if warmup.is_warmup_event(event):
+        return warmup.lambda_handler(event, context)
+    print("LIST ACTIVITIES: START")
+    deadline.start(context)
+
+    params = event.get("queryStringParameters") or dict()
+    if params.get("cursor"):
+        try:
+            query = _decode_cursor(params["cursor"])
+        except (ValueError, binascii.Error, KeyError, TypeError) as exc:
+            print(f"Invalid cursor: {exc!r}")
+            return BadRequest400Response("Invalid cursor").to_dict()
+    else:
+        try:
+            query = dict(
+                after_ts=int(params.get("after", 0)),
+                before_ts=int(params["before"]) if params.get("before") else None,
+                activity_type=params.get("type") or None,
+                limit=int(params.get("limit", DEFAULT_LIMIT)),
+                after_id=None,
+            )
+        except ValueError:
+            return BadRequest400Response(
+                "Query params after, before and limit must be integers"
+            ).to_dict()
+        if params.get("fields"):
+            query["fields"] = tuple(params["fields"].split(","))
+        if not 1 <= query["limit"] <= MAX_LIMIT:
+            return BadRequest400Response(
+                f"Query param limit must be between 1 and {MAX_LIMIT}"
+            ).to_dict()
+
+    try:
+        activities, position = domain.list_activities(**query)
+    except domain_exceptions.UnknownActivityFieldInput as exc:
+        return BadRequest400Response(f"Unknown field: {exc.field}").to_dict()
+    except domain_exceptions.BaseDomainException as exc:
+        return to_error_response(exc).to_dict()
+
+    cursor = None
+    if position:
+        cursor = _encode_cursor(
+            {**query, "after_ts": position[0], "after_id": position[1]}
+        )
+
+    is_past = (
+        query["before_ts"] is not None
+        and query["before_ts"] < datetime_utils.now_utc().timestamp()
+    )
+    max_age = PAST_PAGE_MAX_AGE_SECONDS if is_past else RECENT_PAGE_MAX_AGE_SECONDS
+    return Ok200Response(
+        {"activities": activities, "cursor": cursor},
+        # Private: the activities are mine, do not cache them in shared caches.
+        headers={"Cache-Control": f"private, max-age={max_age}"},
+    ).to_dict()
+
+
+def _encode_cursor(query: dict) -> str:
+    """
+    An opaque cursor with the query of the next page: the filters and the
+     position in time.
+    """
+    return base64.urlsafe_b64encode(json.dumps(query).encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> dict:
+    """
+    Raises:
+        ValueError, binascii.Error, KeyError, TypeError: if the cursor is invalid.
+    """
+    query = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if not 1 <= int(query["limit"]) <= MAX_LIMIT:
+        raise ValueError("Invalid limit")
+    before_ts = query["before_ts"]
+    if before_ts is not None and (
+        isinstance(before_ts, bool) or not isinstance(before_ts, int)
+    ):
+        raise ValueError("Invalid before_ts")
+    activity_type = query["activity_type"]
+    if activity_type is not None and not isinstance(activity_type, str):
+        raise ValueError("Invalid activity_type")
+    return dict(
+        after_ts=float(query["after_ts"]),
+        before_ts=before_ts,
+        activity_type=activity_type,
+        limit=int(query["limit"]),
+        after_id=int(query["after_id"]),
+        **({"fields": tuple(query["fields"])} if "fields" in query else dict()),
+    )
@@ -0,0 +1,68 @@
+import importlib
+from typing import Any, Callable
+
+from . import warmup
+from .http_response import NotFound404Response
+
+# Objects declared outside of the Lambda's handler method are part of Lambda's
+# *execution environment*. This execution environment is sometimes reused for subsequent
+# function invocations. See: create_activity_view.py.
+
+# A single Lambda serving all the routes (and the authorizer), as an alternative to
+#  a Lambda per route (see `serverless.yml`; this one is deployed with
+#  `serverless-router.yml`): all the routes share the same warm execution
+#  environment, so the same access token, HTTP session and caches, and the
+#  low-traffic routes are not almost always cold.
+# The views are imported lazily, on their 1st request, so the cold start cost is
+#  only the one of the view requested (see `scripts/benchmark_cold_start.py`).
+
+# API Gateway route key -> view module (in this package).
+ROUTES = {
+    "GET /version": "introspection_view",
+    "GET /health": "introspection_view",
+    "GET /unhealth": "introspection_view",
+    "GET /circuit-breaker": "introspection_view",
+    "POST /update-activity-description": "update_activity_description_view",
+    "POST /update-activity-descriptions": "update_activity_descriptions_view",
+    "POST /create-activity": "create_activity_view",
+    "POST /create-activities": "create_activities_view",
+    "GET /activities": "list_activities_view",
+}
+AUTHORIZER = "authorizer_view"
+
+# View module -> its `lambda_handler`, once imported.
+_handlers: dict[str, Callable[[dict[str, Any], Any], dict]] = dict()
+
+
+print("ROUTER: LOAD")
+
+
+def lambda_handler(event: dict[str, Any], context) -> dict:
+    """
+    Dispatch an API Gateway (HTTP API, payload v2) event to the view of its route:
+     `event["routeKey"]`, eg. "POST /create-activity".
+    The authorizer's events, when this Lambda is also the authorizer, are
+     dispatched to the authorizer view. Warm-up events are not dispatched.
+
+    Args:
+        event: an AWS event, eg. SNS Message.
+        context: the context passed to the Lambda.
+    """
+    # Priming all the routes at once, as they share this execution environment.
+    if warmup.is_warmup_event(event):
+        return warmup.lambda_handler(event, context)
+
+    # Authorizer events have also a `routeKey`, the route being authorized.
+    if event.get("type") == "REQUEST" and "routeArn" in event:
+        module = AUTHORIZER
+    else:
+        module = ROUTES.get(event.get("routeKey"))
+        if not module:
+            print(f"ROUTER: no route for {event.get('routeKey')}")
+            return NotFound404Response().to_dict()
+
+    handler = _handlers.get(module)
+    if not handler:
+        handler = importlib.import_module(f".{module}", __package__).lambda_handler
+        _handlers[module] = handler
+    return handler(event, context)
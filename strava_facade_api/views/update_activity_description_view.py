@@ -4,7 +4,14 @@ import json
 from typing import Any
 
 from .. import domain, domain_exceptions
-from .http_response import BadRequest400Response, NotFound404Response, Ok200Response
+from ..utils import deadline
+from . import warmup
+from .http_response import (
+    BadRequest400Response,
+    NotFound404Response,
+    Ok200Response,
+    to_error_response,
+)
 
 # Objects declared outside of the Lambda's handler method are part of Lambda's
 # *execution environment*. This execution environment is sometimes reused for subsequent
@@ -163,7 +170,10 @@ def lambda_handler(event: dict[str, Any], context) -> dict:
           "available_zones": []
         }
     """
+    if warmup.is_warmup_event(event):
+        return warmup.lambda_handler(event, context)
     print("UPDATE ACTIVITY DESCRIPTION: START")
+    deadline.start(context)
 
     body = event.get("body", "")
     if event.get("isBase64Encoded"):
@@ -189,6 +199,13 @@ def lambda_handler(event: dict[str, Any], context) -> dict:
             "Posted body must include the key 'beforeTs'"
         ).to_dict()
 
+    try:
+        after_ts, before_ts = int(after_ts), int(before_ts)
+    except (ValueError, TypeError):
+        return BadRequest400Response(
+            "Posted keys 'afterTs' and 'beforeTs' must be integer timestamps"
+        ).to_dict()
+
     activity_type = body.get("activityType")
     if not activity_type:
         return BadRequest400Response(
@@ -227,9 +244,7 @@ def lambda_handler(event: dict[str, Any], context) -> dict:
         return BadRequest400Response(
             f"The activity found already has a description: id={exc.activity_id} description={exc.description}"
         ).to_dict()
-    except domain_exceptions.StravaAuthenticationError as exc:
-        return BadRequest400Response(str(exc)).to_dict()
-    except domain_exceptions.StravaApiError as exc:
-        return BadRequest400Response(str(exc)).to_dict()
+    except domain_exceptions.BaseDomainException as exc:
+        return to_error_response(exc).to_dict()
 
     return Ok200Response(updated_activity).to_dict()
@@ -0,0 +1,180 @@
+import base64
+import binascii
+import json
+import os
+from typing import Any, Optional
+
+from .. import domain, domain_exceptions
+from ..utils import deadline
+from . import warmup
+from .http_response import BadRequest400Response, Ok200Response, to_error_response
+
+# Objects declared outside of the Lambda's handler method are part of Lambda's
+# *execution environment*. This execution environment is sometimes reused for subsequent
+# function invocations. See: create_activity_view.py.
+
+# The Lambda is configured with 0 retries. So do raise exceptions in the view.
+
+# The max number of items in a single request: they are updated with a few
+#  concurrent requests, and all within the Lambda timeout.
+MAX_BATCH_SIZE = int(os.getenv("UPDATE_ACTIVITY_DESCRIPTIONS_MAX_BATCH_SIZE", 50))
+
+# Posted key -> domain key. All required.
+ITEM_KEYS = {
+    "afterTs": "after_ts",
+    "beforeTs": "before_ts",
+    "activityType": "activity_type",
+    "description": "description",
+}
+
+
+print("UPDATE ACTIVITY DESCRIPTIONS: LOAD")
+
+
+def lambda_handler(event: dict[str, Any], context) -> dict:
+    """
+    Update the description of many existing Strava activities, eg. a backfill of a
+     month of workouts.
+    Like /update-activity-description, each activity is found by afterTs and
+     beforeTs timestamps and by activityType, but all of them with a single
+     listing.
+    A failure for an item does not fail the request: the response has a result
+     for each item, in the same order, with a status in "updated", "not_found",
+     "has_description", "duplicate" and "error". An invalid item (eg. a missing
+     key) is an "error" with "statusCode" 400.
+
+    Args:
+        event: an AWS event, eg. SNS Message.
+        context: the context passed to the Lambda.
+
+    Example:
+        $ curl -X POST https://s8afs561v2.execute-api.eu-south-1.amazonaws.com/update-activity-descriptions \
+         -H 'Authorization: XXX' \
+         -d '{"items": [{"afterTs": 1707174000, "beforeTs": 1707260399, "description": "My new descr", "activityType": "WeightTraining", "name": "test1"}, {"afterTs": 1707260400, "beforeTs": 1707346799, "description": "My new descr", "activityType": "WeightTraining", "doStopIfDescriptionNotNull": "false"}]}'
+
+        {
+          "results": [
+            {
+              "index": 0,
+              "status": "updated",
+              "activity": {"id": 10715656719, "name": "test1", ...}
+            },
+            {
+              "index": 1,
+              "status": "not_found"
+            }
+          ]
+        }
+    """
+    if warmup.is_warmup_event(event):
+        return warmup.lambda_handler(event, context)
+    print("UPDATE ACTIVITY DESCRIPTIONS: START")
+    deadline.start(context)
+
+    body = event.get("body", "")
+    if event.get("isBase64Encoded"):
+        try:
+            body = base64.b64decode(body).decode()
+        except (UnicodeDecodeError, binascii.Error) as exc:
+            print(f"Posted invalid body: {exc}")
+            return BadRequest400Response("Invalid body").to_dict()
+    body = json.loads(body)
+
+    if not isinstance(body, dict):
+        return BadRequest400Response("Posted body must be a JSON object").to_dict()
+
+    posted_items = body.get("items")
+    if not posted_items or not isinstance(posted_items, list):
+        return BadRequest400Response(
+            "Posted body must include the key 'items', a non-empty list"
+        ).to_dict()
+    if len(posted_items) > MAX_BATCH_SIZE:
+        return BadRequest400Response(
+            f"Posted body can include at most {MAX_BATCH_SIZE} items"
+        ).to_dict()
+
+    results: list[Optional[dict]] = [None] * len(posted_items)
+    items = []
+    # The index of the posted item of each item.
+    item_indexes = []
+    for i, posted_item in enumerate(posted_items):
+        try:
+            items.append(_to_item(posted_item))
+        except ValueError as exc:
+            results[i] = {
+                "index": i,
+                "status": "error",
+                "statusCode": 400,
+                "error": str(exc),
+            }
+        else:
+            item_indexes.append(i)
+
+    if items:
+        try:
+            domain_results = domain.update_activity_descriptions(items)
+        except domain_exceptions.BaseDomainException as exc:
+            return to_error_response(exc).to_dict()
+        for index, result in zip(item_indexes, domain_results):
+            results[index] = _to_result(index, result, item_indexes)
+
+    return Ok200Response({"results": results}).to_dict()
+
+
+def _to_item(posted_item: Any) -> dict:
+    """
+    The args of `domain.update_activity_descriptions()` for a posted item.
+
+    Raises:
+        ValueError: if the posted item is invalid.
+    """
+    if not isinstance(posted_item, dict):
+        raise ValueError("Item must be a JSON object")
+    for key in ITEM_KEYS:
+        if not posted_item.get(key):
+            raise ValueError(f"Item must include the key '{key}'")
+    item = {domain_key: posted_item[key] for key, domain_key in ITEM_KEYS.items()}
+    for key in ("afterTs", "beforeTs"):
+        try:
+            item[ITEM_KEYS[key]] = int(posted_item[key])
+        except (ValueError, TypeError):
+            raise ValueError(f"Item key '{key}' must be an integer timestamp")
+    item["name"] = posted_item.get("name")
+    item["do_stop_if_description_not_null"] = _to_bool(
+        posted_item.get("doStopIfDescriptionNotNull", True)
+    )
+    return item
+
+
+def _to_bool(value: bool | str) -> bool:
+    if isinstance(value, str):
+        return value.lower() not in ("false", "f", "no", "n")
+    return bool(value)
+
+
+def _to_result(index: int, result: dict | Exception, item_indexes: list[int]) -> dict:
+    """
+    Args:
+        index: the index of the posted item.
+        result: the result of `domain.update_activity_descriptions()` for the item.
+        item_indexes: the index of the posted item of each item passed to
+         `domain.update_activity_descriptions()`.
+    """
+    if isinstance(result, domain_exceptions.NoActivityFound):
+        return {"index": index, "status": "not_found"}
+    if isinstance(result, domain_exceptions.ActivityAlreadyHasDescription):
+        return {
+            "index": index,
+            "status": "has_description",
+            "activityId": result.activity_id,
+            "description": result.description,
+        }
+    if isinstance(result, domain_exceptions.DuplicatedBatchItemFound):
+        return {
+            "index": index,
+            "status": "duplicate",
+            "duplicateItemIndex": item_indexes[result.index],
+        }
+    if isinstance(result, Exception):
+        return {"index": index, "status": "error", "error": str(result)}
+    return {"index": index, "status": "updated", "activity": result}
@@ -0,0 +1,132 @@
+"""
+Warm-up (or priming) events: scheduled pings that keep a Lambda's execution
+ environment warm and initialize, ahead of time, everything the real requests need.
+So the 1st real request after a warm-up pays no initialization cost: no heavy
+ import, no DNS lookup, no TCP and TLS handshakes to Strava, no token read from AWS
+ Parameter Store.
+
+A warm-up event is either `{"warmup": true}` (eg. the input of a scheduled
+ EventBridge rule) or the event sent by `serverless-plugin-warmup`. Every handler
+ must short-circuit on it, before any other logic:
+    if warmup.is_warmup_event(event):
+        return warmup.lambda_handler(event, context)
+
+The response reports how long each priming step took, in ms. A failing step does
+ not stop the others: its error is reported.
+"""
+
+from time import perf_counter
+from typing import Any, Callable
+
+from ..utils import deadline
+
+WARMUP_PLUGIN_SOURCE = "serverless-plugin-warmup"
+
+# Timeout for the priming requests: a warm-up must never hang.
+CONNECT_TIMEOUT_SECONDS = 3
+
+
+def is_warmup_event(event: dict[str, Any]) -> bool:
+    return event.get("warmup") is True or event.get("source") == WARMUP_PLUGIN_SOURCE
+
+
+def lambda_handler(event: dict[str, Any], context, do_prime_strava=True) -> dict:
+    """
+    Respond to a warm-up event, after priming.
+
+    Args:
+        event: the warm-up event.
+        context: the context passed to the Lambda.
+        do_prime_strava: False for the handlers that do not call Strava (eg. the
+         authorizer): they are just kept warm.
+    """
+    print("WARMUP: START")
+    deadline.start(context)
+    # Imported lazily, as `json` is expensive to import for the authorizer.
+    from .http_response import Ok200Response
+
+    steps = prime() if do_prime_strava else dict()
+    return Ok200Response({"warmup": True, "steps": steps}).to_dict()
+
+
+def prime() -> dict[str, dict]:
+    """
+    Run the priming steps, in order, and time them.
+
+    Returns: step name -> {"ms": duration} (and "error" if it failed).
+    """
+    steps = dict()
+    for name, step in (
+        ("import", _import_modules),
+        ("http_session", _build_http_session),
+        ("ssm_client", _build_ssm_client),
+        ("dns", _resolve_strava_host),
+        ("tls", _connect_to_strava),
+        ("token", _get_access_token),
+    ):
+        steps[name] = _time(step)
+    return steps
+
+
+def _time(step: Callable[[], Any]) -> dict:
+    t0 = perf_counter()
+    result = dict()
+    try:
+        step()
+    except Exception as exc:
+        print(f"WARMUP: step {step.__name__} failed: {exc!r}")
+        result["error"] = repr(exc)
+    result["ms"] = round((perf_counter() - t0) * 1000, 1)
+    return result
+
+
+def _import_modules() -> None:
+    # The modules imported lazily by the views (see `StravaClient`).
+    import concurrent.futures  # noqa: F401
+
+    import boto3  # noqa: F401
+    import requests  # noqa: F401
+
+    from .. import domain  # noqa: F401
+    from ..clients.strava_client import http_session  # noqa: F401
+
+
+def _build_http_session() -> None:
+    from ..clients.strava_client import http_session
+
+    http_session.get_session()
+
+
+def _build_ssm_client() -> None:
+    from ..clients.aws_parameter_store_client import aws_parameter_store_client
+
+    aws_parameter_store_client.get_client()
+
+
+def _resolve_strava_host() -> None:
+    # Imported lazily, as `socket` is expensive to import for the authorizer.
+    import socket
+    from urllib.parse import urlsplit
+
+    from ..clients.strava_client.strava_client import BASE_URL
+
+    socket.getaddrinfo(urlsplit(BASE_URL).hostname, 443, type=socket.SOCK_STREAM)
+
+
+def _connect_to_strava() -> None:
+    """
+    Make a request to Strava with the shared session, so a TLS connection is left
+     open in its pool, ready for the next request. Unauthenticated, so any
+     response is fine.
+    """
+    from ..clients.strava_client import http_session
+    from ..clients.strava_client.strava_client import BASE_URL
+
+    # Not streamed, so the connection is released to the pool.
+    http_session.get_session().head(BASE_URL, timeout=CONNECT_TIMEOUT_SECONDS)
+
+
+def _get_access_token() -> None:
+    from ..clients.strava_client.token_manager import TokenManager
+
+    TokenManager.get_access_token()
@@ -0,0 +1,119 @@
+from datetime import datetime, timezone
+from time import time
+
+import pytest
+
+from strava_facade_api import domain
+from strava_facade_api.activity_store.activity_store import ActivityStore
+from strava_facade_api.utils import datetime_utils
+
+
+def _make_activity(id_: int, start_ts: float, sport_type="WeightTraining", name="a"):
+    return {
+        "id": id_,
+        "name": name,
+        "type": sport_type,
+        "sport_type": sport_type,
+        "start_date": datetime.fromtimestamp(int(start_ts), timezone.utc)
+        .isoformat()
+        .replace("+00:00", "Z"),
+    }
+
+
+class FakeStravaClient:
+    def __init__(self, activities):
+        self.activities = activities
+        self.calls = []
+
+    def iter_activities(self, after_ts=None, before_ts=None, activity_type=None):
+        self.calls.append((after_ts, before_ts))
+        for activity in self.activities:
+            ts = datetime_utils.iso_to_timestamp(activity["start_date"])
+            if (after_ts is None or ts > after_ts) and (
+                before_ts is None or ts < before_ts
+            ):
+                yield activity
+
+    def get_activity_details(self, activity_id):
+        self.calls.append(activity_id)
+        return {**self._get(activity_id), "description": "descr"}
+
+    def _get(self, activity_id):
+        return next(a for a in self.activities if a["id"] == activity_id)
+
+
+@pytest.fixture
+def now():
+    return time()
+
+
+@pytest.fixture
+def strava(now):
+    return FakeStravaClient(
+        [
+            _make_activity(1, now - 3 * 86400),
+            _make_activity(2, now - 2 * 86400, sport_type="Run"),
+            _make_activity(3, now - 2 * 86400 + 60),
+        ]
+    )
+
+
+@pytest.fixture
+def store(strava, tmp_path):
+    return ActivityStore(strava, path=str(tmp_path / "activities.sqlite3"))
+
+
+class TestActivityStore:
+    def test_sync_and_find(self, store, strava, now):
+        assert store.sync() == 3
+        activity = store.find_latest_activity(now - 7 * 86400, now, "WeightTraining")
+        assert activity["id"] == 3
+        assert store.find_latest_activity(now - 7 * 86400, now, "Swim") is None
+        assert store.is_covering(now - 7 * 86400)
+        assert not store.is_covering(now - 365 * 86400)
+
+    def test_incremental_sync(self, store, strava, now):
+        store.sync()
+        strava.activities.append(_make_activity(4, now - 60))
+        strava.calls.clear()
+        assert store.sync() == 2  # The new one and the one at the high-water mark.
+        # Only after the high-water mark, no recheck.
+        assert len(strava.calls) == 1
+        assert store.find_latest_activity(now - 86400, now)["id"] == 4
+
+    def test_recheck(self, store, strava, now):
+        store.recheck_interval_seconds = 0
+        store.sync()
+        strava.activities[0]["name"] = "edited"
+        del strava.activities[1]
+        store.sync()
+        activities = store.list_activities(now - 7 * 86400, now)
+        assert [(a["id"], a["name"]) for a in activities] == [(3, "a"), (1, "edited")]
+
+    def test_details(self, store, strava):
+        store.sync()
+        assert store.get_activity_details(1)["description"] == "descr"
+        assert store.get_activity_details(1)["description"] == "descr"
+        assert strava.calls.count(1) == 1
+
+    def test_is_synced_until(self, store, strava, now):
+        assert not store.is_synced_until(now - 7 * 86400)
+        store.sync()
+        # The high-water mark is the start of the latest activity.
+        assert store.is_synced_until(now - 2 * 86400)
+        assert not store.is_synced_until(now)
+
+
+class TestFindLatestActivity:
+    def test_later_upload(self, store, strava, now):
+        after_ts, before_ts = now - 2 * 86400 - 3600, now + 3600
+        activity = domain._find_latest_activity(
+            strava, store, after_ts, before_ts, "WeightTraining"
+        )
+        assert activity["id"] == 3
+        # Another activity of the same type, uploaded later that day.
+        strava.activities.append(_make_activity(4, now - 60))
+        activity = domain._find_latest_activity(
+            strava, store, after_ts, before_ts, "WeightTraining"
+        )
+        assert activity["id"] == 4
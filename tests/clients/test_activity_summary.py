@@ -0,0 +1,50 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from strava_facade_api.clients.strava_client.activity_summary import (
+    ActivitySummary,
+    RawActivityNotKept,
+    UnknownActivityField,
+)
+
+ACTIVITY = {
+    "id": 10709853894,
+    "name": "Weight training",
+    "type": "WeightTraining",
+    "sport_type": "WeightTraining",
+    "start_date": "2024-02-06T17:20:32Z",
+    "elapsed_time": 7157,
+    "moving_time": 7157,
+    "distance": 0.0,
+    "athlete": {"id": 115890775, "resource_state": 1},
+    "map": {"id": "a10709853894", "summary_polyline": "", "resource_state": 2},
+}
+
+
+class TestActivitySummary:
+    def test_projection(self):
+        summary = ActivitySummary.from_dict(ACTIVITY, fields=("id", "start_date"))
+        assert summary.to_dict() == {
+            "id": 10709853894,
+            "start_date": "2024-02-06T17:20:32Z",
+        }
+        assert not hasattr(summary, "__dict__")
+        with pytest.raises(AttributeError):
+            summary.name
+
+    def test_start_datetime(self):
+        summary = ActivitySummary.from_dict(ACTIVITY)
+        assert summary.start_datetime == datetime(
+            2024, 2, 6, 17, 20, 32, tzinfo=timezone.utc
+        )
+
+    def test_raw(self):
+        summary = ActivitySummary.from_dict(ACTIVITY, do_keep_raw=True)
+        assert summary.raw == ACTIVITY
+        with pytest.raises(RawActivityNotKept):
+            ActivitySummary.from_dict(ACTIVITY).raw
+
+    def test_unknown_field(self):
+        with pytest.raises(UnknownActivityField):
+            ActivitySummary.from_dict(ACTIVITY, fields=("id", "athlete"))
@@ -0,0 +1,74 @@
+import boto3
+import pytest
+
+from strava_facade_api.clients.aws_parameter_store_client import (
+    aws_parameter_store_client,
+)
+from strava_facade_api.clients.aws_parameter_store_client.aws_parameter_store_client import (
+    ParameterNotFound,
+    ParameterStoreClient,
+)
+
+from .test_token_manager import FakeSsmClient
+
+
+class CountingFakeSsmClient(FakeSsmClient):
+    def __init__(self):
+        super().__init__()
+        self.n_requests = 0
+
+    def get_parameter(self, *args, **kwargs):
+        self.n_requests += 1
+        return super().get_parameter(*args, **kwargs)
+
+    def get_parameters(self, *args, **kwargs):
+        self.n_requests += 1
+        return super().get_parameters(*args, **kwargs)
+
+
+@pytest.fixture
+def ssm_client(monkeypatch):
+    ssm_client = CountingFakeSsmClient()
+    n_clients = []
+
+    def make_client(service, **kwargs):
+        n_clients.append(service)
+        return ssm_client
+
+    monkeypatch.setattr(boto3, "client", make_client)
+    aws_parameter_store_client.reset_client()
+    for i in range(25):
+        ssm_client.put_parameter(f"/test/param{i}", f"value{i}")
+    ssm_client.n_clients = n_clients
+    yield ssm_client
+    aws_parameter_store_client.reset_client()
+
+
+class TestParameterStoreClient:
+    def test_shared_client(self, ssm_client):
+        assert ParameterStoreClient().client is ParameterStoreClient().client
+        assert len(ssm_client.n_clients) == 1
+
+    def test_get_parameters_many(self, ssm_client):
+        paths = [f"/test/param{i}" for i in range(25)]
+        values = ParameterStoreClient().get_parameters_many(paths)
+        assert values == {f"/test/param{i}": f"value{i}" for i in range(25)}
+        # In batches of 10.
+        assert ssm_client.n_requests == 3
+
+    def test_get_parameters_many_not_found(self, ssm_client):
+        with pytest.raises(ParameterNotFound):
+            ParameterStoreClient().get_parameters_many(["/test/param1", "/test/xxx"])
+
+    def test_cache(self, ssm_client):
+        client = ParameterStoreClient()
+        client.get_parameters_many(["/test/param1"], cache_ttl_seconds=60)
+        assert client.get_parameter("/test/param1", cache_ttl_seconds=60) == "value1"
+        values = client.get_parameters_many(
+            ["/test/param1", "/test/param2"], cache_ttl_seconds=60
+        )
+        assert values == {"/test/param1": "value1", "/test/param2": "value2"}
+        assert ssm_client.n_requests == 2
+        # Invalidated on write.
+        client.put_parameter("/test/param1", "new", do_overwrite=True)
+        assert client.get_parameter("/test/param1", cache_ttl_seconds=60) == "new"
@@ -0,0 +1,101 @@
+import pytest
+
+from strava_facade_api.clients.strava_client import circuit_breaker
+from strava_facade_api.clients.strava_client.circuit_breaker import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpen,
+)
+from strava_facade_api.clients.strava_client.strava_client import StravaClient
+
+
+class FakeClock:
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestCircuitBreaker:
+    def setup_method(self):
+        self.clock = FakeClock()
+        self.breaker = CircuitBreaker(
+            window_seconds=60,
+            min_calls=4,
+            failure_rate=0.5,
+            slow_call_seconds=5,
+            open_seconds=30,
+            half_open_probes=2,
+            clock=self.clock,
+        )
+
+    def _call(self, is_success=True, duration_seconds=0.1):
+        self.breaker.before_call()
+        self.breaker.record(is_success, duration_seconds)
+
+    def test_open(self):
+        self._call(is_success=False)
+        self._call(is_success=False)
+        self._call()
+        # Not enough calls yet.
+        assert self.breaker.state == CLOSED
+        # A slow call counts as failed.
+        self._call(duration_seconds=6)
+        assert self.breaker.state == OPEN
+        with pytest.raises(CircuitOpen) as exc_info:
+            self.breaker.before_call()
+        assert exc_info.value.retry_after_seconds == 30
+        assert self.breaker.get_stats()["n_rejected"] == 1
+
+    def test_rolling_window(self):
+        self._call(is_success=False)
+        self._call(is_success=False)
+        # The failures leave the window.
+        self.clock.now += 61
+        self._call(is_success=False)
+        self._call()
+        self._call()
+        self._call()
+        assert self.breaker.state == CLOSED
+
+    def test_half_open(self):
+        for _ in range(4):
+            self._call(is_success=False)
+        self.clock.now += 30
+        self.breaker.before_call()
+        assert self.breaker.state == HALF_OPEN
+        # 1 probe at a time.
+        with pytest.raises(CircuitOpen):
+            self.breaker.before_call()
+        self.breaker.record(True, 0.1)
+        assert self.breaker.state == HALF_OPEN
+        self._call()
+        assert self.breaker.state == CLOSED
+
+    def test_half_open_probe_fails(self):
+        for _ in range(4):
+            self._call(is_success=False)
+        self.clock.now += 30
+        self._call(is_success=False)
+        assert self.breaker.state == OPEN
+        assert self.breaker.get_stats()["n_opened"] == 2
+
+
+class TestStravaClientCircuitBreaker:
+    def teardown_method(self):
+        circuit_breaker.get_circuit_breaker().reset()
+
+    def test_rejected_when_open(self, monkeypatch):
+        breaker = circuit_breaker.get_circuit_breaker()
+        for _ in range(breaker.min_calls):
+            breaker.before_call()
+            breaker.record(False, 0.1)
+        monkeypatch.setattr(
+            "strava_facade_api.clients.strava_client.http_session.get_session",
+            lambda: pytest.fail("Request"),
+        )
+        with pytest.raises(CircuitOpen):
+            StravaClient("XXX").update_activity(1, {"description": "New"})
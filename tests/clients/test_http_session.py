@@ -0,0 +1,51 @@
+import http.server
+import threading
+
+import pytest
+
+from strava_facade_api.clients.strava_client import http_session
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive.
+
+    def do_GET(self):
+        body = b"[]"
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    http_session.reset_session()
+    yield f"http://127.0.0.1:{server.server_port}/"
+    http_session.reset_session()
+    server.shutdown()
+
+
+class TestGetSession:
+    def test_is_shared(self, server_url):
+        assert http_session.get_session() is http_session.get_session()
+
+    def test_connection_reused(self, server_url):
+        session = http_session.get_session()
+        response = session.get(server_url)
+        assert response.json() == []
+        assert http_session.is_connection_reused(response) is False
+        response = session.get(server_url)
+        assert http_session.is_connection_reused(response) is True
+
+    def test_no_keep_alive(self, server_url):
+        http_session.reset_session()
+        session = http_session.get_session(do_keep_alive=False)
+        session.get(server_url)
+        response = session.get(server_url)
+        assert http_session.is_connection_reused(response) is False
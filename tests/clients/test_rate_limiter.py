@@ -0,0 +1,95 @@
+import pytest
+
+from strava_facade_api.clients.strava_client.rate_limiter import (
+    RateLimiter,
+    RateLimitExceeded,
+)
+
+# 2023-11-14 22:15:00 UTC: the start of a 15-minute window.
+START_TS = 1_700_000_100.0
+
+
+class FakeClock:
+    def __init__(self, now: float = START_TS):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestRateLimiter:
+    def setup_method(self):
+        self.clock = FakeClock()
+
+    def _make_limiter(self, **kwargs) -> RateLimiter:
+        return RateLimiter(clock=self.clock, sleep=self.clock.sleep, **kwargs)
+
+    def test_burst(self):
+        # Always paced.
+        limiter = self._make_limiter(burst=5, reserve_fraction=1)
+        for _ in range(5):
+            limiter.acquire()
+        assert self.clock.sleeps == []
+        # Then calls are paced: 195 remaining calls over 900 secs.
+        limiter.acquire()
+        assert self.clock.sleeps == [pytest.approx(900 / 195)]
+
+    def test_update_from_headers(self):
+        limiter = self._make_limiter()
+        limiter.update_from_headers(
+            {"X-RateLimit-Limit": "100,1000", "X-RateLimit-Usage": "99,500"}
+        )
+        assert limiter.limits == [100, 1000]
+        limiter.acquire()
+        assert self.clock.sleeps == []
+        # The 15-minute window is exhausted: wait until it resets.
+        limiter.acquire()
+        assert self.clock.sleeps == [pytest.approx(900)]
+        assert limiter.usages == [1, 502]
+
+    def test_on_too_many_requests(self):
+        limiter = self._make_limiter(max_wait_seconds=60)
+        limiter.on_too_many_requests({})
+        with pytest.raises(RateLimitExceeded) as exc_info:
+            limiter.acquire()
+        assert exc_info.value.retry_after_seconds == pytest.approx(900)
+
+    def test_paced_by_short_window_only(self):
+        limiter = self._make_limiter(burst=5, reserve_fraction=1)
+        # Most of the daily budget is spent, but it is not exhausted.
+        limiter.update_from_headers(
+            {"X-RateLimit-Limit": "200,2000", "X-RateLimit-Usage": "0,1500"}
+        )
+        for _ in range(6):
+            limiter.acquire()
+        # Paced like with an unused daily budget.
+        assert self.clock.sleeps == [pytest.approx(900 / 195)]
+
+    def test_long_window_exhausted(self):
+        limiter = self._make_limiter(max_wait_seconds=60)
+        limiter.update_from_headers(
+            {"X-RateLimit-Limit": "200,2000", "X-RateLimit-Usage": "10,2000"}
+        )
+        with pytest.raises(RateLimitExceeded) as exc_info:
+            limiter.acquire()
+        # Until midnight UTC.
+        assert exc_info.value.retry_after_seconds == pytest.approx(6300)
+
+    def test_not_paced_above_reserve(self):
+        limiter = self._make_limiter(burst=5, reserve_fraction=0.25)
+        # Eg. a batch: not paced until 150 calls are left.
+        for _ in range(50):
+            limiter.acquire()
+        assert self.clock.sleeps == []
+        limiter.update_from_headers(
+            {"X-RateLimit-Limit": "200,2000", "X-RateLimit-Usage": "150,500"}
+        )
+        for _ in range(6):
+            limiter.acquire()
+        # Then paced, after a burst.
+        assert self.clock.sleeps == [pytest.approx(900 / 45)]
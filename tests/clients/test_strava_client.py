@@ -1,8 +1,24 @@
+import json
+from datetime import datetime, timedelta, timezone
+
 import pytest
+import requests
 
-from strava_facade_api.clients.strava_client.strava_client import StravaClient
+from strava_facade_api.clients.strava_client import http_session
+from strava_facade_api.clients.strava_client.activity_type_index import (
+    ActivityTypeIndex,
+)
+from strava_facade_api.clients.strava_client.rate_limiter import RateLimitExceeded
+from strava_facade_api.clients.strava_client.strava_client import (
+    ActivityHasDescription,
+    ActivityNotFound,
+    DuplicatedBatchItem,
+    NaiveDatetime,
+    PossibleDuplicatedActivity,
+    StravaClient,
+)
 from strava_facade_api.clients.strava_client.token_manager import TokenManager
-from strava_facade_api.utils import datetime_utils
+from strava_facade_api.utils import datetime_utils, deadline
 
 
 class TestCreateActivity:
@@ -39,3 +55,703 @@ class TestCreateActivity:
             do_detect_duplicates=True,
         )
         assert response
+
+
+class _FakeResponse:
+    def __init__(self, data, status_code=200, headers=None):
+        self.data = data
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code} Error", response=self)
+
+    def json(self):
+        return self.data
+
+    def iter_content(self, chunk_size=1):
+        content = json.dumps(self.data).encode()
+        for i in range(0, len(content), 7):
+            yield content[i : i + 7]
+
+    def close(self):
+        pass
+
+
+class _ConflictResponse(_FakeResponse):
+    def raise_for_status(self):
+        raise requests.HTTPError(
+            "409 Client Error: Conflict for url: https://www.strava.com/api/v3/activities",
+            response=self,
+        )
+
+
+def _make_activities(n, start_ts=1_700_000_000, sport_type="WeightTraining"):
+    return [
+        {
+            "id": start_ts + i,
+            "type": sport_type,
+            "sport_type": sport_type,
+            "start_date": datetime.fromtimestamp(start_ts + i * 3600, timezone.utc)
+            .isoformat()
+            .replace("+00:00", "Z"),
+            "elapsed_time": 3600,
+        }
+        for i in range(n)
+    ]
+
+
+class TestIterActivities:
+    def setup_method(self):
+        self.client = StravaClient("XXX")
+        self.activities = _make_activities(5)
+        self.requested_pages = []
+
+    def _fake_request(self, method, url, params=None, **kwargs):
+        page, per_page = params["page"], params["per_page"]
+        self.requested_pages.append(page)
+        return _FakeResponse(self.activities[(page - 1) * per_page : page * per_page])
+
+    def test_all_pages(self, monkeypatch):
+        monkeypatch.setattr(self.client, "_request", self._fake_request)
+        activities = list(self.client.iter_activities(n_results_per_page=2))
+        assert activities == self.activities
+        assert self.requested_pages == [1, 2, 3]
+
+    def test_lazy(self, monkeypatch):
+        monkeypatch.setattr(self.client, "_request", self._fake_request)
+        iterator = self.client.iter_activities(n_results_per_page=2)
+        assert next(iterator) == self.activities[0]
+        assert self.requested_pages == [1]
+
+
+class TestListActivitiesParallel:
+    def setup_method(self):
+        self.client = StravaClient("XXX")
+        self.activities = _make_activities(48)
+
+    def _fake_request(self, method, url, params=None, **kwargs):
+        activities = [
+            a
+            for a in self.activities
+            if params["after"]
+            <= datetime.fromisoformat(a["start_date"]).timestamp()
+            <= params["before"]
+        ]
+        page, per_page = params["page"], params["per_page"]
+        return _FakeResponse(activities[(page - 1) * per_page : page * per_page])
+
+    def test_happy_flow(self, monkeypatch):
+        monkeypatch.setattr(self.client, "_request", self._fake_request)
+        after_ts = 1_700_000_000
+        activities = self.client.list_activities_parallel(
+            after_ts, after_ts + 47 * 3600, n_windows=5
+        )
+        # No duplicates at the windows' edges, all in order.
+        assert activities == self.activities
+
+
+class TestGetActivitiesDetailsMany:
+    def setup_method(self):
+        self.client = StravaClient("XXX")
+
+    def _fake_get_activity_details(self, activity_id, do_use_cache=True):
+        if activity_id == 3:
+            raise requests.HTTPError("404 Client Error")
+        if activity_id == 5:
+            raise RateLimitExceeded(60)
+        return {"id": activity_id}
+
+    def test_happy_flow(self, monkeypatch):
+        monkeypatch.setattr(
+            self.client, "get_activity_details", self._fake_get_activity_details
+        )
+        results = list(
+            self.client.get_activities_details_many(range(1, 11), max_workers=3)
+        )
+        assert [r.activity_id for r in results] == list(range(1, 11))
+        assert [r.details["id"] for r in results if r.is_ok] == [
+            1,
+            2,
+            4,
+            6,
+            7,
+            8,
+            9,
+            10,
+        ]
+        assert isinstance(results[2].exception, requests.HTTPError)
+        assert isinstance(results[4].exception, RateLimitExceeded)
+
+    def test_as_completed(self, monkeypatch):
+        monkeypatch.setattr(
+            self.client, "get_activity_details", self._fake_get_activity_details
+        )
+        results = self.client.get_activities_details_many(
+            range(1, 11), do_yield_as_completed=True
+        )
+        assert sorted(r.activity_id for r in results) == list(range(1, 11))
+
+
+class TestGetActivityDetailsCache:
+    def setup_method(self):
+        StravaClient.clear_details_cache()
+        self.client = StravaClient("XXX")
+        self.requests = []
+
+    def teardown_method(self):
+        StravaClient.clear_details_cache()
+        StravaClient.clear_activity_type_index()
+
+    def _fake_request(self, method, url, data=None, **kwargs):
+        self.requests.append((method, url))
+        activity_id = int(url.rsplit("/", 1)[1])
+        return _FakeResponse(
+            {
+                "id": activity_id,
+                "start_date": "2024-02-06T17:20:32Z",
+                "description": (data or {}).get("description"),
+            }
+        )
+
+    def test_cached(self, monkeypatch):
+        monkeypatch.setattr(self.client, "_request", self._fake_request)
+        self.client.get_activity_details(1)
+        self.client.get_activity_details(1)
+        assert len(self.requests) == 1
+        assert StravaClient.get_details_cache_stats()["hits"] == 1
+
+    def test_write_through(self, monkeypatch):
+        monkeypatch.setattr(self.client, "_request", self._fake_request)
+        self.client.get_activity_details(1)
+        self.client.update_activity(1, {"description": "new"})
+        assert self.client.get_activity_details(1)["description"] == "new"
+        assert len(self.requests) == 2
+
+
+class _FakeContext:
+    def __init__(self, remaining_ms: int):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self) -> int:
+        return self.remaining_ms
+
+
+class TestDeadline:
+    def teardown_method(self):
+        deadline.clear()
+
+    def test_timeout(self, monkeypatch):
+        timeouts = []
+
+        def fake_request(method, url, timeout=None, **kwargs):
+            timeouts.append(timeout)
+            response = _FakeResponse({"id": 1})
+            response.url, response.elapsed = url, timedelta(milliseconds=100)
+            return response
+
+        monkeypatch.setattr(http_session.get_session(), "request", fake_request)
+        deadline.start(_FakeContext(5000), safety_margin_ms=1000)
+        StravaClient("XXX").get_activity_details(1, do_use_cache=False)
+        assert timeouts[0][1] <= 4
+
+    def test_write_fails_fast(self, monkeypatch):
+        monkeypatch.setattr(
+            StravaClient, "_request", lambda *args, **kwargs: pytest.fail("Request")
+        )
+        deadline.start(_FakeContext(2500), safety_margin_ms=1000)
+        with pytest.raises(deadline.DeadlineExceeded):
+            StravaClient("XXX").update_activity(1, {"description": "New"})
+
+
+class TestConditionalRequests:
+    def setup_method(self):
+        StravaClient.clear_details_cache()
+        StravaClient.clear_etag_cache()
+        self.client = StravaClient("XXX")
+        self.sent_headers = []
+        self.etag = '"v1"'
+
+    def teardown_method(self):
+        StravaClient.clear_details_cache()
+        StravaClient.clear_etag_cache()
+
+    def _fake_request(self, method, url, headers=None, **kwargs):
+        self.sent_headers.append(headers)
+        if headers and headers.get("If-None-Match") == self.etag:
+            return _FakeResponse(None, status_code=304)
+        return _FakeResponse({"id": 1, "etag": self.etag}, headers={"ETag": self.etag})
+
+    def test_not_modified(self, monkeypatch):
+        monkeypatch.setattr(self.client, "_request", self._fake_request)
+        details = self.client.get_activity_details(1)
+        assert self.client.get_activity_details(1, do_use_cache=False) is details
+        assert self.sent_headers == [None, {"If-None-Match": '"v1"'}]
+
+    def test_modified(self, monkeypatch):
+        monkeypatch.setattr(self.client, "_request", self._fake_request)
+        self.client.get_activity_details(1)
+        self.etag = '"v2"'
+        details = self.client.get_activity_details(1, do_use_cache=False)
+        assert details["etag"] == '"v2"'
+        # The new ETag is stored.
+        self.client.get_activity_details(1, do_use_cache=False)
+        assert self.sent_headers[-1] == {"If-None-Match": '"v2"'}
+
+
+class TestActivityTypeIndex:
+    def setup_method(self):
+        StravaClient.clear_activity_type_index()
+        self.client = StravaClient("XXX")
+        start_ts = 1_700_000_000
+        # Hourly: Run, 8 Rides, Run.
+        self.activities = []
+        for i, sport_type in enumerate(["Run"] + ["Ride"] * 8 + ["Run"]):
+            self.activities += _make_activities(1, start_ts + i * 3600, sport_type)
+        self.after_ts = start_ts - 1
+        self.before_ts = start_ts + 10 * 3600
+        self.requested_windows = []
+
+    def teardown_method(self):
+        StravaClient.clear_activity_type_index()
+
+    def _fake_request(self, method, url, params=None, **kwargs):
+        after_ts, before_ts = params["after"], params["before"]
+        self.requested_windows.append((after_ts, before_ts))
+        page, per_page = params["page"], params["per_page"]
+        activities = [
+            a
+            for a in self.activities
+            if after_ts < datetime_utils.iso_to_timestamp(a["start_date"]) < before_ts
+        ]
+        return _FakeResponse(activities[(page - 1) * per_page : page * per_page])
+
+    def test_narrowed_windows(self, monkeypatch):
+        monkeypatch.setattr(self.client, "_request", self._fake_request)
+        list(self.client.iter_activities(self.after_ts, self.before_ts))
+        self.requested_windows.clear()
+
+        # With pages of 3, the whole range takes 4 requests, the 2 runs 2.
+        runs = list(
+            self.client.iter_activities(
+                self.after_ts, self.before_ts, "Run", n_results_per_page=3
+            )
+        )
+        assert [a["id"] for a in runs] == [
+            self.activities[0]["id"],
+            self.activities[9]["id"],
+        ]
+        # Only around the 2 runs, not the whole range.
+        start_ts = 1_700_000_000
+        assert self.requested_windows == [
+            (self.after_ts, start_ts + 3600 + 1),
+            (start_ts + 8 * 3600 - 1, self.before_ts),
+        ]
+
+    def test_no_activities_of_type(self, monkeypatch):
+        monkeypatch.setattr(self.client, "_request", self._fake_request)
+        list(self.client.iter_activities(self.after_ts, self.before_ts))
+        self.requested_windows.clear()
+        assert not list(
+            self.client.iter_activities(self.after_ts, self.before_ts, "Swim")
+        )
+        assert self.requested_windows == []
+
+    def test_not_covered(self, monkeypatch):
+        monkeypatch.setattr(self.client, "_request", self._fake_request)
+        runs = list(self.client.iter_activities(self.after_ts, self.before_ts, "Run"))
+        assert len(runs) == 2
+        assert self.requested_windows == [(self.after_ts, self.before_ts)]
+
+    def test_find_latest_activity(self, monkeypatch):
+        monkeypatch.setattr(self.client, "_request", self._fake_request)
+        monkeypatch.setattr(
+            self.client, "get_activity_details", lambda activity_id: {"id": activity_id}
+        )
+        # Not covered: found with a listing.
+        latest = self.client.find_latest_activity(self.after_ts, self.before_ts, "Run")
+        assert latest == self.activities[9]
+        # Covered now: found in the index, no listing.
+        self.requested_windows.clear()
+        latest = self.client.find_latest_activity(
+            self.after_ts, self.before_ts - 2 * 3600, "Run"
+        )
+        assert latest == {"id": self.activities[0]["id"]}
+        assert self.requested_windows == []
+
+    def test_future_range_covered_up_to_listing(self, monkeypatch):
+        monkeypatch.setattr(self.client, "_request", self._fake_request)
+        # Eg. until the end of today.
+        before_ts = datetime_utils.now_utc().timestamp() + 3600
+        list(self.client.iter_activities(self.after_ts, before_ts))
+        now = datetime_utils.now_utc().timestamp()
+        covered_ranges = StravaClient.get_activity_type_index_stats()["covered_ranges"]
+        assert len(covered_ranges) == 1
+        assert covered_ranges[0][0] == self.after_ts
+        assert covered_ranges[0][1] <= now
+
+    def test_find_latest_activity_uploaded_later(self, monkeypatch):
+        monkeypatch.setattr(self.client, "_request", self._fake_request)
+        assert not self.client.find_latest_activity(
+            self.after_ts, self.before_ts, "Swim"
+        )
+        # Uploaded after the listing, while the range is still covered.
+        swim = _make_activities(1, 1_700_000_000 + 5 * 3600 + 60, "Swim")[0]
+        self.activities.append(swim)
+        self.requested_windows.clear()
+        latest = self.client.find_latest_activity(self.after_ts, self.before_ts, "Swim")
+        assert latest == swim
+        assert self.requested_windows == [(self.after_ts, self.before_ts)]
+
+    def test_find_latest_activity_uploaded_since_listing(self, monkeypatch):
+        monkeypatch.setattr(self.client, "_request", self._fake_request)
+        monkeypatch.setattr(
+            self.client, "get_activity_details", lambda activity_id: {"id": activity_id}
+        )
+        # Eg. until the end of today.
+        before_ts = datetime_utils.now_utc().timestamp() + 3600
+        latest = self.client.find_latest_activity(self.after_ts, before_ts, "Run")
+        assert latest == self.activities[9]
+        [(_, covered_until)] = StravaClient.get_activity_type_index_stats()[
+            "covered_ranges"
+        ]
+        # Uploaded after the listing, while the range is still covered.
+        run = _make_activities(1, int(covered_until) + 1, "Run")[0]
+        self.activities.append(run)
+        self.requested_windows.clear()
+        latest = self.client.find_latest_activity(self.after_ts, before_ts, "Run")
+        assert latest == run
+        # Only the rest of the range, after the listing, is listed.
+        assert self.requested_windows == [(int(covered_until - 1), int(before_ts))]
+        # Not found there: found in the index.
+        self.activities.remove(run)
+        StravaClient.clear_activity_type_index()
+        self.client.find_latest_activity(self.after_ts, before_ts, "Run")
+        latest = self.client.find_latest_activity(self.after_ts, before_ts, "Run")
+        assert latest == {"id": self.activities[9]["id"]}
+
+    def test_plan_windows_while_expiring(self):
+        now = [float(self.before_ts)]
+
+        def clock():
+            # Each call is 10 secs later.
+            now[0] += 10
+            return now[0] - 10
+
+        index = ActivityTypeIndex(coverage_ttl_seconds=10, clock=clock)
+        for activity in self.activities:
+            index.add(activity)
+        index.record_listing(
+            self.after_ts,
+            self.before_ts,
+            [a["id"] for a in self.activities],
+            listed_at=self.before_ts,
+        )
+        now[0] = self.before_ts + 5
+        # Covered when planned, expired right after: the windows of the 2 runs.
+        windows = index.plan_windows(self.after_ts, self.before_ts, "Run", 3)
+        assert len(windows) == 2
+
+    def test_deleted(self, monkeypatch):
+        monkeypatch.setattr(self.client, "_request", self._fake_request)
+        list(self.client.iter_activities(self.after_ts, self.before_ts))
+        del self.activities[3]
+        list(self.client.iter_activities(self.after_ts, self.before_ts))
+        assert StravaClient.get_activity_type_index_stats()["size"] == 9
+
+
+class TestUpdateActivityDescriptions:
+    def setup_method(self):
+        StravaClient.clear_activity_type_index()
+        StravaClient.clear_details_cache()
+        StravaClient.clear_etag_cache()
+        self.client = StravaClient("XXX")
+        self.start_ts = int(datetime_utils.now_utc().timestamp()) - 10 * 3600
+        # 1 an hour: WeightTraining, Run, WeightTraining, Run.
+        self.activities = _make_activities(4, self.start_ts)
+        for activity in self.activities[1::2]:
+            activity["type"] = activity["sport_type"] = "Run"
+        self.descriptions = {self.activities[2]["id"]: "Existing"}
+        self.requests = []
+
+    def teardown_method(self):
+        StravaClient.clear_activity_type_index()
+        StravaClient.clear_details_cache()
+        StravaClient.clear_etag_cache()
+
+    def _fake_request(self, method, url, params=None, data=None, **kwargs):
+        self.requests.append(method)
+        if method == "GET" and params:
+            return _FakeResponse(
+                [
+                    a
+                    for a in self.activities
+                    if params["after"]
+                    < datetime_utils.iso_to_timestamp(a["start_date"])
+                    < params["before"]
+                ]
+            )
+        activity_id = int(url.rsplit("/", 1)[1])
+        activity = next(a for a in self.activities if a["id"] == activity_id)
+        if method == "PUT":
+            self.descriptions[activity_id] = data["description"]
+        return _FakeResponse(
+            {**activity, "description": self.descriptions.get(activity_id)}
+        )
+
+    def _item(self, hour, activity_type, **kwargs):
+        after_ts = self.start_ts + hour * 3600 - 1
+        return dict(
+            after_ts=after_ts,
+            before_ts=after_ts + 3600,
+            activity_type=activity_type,
+            description="New",
+            **kwargs,
+        )
+
+    def test_update_activity_descriptions(self, monkeypatch):
+        monkeypatch.setattr(self.client, "_request", self._fake_request)
+        results = self.client.update_activity_descriptions(
+            [
+                self._item(0, "WeightTraining", name="Gym"),
+                self._item(1, "Run"),
+                # Already has a description.
+                self._item(2, "WeightTraining"),
+                # Not found: the activity in the time range is a run.
+                self._item(3, "WeightTraining"),
+                # The same activity as the 1st item.
+                self._item(0, "WeightTraining"),
+            ]
+        )
+        assert [r.index for r in results] == [0, 1, 2, 3, 4]
+        assert results[0].details["description"] == "New"
+        assert results[1].details["id"] == self.activities[1]["id"]
+        assert isinstance(results[2].exception, ActivityHasDescription)
+        assert results[2].exception.description == "Existing"
+        assert isinstance(results[3].exception, ActivityNotFound)
+        assert isinstance(results[4].exception, DuplicatedBatchItem)
+        assert results[4].exception.index == 0
+        # A single listing, the details of items 0, 1 and 2, then the updates.
+        assert self.requests.count("GET") == 4
+        assert self.requests.count("PUT") == 2
+
+    def test_uploaded_after_listing(self, monkeypatch):
+        monkeypatch.setattr(self.client, "_request", self._fake_request)
+        items = [self._item(0, "WeightTraining"), self._item(4, "WeightTraining")]
+        results = self.client.update_activity_descriptions(items)
+        assert isinstance(results[1].exception, ActivityNotFound)
+        # Uploaded after the listing, while the range is still covered.
+        self.activities += _make_activities(1, self.start_ts + 4 * 3600)
+        self.requests.clear()
+        [result] = self.client.update_activity_descriptions(items[1:])
+        assert result.details["id"] == self.activities[4]["id"]
+        # Listed again, then the details and the update.
+        assert self.requests == ["GET", "GET", "PUT"]
+
+    def test_description_edited_since_cached(self, monkeypatch):
+        monkeypatch.setattr(self.client, "_request", self._fake_request)
+        activity_id = self.activities[0]["id"]
+        assert not self.client.get_activity_details(activity_id)["description"]
+        self.descriptions[activity_id] = "Edited on Strava"
+        [result] = self.client.update_activity_descriptions(
+            [self._item(0, "WeightTraining")]
+        )
+        assert isinstance(result.exception, ActivityHasDescription)
+        assert self.descriptions[activity_id] == "Edited on Strava"
+
+    def test_do_not_stop_if_description_not_null(self, monkeypatch):
+        monkeypatch.setattr(self.client, "_request", self._fake_request)
+        [result] = self.client.update_activity_descriptions(
+            [self._item(2, "WeightTraining", do_stop_if_description_not_null=False)]
+        )
+        assert result.details["description"] == "New"
+        # No details fetched.
+        assert self.requests == ["GET", "PUT"]
+
+
+class TestDuplicateDetection:
+    def setup_method(self):
+        StravaClient.clear_activity_type_index()
+        StravaClient.clear_details_cache()
+        self.client = StravaClient("XXX")
+        self.start_ts = int(datetime_utils.now_utc().timestamp()) - 3 * 3600
+        self.activities = _make_activities(1, self.start_ts, "Run")  # 1 hour.
+        self.n_listings = 0
+
+    def teardown_method(self):
+        StravaClient.clear_activity_type_index()
+        StravaClient.clear_details_cache()
+
+    def _fake_request(self, method, url, params=None, data=None, **kwargs):
+        if method == "POST":
+            start_date = datetime.fromisoformat(data["start_date_local"])
+            activity = {
+                "id": len(self.activities) + 1,
+                "type": data["sport_type"],
+                "sport_type": data["sport_type"],
+                "start_date": start_date.astimezone(timezone.utc).isoformat(),
+                "elapsed_time": data["elapsed_time"],
+            }
+            self.activities.append(activity)
+            return _FakeResponse(activity, status_code=201)
+        self.n_listings += 1
+        return _FakeResponse(
+            [
+                a
+                for a in self.activities
+                if params["after"]
+                < datetime_utils.iso_to_timestamp(a["start_date"])
+                < params["before"]
+            ]
+        )
+
+    def _create(self, sport_type, start_ts, duration_seconds):
+        return self.client.create_activity(
+            "Test",
+            sport_type,
+            datetime.fromtimestamp(start_ts, timezone.utc),
+            duration_seconds,
+            None,
+            do_detect_duplicates=True,
+        )
+
+    def test_overlapping(self, monkeypatch):
+        monkeypatch.setattr(self.client, "_request", self._fake_request)
+        with pytest.raises(PossibleDuplicatedActivity) as exc_info:
+            self._create("Run", self.start_ts + 1800, 600)
+        assert exc_info.value.activity_id == self.activities[0]["id"]
+
+    def test_not_overlapping(self, monkeypatch):
+        monkeypatch.setattr(self.client, "_request", self._fake_request)
+        # Of another type, and touching the existing run.
+        self._create("Ride", self.start_ts + 1800, 600)
+        self._create("Run", self.start_ts + 3600, 600)
+        # Not overlapping the existing run, but the new ride.
+        with pytest.raises(PossibleDuplicatedActivity):
+            self._create("Ride", self.start_ts + 2000, 600)
+        # The index was warmed, up to now, by the 1st check and kept up to date by
+        #  the creates.
+        assert self.n_listings == 1
+        assert StravaClient.get_duplicate_detector_stats() == {"local": 2, "remote": 1}
+
+    def test_create_activities(self, monkeypatch):
+        monkeypatch.setattr(self.client, "_request", self._fake_request)
+
+        def item(sport_type, start_ts, duration_seconds):
+            return dict(
+                name="Test",
+                sport_type=sport_type,
+                start_date=datetime.fromtimestamp(start_ts, timezone.utc).isoformat(),
+                duration_seconds=duration_seconds,
+                description=None,
+            )
+
+        results = self.client.create_activities(
+            [
+                # Overlapping the 3rd item, which starts earlier.
+                item("Ride", self.start_ts + 4000, 600),
+                # Overlapping the existing run.
+                item("Run", self.start_ts + 1800, 600),
+                item("Ride", self.start_ts + 3600, 600),
+                item("Run", self.start_ts + 3600, 600),
+                dict(item("Run", self.start_ts, 600), start_date="2024-01-01T10:00"),
+            ],
+            max_workers=1,
+            do_detect_duplicates=True,
+        )
+        assert [r.index for r in results] == [0, 1, 2, 3, 4]
+        assert isinstance(results[0].exception, DuplicatedBatchItem)
+        assert results[0].exception.index == 2
+        assert isinstance(results[1].exception, PossibleDuplicatedActivity)
+        assert results[1].exception.activity_id == self.activities[0]["id"]
+        assert results[2].is_ok and results[2].details["sport_type"] == "Ride"
+        assert results[3].is_ok and results[3].details["sport_type"] == "Run"
+        assert isinstance(results[4].exception, NaiveDatetime)
+        # A single listing for the whole batch.
+        assert self.n_listings == 1
+        assert len(self.activities) == 3
+
+    def test_create_activities_conflict(self, monkeypatch):
+        def fake_request(method, url, params=None, data=None, **kwargs):
+            if method == "POST" and data["name"] == "Conflict":
+                return _ConflictResponse(None, status_code=409)
+            return self._fake_request(method, url, params, data, **kwargs)
+
+        monkeypatch.setattr(self.client, "_request", fake_request)
+        results = self.client.create_activities(
+            [
+                dict(
+                    name=name,
+                    sport_type="Ride",
+                    start_date=datetime.fromtimestamp(
+                        self.start_ts + i * 3600, timezone.utc
+                    ).isoformat(),
+                    duration_seconds=600,
+                )
+                for i, name in enumerate(["Conflict", "Test", "Test"])
+            ],
+            max_workers=1,
+        )
+        # Each item has its own result.
+        assert isinstance(results[0].exception, PossibleDuplicatedActivity)
+        assert results[1].is_ok and results[2].is_ok
+
+
+class TestListActivitySummariesPage:
+    def setup_method(self):
+        StravaClient.clear_activity_type_index()
+        self.client = StravaClient("XXX")
+        start_ts = 1_700_000_000
+        # Hourly: 3 Runs, 2 Rides, 3 Runs, 2 Rides.
+        self.activities = []
+        for i, sport_type in enumerate(["Run"] * 3 + ["Ride"] * 2 + ["Run"] * 3):
+            self.activities += _make_activities(1, start_ts + i * 3600, sport_type)
+        self.activities += _make_activities(2, start_ts + 8 * 3600, "Ride")
+        self.n_requests = 0
+
+    def teardown_method(self):
+        StravaClient.clear_activity_type_index()
+
+    def _fake_request(self, method, url, params=None, **kwargs):
+        self.n_requests += 1
+        page, per_page = params["page"], params["per_page"]
+        activities = [
+            a
+            for a in self.activities
+            if params["after"] < datetime_utils.iso_to_timestamp(a["start_date"])
+        ]
+        return _FakeResponse(activities[(page - 1) * per_page : page * per_page])
+
+    def _ids(self, summaries):
+        return [s.to_dict()["id"] for s in summaries]
+
+    def test_pages(self, monkeypatch):
+        monkeypatch.setattr(self.client, "_request", self._fake_request)
+        ids = []
+        after_ts, after_id = 0, None
+        while True:
+            summaries, position = self.client.list_activity_summaries_page(
+                after_ts, limit=4, after_id=after_id
+            )
+            ids += self._ids(summaries)
+            if not position:
+                break
+            assert len(summaries) == 4
+            after_ts, after_id = position
+        assert ids == [a["id"] for a in self.activities]
+
+    def test_type_filter_bounded_scan(self, monkeypatch):
+        monkeypatch.setattr(self.client, "_request", self._fake_request)
+        summaries, position = self.client.list_activity_summaries_page(
+            activity_type="Ride", limit=10, max_scanned=4
+        )
+        # Stopped scanning after 4 activities, 1 of them a Ride.
+        assert self._ids(summaries) == [self.activities[3]["id"]]
+        assert position[1] == self.activities[3]["id"]
+
+        summaries, position = self.client.list_activity_summaries_page(
+            position[0], activity_type="Ride", limit=10, after_id=position[1]
+        )
+        assert self._ids(summaries) == [self.activities[i]["id"] for i in (4, 8, 9)]
+        assert position is None
@@ -0,0 +1,54 @@
+from strava_facade_api.clients.strava_client.time_index import TimeIndex
+
+
+class TestTimeIndex:
+    def setup_method(self):
+        self.index = TimeIndex()
+        self.index.add(1, 100.0, ["Run", "Run"])
+        self.index.add(2, 200.0, ["Ride", "MountainBikeRide"])
+        self.index.add(3, 300.0, ["Run", "TrailRun"])
+        self.index.add(4, 300.0, ["Ride", "Ride"])
+
+    def test_find_range(self):
+        assert self.index.find_range(100, 300) == [
+            (100.0, 1),
+            (200.0, 2),
+            (300.0, 3),
+            (300.0, 4),
+        ]
+        assert self.index.find_range(101, 300, "Run") == [(300.0, 3)]
+        assert self.index.find_range(0, 1000, "MountainBikeRide") == [(200.0, 2)]
+        assert self.index.find_range(0, 1000, "Swim") == []
+
+    def test_find_latest(self):
+        assert self.index.find_latest(0, 299, "Run") == (100.0, 1)
+        assert self.index.find_latest(0, 1000, "Ride") == (300.0, 4)
+        assert self.index.find_latest(101, 199, "Run") is None
+
+    def test_find_nearest(self):
+        assert self.index.find_nearest(190, "Run") == (100.0, 1)
+        assert self.index.find_nearest(210, "Run") == (300.0, 3)
+        assert self.index.find_nearest(1000, "Run") == (300.0, 3)
+        assert self.index.find_nearest(210, "Run", max_distance_seconds=60) is None
+        assert self.index.find_nearest(210, "Swim") is None
+
+    def test_remove(self):
+        self.index.remove(4, 300.0, ["Ride", "Ride"])
+        assert self.index.find_range(300, 300) == [(300.0, 3)]
+        assert self.index.find_latest(0, 1000, "Ride") == (200.0, 2)
+        assert len(self.index) == 3
+
+    def test_find_overlapping(self):
+        index = TimeIndex()
+        index.add(1, 0.0, ["Run"], end_ts=10_000.0)  # A long one.
+        index.add(2, 20_000.0, ["Run"], end_ts=20_100.0)
+        index.add(3, 20_200.0, ["Run"], end_ts=20_200.0)  # Zero length.
+        assert index.find_overlapping(9_000, 9_500, "Run") == [(0.0, 1)]
+        # Touching is not overlapping.
+        assert index.find_overlapping(10_000, 20_000, "Run") == []
+        assert index.find_overlapping(20_050, 20_300, "Run") == [
+            (20_000.0, 2),
+            (20_200.0, 3),
+        ]
+        assert index.find_overlapping(20_200, 20_201, "Run") == [(20_200.0, 3)]
+        assert index.find_overlapping(9_000, 9_500, "Ride") == []
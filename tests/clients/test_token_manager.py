@@ -0,0 +1,296 @@
+import json
+import threading
+from time import sleep, time
+
+import boto3
+import botocore.exceptions
+import pytest
+
+from strava_facade_api.clients.aws_parameter_store_client import (
+    aws_parameter_store_client,
+)
+from strava_facade_api.clients.strava_client import http_session
+from strava_facade_api.clients.strava_client import (
+    token_manager as token_manager_module,
+)
+from strava_facade_api.clients.strava_client.token_manager import (
+    CLIENT_ID_PARAMETER_STORE_KEY_PATH,
+    CLIENT_SECRET_PARAMETER_STORE_KEY_PATH,
+    TOKEN_JSON_PARAMETER_STORE_KEY_PATH,
+    TokenManager,
+)
+from strava_facade_api.utils import deadline
+
+
+class FakeSsmClient:
+    """
+    A local, thread-safe, stand-in for the boto3 SSM client.
+    """
+
+    def __init__(self):
+        self.parameters = dict()  # Name -> (value, version).
+        self.lock = threading.Lock()
+
+    def get_parameter(self, Name, WithDecryption=False):
+        with self.lock:
+            if Name not in self.parameters:
+                raise _make_client_error("ParameterNotFound", "GetParameter")
+            value, version = self.parameters[Name]
+        return {"Parameter": {"Name": Name, "Value": value, "Version": version}}
+
+    def get_parameters(self, Names, WithDecryption=False):
+        with self.lock:
+            parameters = [
+                {"Name": name, "Value": self.parameters[name][0]}
+                for name in Names
+                if name in self.parameters
+            ]
+            invalid = [name for name in Names if name not in self.parameters]
+        return {"Parameters": parameters, "InvalidParameters": invalid}
+
+    def put_parameter(self, Name, Value, Overwrite=False, **kwargs):
+        with self.lock:
+            if Name in self.parameters and not Overwrite:
+                raise _make_client_error("ParameterAlreadyExists", "PutParameter")
+            version = self.parameters.get(Name, (None, 0))[1] + 1
+            self.parameters[Name] = (Value, version)
+        return {"Version": version}
+
+    def delete_parameter(self, Name):
+        with self.lock:
+            if self.parameters.pop(Name, None) is None:
+                raise _make_client_error("ParameterNotFound", "DeleteParameter")
+
+
+def _make_client_error(code: str, operation: str):
+    return botocore.exceptions.ClientError({"Error": {"Code": code}}, operation)
+
+
+class FakeStravaSession:
+    """
+    A stand-in for Strava OAuth API, counting the token refreshes.
+    """
+
+    def __init__(self):
+        self.n_refreshes = 0
+        self.lock = threading.Lock()
+
+    def post(self, url, data, timeout=None):
+        with self.lock:
+            self.n_refreshes += 1
+            n_refreshes = self.n_refreshes
+        # Simulate network latency, to widen the race window.
+        sleep(0.05)
+        return FakeResponse(
+            {
+                "access_token": f"access{n_refreshes}",
+                "refresh_token": f"refresh{n_refreshes}",
+                "expires_at": int(time()) + 6 * 3600,
+            }
+        )
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.data
+
+
+@pytest.fixture
+def ssm_client(monkeypatch, tmp_path):
+    monkeypatch.setattr(TokenManager, "SECRET_FILE", str(tmp_path / "token.json"))
+    ssm_client = FakeSsmClient()
+    monkeypatch.setattr(boto3, "client", lambda service, **kwargs: ssm_client)
+    aws_parameter_store_client.reset_client()
+    ssm_client.put_parameter(CLIENT_ID_PARAMETER_STORE_KEY_PATH, "123")
+    ssm_client.put_parameter(CLIENT_SECRET_PARAMETER_STORE_KEY_PATH, "XXX")
+    TokenManager.clear_cache()
+    yield ssm_client
+    TokenManager.clear_cache()
+    aws_parameter_store_client.reset_client()
+
+
+@pytest.fixture
+def strava_session(monkeypatch):
+    session = FakeStravaSession()
+    monkeypatch.setattr(http_session, "get_session", lambda: session)
+    return session
+
+
+def _put_token(ssm_client: FakeSsmClient, expires_in: int) -> None:
+    token = {
+        "access_token": "access0",
+        "refresh_token": "refresh0",
+        "expires_at": int(time()) + expires_in,
+    }
+    ssm_client.put_parameter(
+        TOKEN_JSON_PARAMETER_STORE_KEY_PATH, json.dumps(token), Overwrite=True
+    )
+
+
+class TestGetAccessToken:
+    def test_cached(self, ssm_client, strava_session):
+        _put_token(ssm_client, expires_in=3600)
+        assert TokenManager.get_access_token() == "access0"
+        # Not read from Parameter Store again.
+        del ssm_client.parameters[TOKEN_JSON_PARAMETER_STORE_KEY_PATH]
+        assert TokenManager.get_access_token() == "access0"
+        assert strava_session.n_refreshes == 0
+
+    def test_expiring(self, ssm_client, strava_session):
+        # Expiring within the skew, so refreshed.
+        _put_token(ssm_client, expires_in=60)
+        assert TokenManager.get_access_token() == "access1"
+        assert strava_session.n_refreshes == 1
+        value, version = ssm_client.parameters[TOKEN_JSON_PARAMETER_STORE_KEY_PATH]
+        assert json.loads(value)["refresh_token"] == "refresh1"
+        assert version == 2
+
+    def test_concurrent_threads(self, ssm_client, strava_session):
+        _put_token(ssm_client, expires_in=-60)
+        access_tokens = _run_concurrently(TokenManager.get_access_token, n=20)
+        assert access_tokens == ["access1"] * 20
+        assert strava_session.n_refreshes == 1
+
+
+class TestTieredTokenStore:
+    def test_tiers(self, ssm_client, strava_session):
+        _put_token(ssm_client, expires_in=3600)
+        TokenManager.get_access_token()
+        TokenManager.get_access_token()
+        assert TokenManager.get_tier_stats() == {
+            "memory": {"hits": 1, "misses": 1},
+            "file": {"hits": 0, "misses": 1},
+            "parameter_store": {"hits": 1, "misses": 0},
+        }
+        # Promoted to the file tier.
+        with open(TokenManager.SECRET_FILE) as fin:
+            assert json.load(fin)["access_token"] == "access0"
+
+    def test_file_tier(self, ssm_client, strava_session):
+        _put_token(ssm_client, expires_in=3600)
+        TokenManager.get_access_token()
+        # Python module state lost, but /tmp survived.
+        TokenManager.clear_cache()
+        del ssm_client.parameters[TOKEN_JSON_PARAMETER_STORE_KEY_PATH]
+        assert TokenManager.get_access_token() == "access0"
+        assert TokenManager.get_tier_stats()["file"] == {"hits": 1, "misses": 0}
+
+    def test_expired_file(self, ssm_client, strava_session):
+        _put_token(ssm_client, expires_in=-60)
+        with open(TokenManager.SECRET_FILE, "w") as fout:
+            json.dump(
+                {"access_token": "old", "refresh_token": "x", "expires_at": 1}, fout
+            )
+        assert TokenManager.get_access_token() == "access1"
+        with open(TokenManager.SECRET_FILE) as fin:
+            assert json.load(fin)["access_token"] == "access1"
+
+
+class TestRefreshCoordinationLoad:
+    """
+    Simulate N Lambda instances finding the token expired at the same time: each
+     thread is an instance, with its own TokenManager and no shared in-process lock.
+    """
+
+    @pytest.mark.parametrize("n_instances", [2, 10, 50])
+    def test_single_refresh(self, ssm_client, strava_session, monkeypatch, n_instances):
+        monkeypatch.setattr(TokenManager, "REFRESH_POLL_SECONDS", 0.01)
+        _put_token(ssm_client, expires_in=-60)
+
+        def get_access_token_in_new_instance():
+            return TokenManager()._read_or_refresh_token()["access_token"]
+
+        access_tokens = _run_concurrently(
+            get_access_token_in_new_instance, n=n_instances
+        )
+        assert access_tokens == ["access1"] * n_instances
+        assert strava_session.n_refreshes == 1
+        value, version = ssm_client.parameters[TOKEN_JSON_PARAMETER_STORE_KEY_PATH]
+        assert json.loads(value)["refresh_token"] == "refresh1"
+        assert version == 2
+        # The refresh lock is released.
+        assert len(ssm_client.parameters) == 3
+
+    def test_lock_outlives_refresh(self):
+        # A live lock is never broken mid-refresh.
+        assert TokenManager.REFRESH_LOCK_TTL_SECONDS > (
+            deadline.CONNECT_TIMEOUT_SECONDS + deadline.READ_TIMEOUT_SECONDS
+        )
+
+    def test_break_expired_lock(self, ssm_client, strava_session, monkeypatch):
+        monkeypatch.setattr(TokenManager, "REFRESH_POLL_SECONDS", 0.01)
+        _put_token(ssm_client, expires_in=-60)
+        # Left by a crashed instance.
+        ssm_client.put_parameter(
+            token_manager_module.REFRESH_LOCK_PARAMETER_STORE_KEY_PATH,
+            str(time() - 1),
+        )
+        assert TokenManager()._read_or_refresh_token()["access_token"] == "access1"
+
+
+class ThrottlingFakeSsmClient(FakeSsmClient):
+    """
+    Throttles every other write of the refresh lock, like SSM under load.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.n_lock_puts = 0
+
+    def put_parameter(self, Name, Value, Overwrite=False, **kwargs):
+        if Name == token_manager_module.REFRESH_LOCK_PARAMETER_STORE_KEY_PATH:
+            with self.lock:
+                self.n_lock_puts += 1
+                n_lock_puts = self.n_lock_puts
+            if n_lock_puts % 2:
+                raise _make_client_error("ThrottlingException", "PutParameter")
+        return super().put_parameter(Name, Value, Overwrite, **kwargs)
+
+
+class TestParameterStoreErrors:
+    def test_throttled_lock(self, ssm_client, strava_session, monkeypatch):
+        throttling_ssm_client = ThrottlingFakeSsmClient()
+        throttling_ssm_client.parameters = ssm_client.parameters
+        monkeypatch.setattr(
+            boto3, "client", lambda service, **kwargs: throttling_ssm_client
+        )
+        aws_parameter_store_client.reset_client()
+        monkeypatch.setattr(TokenManager, "REFRESH_POLL_SECONDS", 0.01)
+        _put_token(ssm_client, expires_in=-60)
+
+        def get_access_token_in_new_instance():
+            return TokenManager()._read_or_refresh_token()["access_token"]
+
+        access_tokens = _run_concurrently(get_access_token_in_new_instance, n=10)
+        assert access_tokens == ["access1"] * 10
+        assert strava_session.n_refreshes == 1
+
+    def test_other_error(self, ssm_client, strava_session, monkeypatch):
+        def get_parameter(Name, WithDecryption=False):
+            raise _make_client_error("AccessDeniedException", "GetParameter")
+
+        monkeypatch.setattr(ssm_client, "get_parameter", get_parameter)
+        with pytest.raises(token_manager_module.TokenManagerException):
+            TokenManager.get_access_token()
+
+
+def _run_concurrently(fn, n: int) -> list:
+    barrier = threading.Barrier(n)
+    results = [None] * n
+
+    def run(i):
+        barrier.wait()
+        results[i] = fn()
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
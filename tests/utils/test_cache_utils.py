@@ -0,0 +1,28 @@
+from strava_facade_api.utils.cache_utils import LruTtlCache
+
+
+class TestLruTtlCache:
+    def test_lru_eviction(self):
+        cache = LruTtlCache(maxsize=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        assert cache.get("a") == 1
+        cache.set("c", 3)
+        # "b" was the least recently used.
+        assert cache.get("b") is None
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert cache.get_stats() == {
+            "size": 2,
+            "maxsize": 2,
+            "hits": 3,
+            "misses": 1,
+            "evictions": 1,
+            "expirations": 0,
+        }
+
+    def test_ttl(self):
+        cache = LruTtlCache(maxsize=2, ttl_seconds=-1)
+        cache.set("a", 1)
+        assert cache.get("a") is None
+        assert cache.get_stats()["expirations"] == 1
@@ -0,0 +1,40 @@
+import pytest
+
+from strava_facade_api.utils import deadline
+
+
+class _FakeContext:
+    def __init__(self, remaining_ms: int):
+        self.remaining_ms = remaining_ms
+
+    def get_remaining_time_in_millis(self) -> int:
+        return self.remaining_ms
+
+
+class TestDeadline:
+    def teardown_method(self):
+        deadline.clear()
+
+    def test_no_deadline(self):
+        deadline.start(None)
+        assert deadline.get_remaining_seconds() is None
+        assert deadline.get_timeout() == (
+            deadline.CONNECT_TIMEOUT_SECONDS,
+            deadline.READ_TIMEOUT_SECONDS,
+        )
+        deadline.check()
+
+    def test_timeout_shortened(self):
+        deadline.start(_FakeContext(6000), safety_margin_ms=1000)
+        connect_timeout, read_timeout = deadline.get_timeout()
+        assert connect_timeout == deadline.CONNECT_TIMEOUT_SECONDS
+        assert 4.5 < read_timeout <= 5
+
+    def test_exceeded(self):
+        deadline.start(_FakeContext(1200), safety_margin_ms=1000)
+        with pytest.raises(deadline.DeadlineExceeded) as exc_info:
+            deadline.get_timeout(step="GET /activities")
+        assert "GET /activities" in str(exc_info.value)
+        # A new invocation starts a new deadline.
+        deadline.start(_FakeContext(30000))
+        deadline.check(deadline.MIN_WRITE_SECONDS)
@@ -0,0 +1,29 @@
+import json
+
+import pytest
+
+from strava_facade_api.utils.json_utils import iter_json_array
+
+
+def _chunked(content: bytes, size: int) -> list[bytes]:
+    return [content[i : i + size] for i in range(0, len(content), size)]
+
+
+class TestIterJsonArray:
+    @pytest.mark.parametrize("chunk_size", [1, 3, 1024])
+    def test_elements(self, chunk_size):
+        data = [{"name": 'Corsa ü "]\\', "laps": [1, {}]}, 123, 1.5e3, None, []]
+        content = json.dumps(data, ensure_ascii=False).encode()
+        assert list(iter_json_array(_chunked(content, chunk_size))) == data
+
+    def test_empty(self):
+        assert list(iter_json_array([b" [ ", b"]\n"])) == []
+
+    def test_lazy(self):
+        iterator = iter_json_array(iter([b'[{"id": 1},', b' {"id": 2}]']))
+        assert next(iterator) == {"id": 1}
+
+    @pytest.mark.parametrize("content", [b"", b"{}", b"[1, 2", b"[1 2]", b"[1] 2"])
+    def test_invalid(self, content):
+        with pytest.raises(json.JSONDecodeError):
+            list(iter_json_array(_chunked(content, 2)))
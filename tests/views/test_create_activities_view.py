@@ -0,0 +1,62 @@
+import json
+
+from strava_facade_api import domain, domain_exceptions
+from strava_facade_api.views import create_activities_view
+
+
+class TestCreateActivities:
+    def setup_method(self):
+        self.calls = []
+
+    def _fake_create_activities(self, activities):
+        self.calls.append(activities)
+        return [
+            domain_exceptions.DuplicatedBatchItemFound(0) if i else {"id": i + 1}
+            for i, _ in enumerate(activities)
+        ]
+
+    def _post(self, activities):
+        return create_activities_view.lambda_handler(
+            {"body": json.dumps({"activities": activities})}, None
+        )
+
+    def _activity(self, **kwargs):
+        return {
+            "name": "Gym",
+            "activityType": "WeightTraining",
+            "startDate": "2024-07-25T18:17:33+02:00",
+            "durationSeconds": 3960,
+            **kwargs,
+        }
+
+    def test_invalid_items(self, monkeypatch):
+        monkeypatch.setattr(domain, "create_activities", self._fake_create_activities)
+        response = self._post(
+            [
+                self._activity(durationSeconds="abc"),
+                # Coerced, and the description is optional.
+                self._activity(durationSeconds="3960"),
+                self._activity(name=None),
+                self._activity(description="My descr"),
+            ]
+        )
+        assert response["statusCode"] == 200
+        results = json.loads(response["body"])["results"]
+        assert [r["index"] for r in results] == [0, 1, 2, 3]
+        assert results[0]["status"] == "error"
+        assert results[0]["statusCode"] == 400
+        assert results[1] == {"index": 1, "status": "created", "activity": {"id": 1}}
+        assert results[2]["statusCode"] == 400
+        # The duplicate's index is the item's, not the activity's.
+        assert results[3]["duplicateItemIndex"] == 1
+        [activities] = self.calls
+        assert activities[0]["duration_seconds"] == 3960
+        assert activities[0]["description"] is None
+
+    def test_all_invalid(self, monkeypatch):
+        monkeypatch.setattr(domain, "create_activities", self._fake_create_activities)
+        response = self._post([self._activity(durationSeconds=0)])
+        [result] = json.loads(response["body"])["results"]
+        assert result["statusCode"] == 400
+        # Strava is not called.
+        assert self.calls == []
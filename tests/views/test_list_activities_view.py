@@ -0,0 +1,76 @@
+import json
+
+from strava_facade_api import domain, domain_exceptions
+from strava_facade_api.views import list_activities_view
+
+
+class TestListActivities:
+    def setup_method(self):
+        self.calls = []
+
+    def _fake_list_activities(self, **kwargs):
+        self.calls.append(kwargs)
+        if len(self.calls) == 1:
+            return [{"id": 1}], (1_700_000_000.0, 1)
+        return [{"id": 2}], None
+
+    def _get(self, params):
+        return list_activities_view.lambda_handler(
+            {"queryStringParameters": params}, None
+        )
+
+    def test_cursor(self, monkeypatch):
+        monkeypatch.setattr(domain, "list_activities", self._fake_list_activities)
+        response = self._get(
+            {"after": "1690000000", "before": "1690000000", "type": "Run", "limit": "1"}
+        )
+        assert response["statusCode"] == 200
+        # A time range in the past.
+        assert response["headers"]["Cache-Control"] == "private, max-age=3600"
+        body = json.loads(response["body"])
+        assert body["activities"] == [{"id": 1}]
+
+        response = self._get({"cursor": body["cursor"]})
+        body = json.loads(response["body"])
+        assert body == {"activities": [{"id": 2}], "cursor": None}
+        # The filters are carried by the cursor.
+        assert self.calls[1] == dict(
+            self.calls[0], after_ts=1_700_000_000.0, after_id=1
+        )
+
+    def test_recent(self, monkeypatch):
+        monkeypatch.setattr(domain, "list_activities", self._fake_list_activities)
+        response = self._get(None)
+        assert response["headers"]["Cache-Control"] == "private, max-age=60"
+        assert self.calls[0]["limit"] == list_activities_view.DEFAULT_LIMIT
+
+    def test_invalid(self, monkeypatch):
+        monkeypatch.setattr(domain, "list_activities", self._fake_list_activities)
+        assert self._get({"cursor": "xxx"})["statusCode"] == 400
+        query = dict(
+            after_ts=1, before_ts=None, activity_type=None, limit=10, after_id=1
+        )
+        for tampered in ({"before_ts": "x"}, {"activity_type": 1}):
+            cursor = list_activities_view._encode_cursor({**query, **tampered})
+            assert self._get({"cursor": cursor})["statusCode"] == 400
+        assert self._get({"limit": "1000"})["statusCode"] == 400
+        assert self._get({"after": "yesterday"})["statusCode"] == 400
+        assert not self.calls
+
+    def test_unknown_field(self, monkeypatch):
+        def fake_list_activities(**kwargs):
+            raise domain_exceptions.UnknownActivityFieldInput("xxx")
+
+        monkeypatch.setattr(domain, "list_activities", fake_list_activities)
+        response = self._get({"fields": "id,xxx"})
+        assert response["statusCode"] == 400
+        assert "xxx" in response["body"]
+
+    def test_rate_limited(self, monkeypatch):
+        def fake_list_activities(**kwargs):
+            raise domain_exceptions.StravaRateLimitedError(120.5)
+
+        monkeypatch.setattr(domain, "list_activities", fake_list_activities)
+        response = self._get(None)
+        assert response["statusCode"] == 429
+        assert response["headers"]["Retry-After"] == "121"
@@ -0,0 +1,48 @@
+import json
+
+from strava_facade_api.__version__ import __version__
+from strava_facade_api.views import router_view
+
+
+def _make_event(route_key: str) -> dict:
+    method, path = route_key.split(" ")
+    return {
+        "version": "2.0",
+        "routeKey": route_key,
+        "rawPath": path,
+        "requestContext": {"http": {"method": method, "path": path}},
+    }
+
+
+class TestRouter:
+    def test_route(self):
+        response = router_view.lambda_handler(_make_event("GET /version"), None)
+        assert response["statusCode"] == 200
+        assert json.loads(response["body"]) == __version__
+
+    def test_unknown_route(self):
+        response = router_view.lambda_handler(_make_event("GET /xxx"), None)
+        assert response["statusCode"] == 404
+
+    def test_authorizer(self, monkeypatch):
+        monkeypatch.setenv("API_AUTHORIZER_TOKEN", "XXX")
+        event = {
+            "version": "2.0",
+            "type": "REQUEST",
+            "routeArn": "arn:aws:execute-api:eu-south-1:123:xxx/$default/GET/version",
+            "routeKey": "GET /version",
+            "headers": {"authorization": "XXX"},
+        }
+        response = router_view.lambda_handler(event, None)
+        assert response["isAuthorized"] is True
+
+    def test_handler_imported_once(self, monkeypatch):
+        calls = []
+        monkeypatch.setitem(
+            router_view._handlers,
+            "introspection_view",
+            lambda event, context: calls.append(event) or {"statusCode": 200},
+        )
+        router_view.lambda_handler(_make_event("GET /health"), None)
+        router_view.lambda_handler(_make_event("GET /version"), None)
+        assert len(calls) == 2
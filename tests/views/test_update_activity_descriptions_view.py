@@ -0,0 +1,68 @@
+import json
+
+from strava_facade_api import domain, domain_exceptions
+from strava_facade_api.views import update_activity_descriptions_view
+
+
+class TestUpdateActivityDescriptions:
+    def setup_method(self):
+        self.calls = []
+
+    def _fake_update_activity_descriptions(self, items):
+        self.calls.append(items)
+        return [
+            domain_exceptions.DuplicatedBatchItemFound(0) if i else {"id": i + 1}
+            for i, _ in enumerate(items)
+        ]
+
+    def _post(self, items):
+        return update_activity_descriptions_view.lambda_handler(
+            {"body": json.dumps({"items": items})}, None
+        )
+
+    def _item(self, **kwargs):
+        return {
+            "afterTs": 1707174000,
+            "beforeTs": 1707260399,
+            "activityType": "WeightTraining",
+            "description": "My new descr",
+            **kwargs,
+        }
+
+    def test_invalid_items(self, monkeypatch):
+        monkeypatch.setattr(
+            domain,
+            "update_activity_descriptions",
+            self._fake_update_activity_descriptions,
+        )
+        response = self._post(
+            [
+                self._item(afterTs="yesterday"),
+                # Coerced.
+                self._item(beforeTs="1707260399"),
+                self._item(beforeTs=None),
+                self._item(),
+            ]
+        )
+        assert response["statusCode"] == 200
+        results = json.loads(response["body"])["results"]
+        assert [r["index"] for r in results] == [0, 1, 2, 3]
+        assert results[0]["status"] == "error"
+        assert results[0]["statusCode"] == 400
+        assert results[1] == {"index": 1, "status": "updated", "activity": {"id": 1}}
+        assert results[2]["statusCode"] == 400
+        # The duplicate's index is the posted item's.
+        assert results[3]["duplicateItemIndex"] == 1
+        [items] = self.calls
+        assert items[0]["before_ts"] == 1707260399
+
+    def test_rate_limited(self, monkeypatch):
+        def fake_update_activity_descriptions(items):
+            raise domain_exceptions.StravaRateLimitedError(retry_after_seconds=60.5)
+
+        monkeypatch.setattr(
+            domain, "update_activity_descriptions", fake_update_activity_descriptions
+        )
+        response = self._post([self._item()])
+        assert response["statusCode"] == 429
+        assert response["headers"] == {"Retry-After": "61"}
@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+from strava_facade_api.views import authorizer_view, create_activity_view, warmup
+
+STEPS = ("import", "http_session", "ssm_client", "dns", "tls", "token")
+
+
+@pytest.fixture
+def steps_run(monkeypatch):
+    steps_run = []
+    for name in (
+        "_import_modules",
+        "_build_http_session",
+        "_build_ssm_client",
+        "_resolve_strava_host",
+        "_connect_to_strava",
+        "_get_access_token",
+    ):
+        monkeypatch.setattr(warmup, name, lambda name=name: steps_run.append(name))
+    return steps_run
+
+
+class TestWarmup:
+    def test_is_warmup_event(self):
+        assert warmup.is_warmup_event({"warmup": True})
+        assert warmup.is_warmup_event({"source": "serverless-plugin-warmup"})
+        assert not warmup.is_warmup_event({"warmup": "false"})
+        assert not warmup.is_warmup_event({"routeKey": "GET /health"})
+
+    def test_handler_short_circuits(self, steps_run):
+        response = create_activity_view.lambda_handler({"warmup": True}, None)
+        assert response["statusCode"] == 200
+        body = json.loads(response["body"])
+        assert tuple(body["steps"]) == STEPS
+        assert all(step["ms"] >= 0 for step in body["steps"].values())
+        assert len(steps_run) == len(STEPS)
+
+    def test_failing_step(self, steps_run, monkeypatch):
+        def fail():
+            raise ConnectionError("Unreachable")
+
+        monkeypatch.setattr(warmup, "_connect_to_strava", fail)
+        steps = warmup.prime()
+        assert "Unreachable" in steps["tls"]["error"]
+        # The other steps are run anyway.
+        assert "error" not in steps["token"]
+        assert len(steps_run) == len(STEPS) - 1
+
+    def test_no_priming(self, steps_run):
+        response = authorizer_view.lambda_handler({"warmup": True}, None)
+        assert json.loads(response["body"]) == {"warmup": True, "steps": {}}
+        assert steps_run == []